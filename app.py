@@ -1,48 +1,238 @@
-from flask import Flask, render_template, jsonify
-import json, os
-from functools import lru_cache
+from flask import Flask, Response, g, render_template, request, send_from_directory, url_for
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
+import functools
+import hmac
+import mimetypes
+import os
+import threading
+import time
+
+from benessere import metrics, profiling
+from benessere.assets import IMMUTABLE, Assets
+from benessere.httpcache import PageCache, Payload, json_response, respond
+from benessere.imagebuild import Manifest, pick
+from benessere.loyalty import (
+    REDEEM_ITEMS, SPIN_REWARDS, _uid, can_spin_today, check_coupon, get_user, leaderboard, redeem, set_name, set_referrer,
+    spin, use_coupon, user_rank,
+)
+from benessere.menu import MenuCache
+from benessere.store import open_store
 
 app = Flask(__name__)
+# Plantillas compiladas también en disco: un arranque nuevo no vuelve a compilar Jinja
+app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache()}
 
 # -------- Helpers --------
 DATA_PATH = os.path.join(app.root_path, "data", "menu.json")
 
-@lru_cache(maxsize=1)
-def _load_menu_raw() -> dict:
-    """Lee el JSON del menú de forma robusta."""
-    if not os.path.exists(DATA_PATH):
-        # Fallback mínimo si el archivo no existe
-        return {
-            "bowls": [
-                {"name": "Açaí Zero 180g", "desc": "Açaí sin azúcar + toppings. Tamaño M.", "price": 30, "img": "acai_180.jpg"},
-                {"name": "Açaí Zero 120g", "desc": "Açaí sin azúcar + toppings. Tamaño S.", "price": 25, "img": "acai_120.jpg"},
-            ],
-            "cereales": [
-                {"name": "Granola Casera", "desc": "Avena, frutos secos, miel", "price": 18, "img": "granola.jpg"},
-                {"name": "Overnight Oats", "desc": "Avena, chía, yogur", "price": 20, "img": "oats.jpg"},
-            ],
-            "bebidas": [
-                {"name": "Jugo Natural 350 ml", "desc": "Fruta 100% | vaso S", "price": 7, "img": "jugo_350.jpg"},
-                {"name": "Jugo Natural 600 ml", "desc": "Fruta 100% | vaso M", "price": 9, "img": "jugo_600.jpg"},
-            ],
-        }
-    try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # normaliza tipos/llaves esperadas
-            for cat in data.values():
-                for it in cat:
-                    it["name"] = str(it.get("name", "")).strip()
-                    it["desc"] = str(it.get("desc", "")).strip()
-                    it["price"] = float(it.get("price", 0))
-                    it["img"] = str(it.get("img", "")).strip()
-            return data
-    except Exception:
-        # Si el JSON está malformado, no rompemos la web
-        return _load_menu_raw.cache_clear() or _load_menu_raw()
+# Fallback mínimo si el archivo no existe
+DEFAULT_MENU = {
+    "bowls": [
+        {"name": "Açaí Zero 180g", "desc": "Açaí sin azúcar + toppings. Tamaño M.", "price": 30, "img": "acai_180.jpg"},
+        {"name": "Açaí Zero 120g", "desc": "Açaí sin azúcar + toppings. Tamaño S.", "price": 25, "img": "acai_120.jpg"},
+    ],
+    "cereales": [
+        {"name": "Granola Casera", "desc": "Avena, frutos secos, miel", "price": 18, "img": "granola.jpg"},
+        {"name": "Overnight Oats", "desc": "Avena, chía, yogur", "price": 20, "img": "oats.jpg"},
+    ],
+    "bebidas": [
+        {"name": "Jugo Natural 350 ml", "desc": "Fruta 100% | vaso S", "price": 7, "img": "jugo_350.jpg"},
+        {"name": "Jugo Natural 600 ml", "desc": "Fruta 100% | vaso M", "price": 9, "img": "jugo_600.jpg"},
+    ],
+}
+
+# Se carga al importar (antes del fork de gunicorn); luego un stat por request.
+MENU_CACHE = MenuCache(DATA_PATH, DEFAULT_MENU)
+MENU_CACHE.get()
 
 def load_menu() -> dict:
-    return _load_menu_raw()
+    """Menú normalizado y de sólo lectura; se recarga solo si cambia el archivo."""
+    return MENU_CACHE.get()
+
+# /api/menu: JSON serializado y comprimido una vez por versión del menú
+MENU_API_CACHE = "public, max-age=60, must-revalidate"
+_menu_payload = (None, None)
+
+def menu_payload() -> Payload:
+    global _menu_payload
+    version, menu = MENU_CACHE.snapshot()
+    built, payload = _menu_payload
+    if built != version:
+        payload = Payload((app.json.dumps(menu, separators=(",", ":")) + "\n").encode("utf-8"), "application/json")
+        _menu_payload = (version, payload)
+    return payload
+
+menu_payload()
+
+# Estáticos con huella de contenido: /static/css/styles.<hash>.css, inmutables.
+# Archivos idénticos comparten una URL (python -m benessere.assets muestra el ahorro).
+TEMPLATE_POLL = float(os.environ.get("BENESSERE_TEMPLATE_POLL", "1"))   # segundos entre revisiones
+ASSETS = Assets(app.static_folder, poll=TEMPLATE_POLL)
+
+@app.url_defaults
+def _static_fingerprint(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = ASSETS.url_path(values["filename"])
+
+def static_file(filename):
+    real, immutable = ASSETS.resolve(filename)
+    # .br/.gz ya escritos por `python -m benessere.assets --compress`; send_file los
+    # manda con el file_wrapper del servidor (sendfile en gunicorn), sin comprimir nada
+    encoded = ASSETS.encodings(real)
+    enc = next((e for e in encoded if request.accept_encodings[e]), None)
+    if enc:
+        resp = send_from_directory(app.static_folder, encoded[enc], mimetype=mimetypes.guess_type(real)[0])
+        resp.content_encoding = enc
+    else:
+        resp = send_from_directory(app.static_folder, real)
+    if encoded:
+        resp.vary.add("Accept-Encoding")
+    if immutable:
+        resp.headers["Cache-Control"] = IMMUTABLE
+    return resp
+
+app.view_functions["static"] = static_file
+
+# Imágenes responsivas (python -m benessere.imagebuild); sin build se usa la original
+IMAGES = Manifest()
+
+@app.template_global()
+def picture(filename, alt="", width=960, sizes=None, cls=None, priority=False):
+    """``<picture>`` con WebP/JPEG en varios anchos; el navegador baja la
+    variante más chica que cubre ``sizes`` (por defecto ``width`` px).
+    ``priority`` para lo que se ve sin hacer scroll (hero, logo): se pide ya
+    y con prioridad alta en vez de ``loading="lazy"``."""
+    attrs = f' alt="{escape(alt)}"' + (f' class="{escape(cls)}"' if cls else "")
+    attrs += ' fetchpriority="high"' if priority else ""
+    entry = IMAGES.get(filename)
+    if entry is None:
+        return Markup(f'<img src="{url_for("static", filename="images/" + filename)}"{attrs}>')
+    sizes = sizes or f"{width}px"
+
+    def srcset(fmt):
+        return ", ".join(f'{url_for("static", filename="build/images/" + n)} {w}w' for w, n in entry[fmt])
+
+    src = url_for("static", filename="build/images/" + pick(entry, width))
+    return Markup(
+        f'<picture><source type="image/webp" srcset="{srcset("webp")}" sizes="{sizes}">'
+        f'<img src="{src}" srcset="{srcset("jpeg")}" sizes="{sizes}"'
+        f' width="{entry["width"]}" height="{entry["height"]}"{attrs}'
+        f' loading="{"eager" if priority else "lazy"}" decoding="async"'
+        f' style="background:url({entry["placeholder"]}) center/cover no-repeat"></picture>'
+    )
+
+# Páginas HTML: iguales para todos los visitantes, se renderizan una vez y se
+# sirven como bytes (con gzip y ETag) hasta que cambia el menú o una plantilla.
+TEMPLATE_DIR = os.path.join(app.root_path, app.template_folder)
+_templates = {"checked": None, "stamp": None}
+
+def _templates_stamp():
+    now = time.monotonic()
+    if _templates["checked"] is None or now - _templates["checked"] >= TEMPLATE_POLL:
+        stamp = []
+        for e in os.scandir(TEMPLATE_DIR):
+            if e.is_file():
+                st = e.stat()
+                stamp.append((e.name, st.st_mtime_ns, st.st_size))
+        # un build de imágenes o un estático modificado también cambian el HTML (srcset, huellas)
+        ASSETS.refresh()
+        stamp = (tuple(sorted(stamp)), IMAGES.stat_key(), ASSETS.version)
+        if stamp != _templates["stamp"]:
+            if _templates["stamp"] is not None and app.jinja_env.cache is not None:
+                app.jinja_env.cache.clear()     # sin auto_reload Jinja seguiría con la versión vieja
+            _templates["stamp"] = stamp
+        _templates["checked"] = now
+    return _templates["stamp"]
+
+PAGES = PageCache(lambda: (MENU_CACHE.snapshot()[0], _templates_stamp()))
+
+RENDER_SECONDS = metrics.REGISTRY.histogram(
+    "benessere_render_seconds", "Render de plantillas (sólo cuando la página no está en caché)", ("endpoint",),
+)
+
+def cached_page(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        def render():
+            with RENDER_SECONDS.time(request.endpoint):
+                return view(*args, **kwargs)
+        payload = PAGES.get(request.path, render)
+        return respond(payload, request)
+    wrapper.cached_page = True
+    return wrapper
+
+def prerender_pages():
+    """Renderiza todas las páginas cacheadas (p. ej. al arrancar, antes del fork)."""
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if getattr(view, "cached_page", False) and not rule.arguments:
+            with app.test_request_context(rule.rule):
+                view()
+
+def warm():
+    """Carga todo lo cacheable (menú, /api/menu, estáticos, plantillas, páginas).
+
+    gunicorn.conf.py la llama en el master antes del fork. Devuelve los segundos."""
+    t0 = time.perf_counter()
+    menu_payload()
+    ASSETS.refresh(force=True)
+    IMAGES.data()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    prerender_pages()
+    return time.perf_counter() - t0
+
+# -------- Métricas (/metrics, formato de texto de Prometheus) --------
+# Con varios workers cada uno vuelca lo suyo en BENESSERE_METRICS_DIR (cada 5 s)
+# y /metrics suma todos; sin esa variable, sólo el worker que atiende.
+METRICS_DIR = os.environ.get("BENESSERE_METRICS_DIR")
+METRICS_DUMP_EVERY = 5.0
+
+HTTP_SECONDS = metrics.REGISTRY.histogram(
+    "benessere_http_request_seconds", "Duración de las peticiones por ruta", ("endpoint",),
+)
+HTTP_BYTES = metrics.REGISTRY.histogram(
+    "benessere_http_response_bytes", "Tamaño del cuerpo de las respuestas", ("endpoint",),
+    buckets=metrics.SIZE_BUCKETS,
+)
+HTTP_REQUESTS = metrics.REGISTRY.counter(
+    "benessere_http_requests_total", "Peticiones por ruta y código de estado", ("endpoint", "status"),
+)
+metrics.REGISTRY.counter_func(
+    "benessere_menu_cache_total", "Consultas al caché del menú por resultado", ("result",),
+    lambda: {k: v for k, v in MENU_CACHE.stats().items() if k != "version"},
+)
+metrics.REGISTRY.counter_func(
+    "benessere_page_cache_total", "Caché de páginas HTML: aciertos, renders e invalidaciones", ("result",),
+    lambda: {k: v for k, v in PAGES.stats().items() if k != "pages"},
+)
+
+def _metrics_file():
+    return os.path.join(METRICS_DIR, f"flask-{os.getpid()}.json")
+
+def dump_metrics(every=0.0):
+    if METRICS_DIR:
+        try:
+            metrics.REGISTRY.dump(_metrics_file(), every)
+        except OSError:
+            pass        # sin volcado se pierde la suma entre workers, no la petición
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _observe(resp):
+    t0 = g.pop("t0", None)
+    if t0 is not None:
+        endpoint = request.endpoint or "none"
+        HTTP_SECONDS.observe(time.perf_counter() - t0, endpoint)
+        HTTP_REQUESTS.inc(endpoint, resp.status_code)
+        if resp.content_length is not None:
+            HTTP_BYTES.observe(resp.content_length, endpoint)
+        dump_metrics(METRICS_DUMP_EVERY)
+    return resp
 
 # Filtro Jinja para precios
 @app.template_filter("price")
@@ -63,27 +253,33 @@ def inject_globals():
 
 # -------- Rutas --------
 @app.route("/")
+@cached_page
 def index():
     items = load_menu()
     return render_template("index.html", menu=items)
 
 @app.route("/menu")
+@cached_page
 def menu():
     return render_template("menu.html", menu=load_menu())
 
 @app.route("/marca")
+@cached_page
 def brand():
     return render_template("brand.html")
 
 @app.route("/ubicacion")
+@cached_page
 def location():
     return render_template("location.html")
 
 @app.route("/detalles")
+@cached_page
 def details():
     return render_template("details.html")
 
 @app.route("/nosotros")
+@cached_page
 def about():
     # Puedes mostrar el equipo en esta misma plantilla.
     # Asegúrate de que 'nosotros.html' lo renderice (ver instrucción debajo).
@@ -96,7 +292,189 @@ def about():
 
 @app.route("/api/menu")
 def menu_api():
-    return jsonify(load_menu())
+    return respond(menu_payload(), request, MENU_API_CACHE)
+
+# -------- API de fidelización (JSON) --------
+# Mismas reglas (benessere.loyalty) y misma base que streamlit_app.py, sin
+# rerun del script: cada acción es una transacción y una respuesta chica.
+_loyalty = {"pid": None, "db": None}
+_loyalty_lock = threading.Lock()
+
+def loyalty_db():
+    """La base de fidelización de este proceso; se abre en el primer uso, ya
+    dentro del worker (una conexión SQLite no sobrevive al fork)."""
+    if _loyalty["pid"] != os.getpid():
+        with _loyalty_lock:
+            if _loyalty["pid"] != os.getpid():
+                _loyalty["db"], _loyalty["pid"] = open_store(), os.getpid()
+    return _loyalty["db"]
+
+def _user_json(u, db):
+    return {
+        "id": u["id"],
+        "name": u.get("name", ""),
+        "points": int(u.get("points", 0)),
+        "ref_code": u.get("ref_code"),
+        "referrals": len(db.referrals().referrals(u["id"])),
+        "last_spin": u.get("last_spin"),
+        "can_spin": can_spin_today(u),
+        "rank": user_rank(db, u),
+        "coupons": u.get("coupons", []),
+    }
+
+def _api_error(msg, status):
+    return json_response({"error": msg}, status)
+
+def _api_body():
+    """``(datos, error)``: el cuerpo JSON tiene que ser un objeto (o faltar)."""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}, None
+    if not isinstance(data, dict):
+        return None, _api_error("El cuerpo debe ser un objeto JSON", 400)
+    return data, None
+
+def _api_user(data):
+    """``(usuario, base, error)`` a partir del ``uid`` del cuerpo JSON."""
+    uid = str(data.get("uid", "")).strip()
+    if not uid:
+        return None, None, _api_error("Falta uid", 400)
+    db = loyalty_db()
+    u = db.get_user(uid)
+    if u is None:
+        return None, None, _api_error("Usuario no encontrado", 404)
+    return u, db, None
+
+@app.route("/api/login", methods=["POST"])
+def api_login():
+    data, err = _api_body()
+    if err:
+        return err
+    name = str(data.get("name", "")).strip()
+    if not name:
+        return _api_error("Ingresa tu nombre o celular", 400)
+    db = loyalty_db()
+    u = get_user(db, _uid(name))
+    ref_msg = None
+    if not u["name"]:
+        set_name(u, db, name)
+        if str(data.get("ref") or "").strip():       # código de referido, sólo al registrarse
+            ok, msg = set_referrer(u, db, data["ref"])
+            ref_msg = None if ok else msg
+    out = _user_json(u, db)
+    if ref_msg:
+        out["ref_error"] = ref_msg
+    return json_response(out)
+
+@app.route("/api/users/<uid>")
+def api_user(uid):
+    db = loyalty_db()
+    u = db.get_user(uid)
+    if u is None:
+        return _api_error("Usuario no encontrado", 404)
+    return json_response(_user_json(u, db))
+
+@app.route("/api/spin", methods=["POST"])
+def api_spin():
+    data, err = _api_body()
+    if err:
+        return err
+    u, db, err = _api_user(data)
+    if err:
+        return err
+    prize, msg = spin(u, db)
+    if prize is None:
+        return _api_error(msg, 409)
+    # "index" para que el cliente anime la ruleta hasta ese sector; el cupón
+    # entregado (si hubo) es el último de la lista, con su código propio
+    return json_response({
+        "prize": {"index": prize["slot"], "label": prize["label"], "points": prize["points"],
+                  "coupon": u["coupons"][-1]["code"] if prize["coupon"] else None},
+        "user": _user_json(u, db),
+    })
+
+@app.route("/api/redeem", methods=["POST"])
+def api_redeem():
+    data, err = _api_body()
+    if err:
+        return err
+    u, db, err = _api_user(data)
+    if err:
+        return err
+    name = data.get("item")
+    item = next((it for it in REDEEM_ITEMS if it["name"] == name), None)
+    if item is None:
+        return _api_error("Producto desconocido", 400)
+    ok, code = redeem(u, db, item)
+    if not ok:
+        return _api_error(code, 409)
+    return json_response({"coupon": code, "user": _user_json(u, db)})
+
+# Kiosco: validar y canjear cupones por código. Sólo con BENESSERE_KIOSK_TOKEN
+# configurado y enviado en la cabecera X-Kiosk-Token.
+KIOSK_TOKEN = os.environ.get("BENESSERE_KIOSK_TOKEN", "")
+
+def _kiosk_denied():
+    if not KIOSK_TOKEN:
+        return _api_error("Kiosco no configurado", 403)
+    if not hmac.compare_digest(request.headers.get("X-Kiosk-Token", ""), KIOSK_TOKEN):
+        return _api_error("Token de kiosco inválido", 403)
+    return None
+
+def _coupon_json(ok, c, msg, status_fail):
+    if c is None:
+        return _api_error(msg, 404)
+    body = {"ok": ok, "message": msg, "coupon": c}
+    return json_response(body, 200 if ok else status_fail)
+
+@app.route("/api/coupons/<code>")
+def api_coupon(code):
+    denied = _kiosk_denied()
+    if denied:
+        return denied
+    return _coupon_json(*check_coupon(loyalty_db(), code), 200)
+
+@app.route("/api/coupons/<code>/use", methods=["POST"])
+def api_coupon_use(code):
+    denied = _kiosk_denied()
+    if denied:
+        return denied
+    return _coupon_json(*use_coupon(loyalty_db(), code), 409)
+
+@app.route("/api/leaderboard")
+def api_leaderboard():
+    n = min(max(request.args.get("n", 10, type=int), 1), 100)
+    top = leaderboard(loyalty_db(), top_n=n)
+    return json_response(
+        [{"rank": i, "name": u.get("name", ""), "points": int(u.get("points", 0))} for i, u in enumerate(top, 1)],
+        cache_control="no-cache",
+    )
+
+@app.route("/api/rewards")
+def api_rewards():
+    """Premios de la ruleta y catálogo de canje (para dibujar la UI)."""
+    return json_response({
+        "spin": [{"label": r["label"], "points": r["points"], "coupon": r["coupon"]} for r in SPIN_REWARDS],
+        "redeem": [{"name": it["name"], "cost": it["cost"]} for it in REDEEM_ITEMS],
+    }, cache_control="public, max-age=300")
+
+# Perfilado por muestreo (BENESSERE_PROFILE=0.05 -> ~5% de las peticiones); apagado no se instala
+if profiling.RATE:
+    app.wsgi_app = profiling.WSGIProfiler(app.wsgi_app)
+
+@app.route("/metrics")
+def metrics_view():
+    others = ()
+    if METRICS_DIR:
+        others = metrics.load_snapshots(os.path.join(METRICS_DIR, "flask-*.json"), exclude=_metrics_file())
+    return Response(
+        metrics.REGISTRY.render(others),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+        headers={"Cache-Control": "no-store"},
+    )
+
+if os.environ.get("BENESSERE_PRERENDER") == "1":
+    prerender_pages()
 
 if __name__ == "__main__":
     app.run(debug=True)
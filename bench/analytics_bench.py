@@ -0,0 +1,142 @@
+"""Resúmenes del libro: bucle de Python sobre todo el historial vs. ``Rollups``.
+
+Uso::
+
+    python bench/analytics_bench.py                        # 10M movimientos, 180 días
+    python bench/analytics_bench.py --events 1000000 --days 60
+
+Arma un libro sintético en un directorio temporal (segmentos ya compactados en
+``archive/`` más uno vivo, como en producción) y mide:
+
+- ``loop``: recorrer ``ledger.scan()`` y sumar en dicts (lo que costaría
+  recalcular los tableros desde cero cada vez).
+- ``full``: ``Rollups().update(ledger)`` desde la posición 0.
+- ``incremental``: un día más de movimientos y ``analytics.refresh`` (cargar
+  el ``.npz``, leer sólo lo nuevo, guardar).
+- ``report``: ``summary`` de los últimos 30 días.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere import analytics  # noqa: E402
+from benessere.ledger import SEGMENT_BYTES, Ledger, _seg_name  # noqa: E402
+from benessere.loyalty import REDEEM_ITEMS, SPIN_REASON, SPIN_REWARDS  # noqa: E402
+
+CHALLENGES = ["pasos", "actividad física (foto)", "comida saludable (foto)"]
+
+
+def _day_lines(day, n, users, rnd):
+    """``n`` movimientos de un día con la mezcla de motivos de la app."""
+    spins = [(f"{SPIN_REASON}: {p['label']}", p["points"]) for p in SPIN_REWARDS]
+    weights = [p["w"] for p in SPIN_REWARDS]
+    out = []
+    for _ in range(n):
+        uid = f"{rnd.randrange(users):012x}"
+        ts = f"{day}T{rnd.randrange(8, 22):02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}+00:00"
+        x = rnd.random()
+        if x < 0.35:
+            reason, delta = rnd.choices(spins, weights)[0]
+        elif x < 0.8:
+            reason, delta = analytics.CHALLENGE_PREFIX + rnd.choice(CHALLENGES), 30
+        elif x < 0.95:
+            reason, delta = "Compra", rnd.randrange(10, 400)
+        else:
+            item = rnd.choice(REDEEM_ITEMS)
+            reason, delta = analytics.REDEEM_PREFIX + item["name"], -item["cost"]
+        out.append(json.dumps([ts, uid, delta, reason], ensure_ascii=False, separators=(",", ":")) + "\n")
+    return "".join(out).encode("utf-8")
+
+
+def synthetic_ledger(path, events, days, users, seed=1):
+    """Escribe ``events`` movimientos en ``days`` días; devuelve el último día."""
+    rnd = random.Random(seed)
+    archive = path / "archive"
+    archive.mkdir(parents=True)
+    first = date.today() - timedelta(days=days)
+    per_day = events // days
+    seq, buf = 1, b""
+    for i in range(days):
+        buf += _day_lines(first + timedelta(days=i), per_day, users, rnd)
+        while len(buf) >= SEGMENT_BYTES:
+            cut = buf.rfind(b"\n", 0, SEGMENT_BYTES) + 1
+            with gzip.open(archive / (_seg_name(seq) + ".gz"), "wb", compresslevel=1) as f:
+                f.write(buf[:cut])
+            seq, buf = seq + 1, buf[cut:]
+    # lo archivado ya está en la foto; lo que sobra queda en el segmento vivo
+    (path / "snapshot.json").write_text(json.dumps({"seq": seq - 1, "balances": {}, "recent": {}}))
+    (path / _seg_name(seq)).write_bytes(buf)
+    return first + timedelta(days=days - 1), per_day
+
+
+def python_loop(ledger):
+    pts, n = Counter(), Counter()
+    active = defaultdict(set)
+    for e in ledger.scan():
+        day = e["ts"][:10]
+        pts[day, e["reason"]] += e["delta"]
+        n[day, e["reason"]] += 1
+        active[day].add(e["uid"])
+    return pts, n, {d: len(s) for d, s in active.items()}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--events", type=int, default=10_000_000)
+    ap.add_argument("--days", type=int, default=180)
+    ap.add_argument("--users", type=int, default=100_000)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t = time.perf_counter()
+        last, per_day = synthetic_ledger(tmp / "ledger", args.events, args.days, args.users)
+        print(f"libro sintético: {args.events:,} movimientos en {args.days} días "
+              f"({time.perf_counter() - t:.0f} s para generarlo)")
+        ledger = Ledger(tmp / "ledger")
+
+        t = time.perf_counter()
+        pts, n, active = python_loop(ledger)
+        loop_s = time.perf_counter() - t
+        del pts, n
+
+        t = time.perf_counter()
+        r = analytics.Rollups()
+        r.update(ledger)
+        full_s = time.perf_counter() - t
+        npz = tmp / "rollups.npz"
+        r.save(npz)
+        check = dict(zip(r.days(), r.active.tolist()))
+        assert all(check[d] == k for d, k in active.items()), "usuarios activos distintos"
+
+        ledger.append_many(
+            tuple(json.loads(line)) for line in _day_lines(last + timedelta(days=1), per_day, args.users,
+                                                          random.Random(2)).splitlines()
+        )
+        t = time.perf_counter()
+        r = analytics.refresh(ledger, npz)
+        inc_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        r.summary(r.days()[-30])
+        report_ms = (time.perf_counter() - t) * 1e3
+        ledger.close()
+
+    print(f"  bucle de Python (scan + dicts)    {loop_s:8.2f} s")
+    print(f"  Rollups desde cero (NumPy)        {full_s:8.2f} s   ({loop_s / full_s:.1f}x)")
+    print(f"  + 1 día ({per_day:,} mov.), refresh  {inc_s * 1e3:8.0f} ms")
+    print(f"  summary de 30 días                {report_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Un giro de ruleta: API JSON de Flask vs. rerun de Streamlit.
+
+Uso::
+
+    python bench/api_bench.py
+    python bench/api_bench.py --spins 50
+
+Ambos lados usan una base nueva en un directorio temporal (``BENESSERE_DB``)
+y un usuario nuevo por giro (se puede girar una vez por día):
+
+- API: ``POST /api/login`` y luego se cronometra ``POST /api/spin`` contra
+  gunicorn local (conexión nueva por petición, como un cliente simple).
+- Streamlit: ``AppTest`` en la página Recompensas; se inicia sesión y se
+  cronometra el rerun completo que dispara el botón «Girar la ruleta».
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from http_bench import ROOT, _free_port, request, start_gunicorn, stop  # noqa: E402
+
+
+def _summary(lat):
+    lat = sorted(lat)
+    return {
+        "p50_ms": statistics.median(lat) * 1e3,
+        "p99_ms": lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1e3,
+        "mean_ms": statistics.mean(lat) * 1e3,
+    }
+
+
+def bench_api(app_dir, spins, db_path):
+    env = dict(os.environ, BENESSERE_DB=str(db_path))
+    port = _free_port()
+    proc = start_gunicorn(app_dir, port, None, env=env)
+    headers = {"Content-Type": "application/json"}
+    lat, size = [], 0
+    try:
+        for i in range(spins + 1):
+            _, _, body = request(port, "/api/login", headers, "POST", json.dumps({"name": f"api-{i}"}))
+            uid = json.loads(body)["id"]
+            t = time.perf_counter()
+            status, _, body = request(port, "/api/spin", headers, "POST", json.dumps({"uid": uid}))
+            dt = time.perf_counter() - t
+            assert status == 200, body
+            if i:                       # el primero abre la base en el worker
+                lat.append(dt)
+                size += len(body)
+    finally:
+        stop(proc)
+    return {**_summary(lat), "bytes": size / len(lat)}
+
+
+def bench_streamlit(app_dir, spins, db_path):
+    os.environ["BENESSERE_DB"] = str(db_path)
+    from streamlit.testing.v1 import AppTest
+
+    app = str(Path(app_dir, "streamlit_app.py").resolve())
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        at = AppTest.from_file(app, default_timeout=60).run()
+        at.sidebar.radio[0].set_value("Recompensas").run()
+        lat = []
+        for i in range(spins + 1):
+            at.sidebar.text_input[0].input(f"st-{i}")
+            at.sidebar.button[0].click().run()
+            button = next(b for b in at.button if b.label.startswith("🎡"))
+            t = time.perf_counter()
+            button.click().run()
+            dt = time.perf_counter() - t
+            assert not at.exception, at.exception
+            if i:
+                lat.append(dt)
+    finally:
+        os.chdir(cwd)
+    return _summary(lat)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--app-dir", default=str(ROOT))
+    ap.add_argument("--spins", type=int, default=30)
+    args = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        api = bench_api(args.app_dir, args.spins, Path(tmp) / "api.db")
+        st = bench_streamlit(args.app_dir, args.spins, Path(tmp) / "st.db")
+    print(f"--- {args.spins} giros, un usuario nuevo por giro ---")
+    print(f"  API  POST /api/spin   p50 {api['p50_ms']:7.2f} ms   p99 {api['p99_ms']:7.2f} ms"
+          f"   {api['bytes']:.0f} bytes/resp")
+    print(f"  Streamlit (rerun)     p50 {st['p50_ms']:7.2f} ms   p99 {st['p99_ms']:7.2f} ms")
+    print(f"  -> la API es {st['p50_ms'] / api['p50_ms']:.0f}x más rápida (mediana)")
+
+
+if __name__ == "__main__":
+    main()
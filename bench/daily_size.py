@@ -0,0 +1,64 @@
+"""Memoria y tamaño serializado de los retos diarios: dict por día (antes) vs. DailyLog.
+
+Uso::
+
+    python bench/daily_size.py                    # 1.000 usuarios x 180 días
+    python bench/daily_size.py --users 5000 --days 365
+"""
+
+import argparse
+import json
+import random
+import sys
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere.daily import FLAGS, RETENTION_DAYS, DailyLog  # noqa: E402
+
+
+def _legacy(days, rnd):
+    # formato anterior: u["daily"][fecha] = {reto: bool}
+    return {d: {f: rnd.random() < 0.5 for f in FLAGS} for d in days}
+
+
+def _compact(legacy, today):
+    log = DailyLog.from_dict(legacy)
+    log.roll_up(today)
+    return log
+
+
+def _measure(build):
+    tracemalloc.start()
+    obj = build()
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, mem
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--days", type=int, default=180)
+    args = ap.parse_args(argv)
+
+    today = date(2026, 6, 30)
+    days = [(today - timedelta(days=k)).isoformat() for k in range(args.days)][::-1]
+
+    rnd = random.Random(1)
+    legacy, mem_old = _measure(lambda: [_legacy(days, rnd) for _ in range(args.users)])
+    compact, mem_new = _measure(lambda: [_compact(d, today.isoformat()) for d in legacy])
+
+    json_old = len(json.dumps(legacy, ensure_ascii=False, indent=2).encode())
+    json_new = len(json.dumps([c.to_dict() for c in compact], ensure_ascii=False, indent=2).encode())
+
+    print(f"{args.users:,} usuarios x {args.days} días (ventana {RETENTION_DAYS} días)")
+    print(f"  memoria     : {mem_old / 1e6:8.2f} MB -> {mem_new / 1e6:8.2f} MB  ({mem_old / max(mem_new, 1):.0f}x)")
+    print(f"  JSON indent : {json_old / 1e6:8.2f} MB -> {json_new / 1e6:8.2f} MB  ({json_old / max(json_new, 1):.0f}x)")
+    print(f"  por usuario : {json_old / args.users:8.0f} B  -> {json_new / args.users:8.0f} B")
+
+
+if __name__ == "__main__":
+    main()
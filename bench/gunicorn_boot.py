@@ -0,0 +1,125 @@
+"""Arranque de gunicorn: sin configuración vs. ``gunicorn.conf.py``.
+
+Uso::
+
+    python bench/gunicorn_boot.py
+    python bench/gunicorn_boot.py --workers 3 --runs 3
+
+Para cada variante (mismo número de workers) mide:
+
+- arranque: desde lanzar gunicorn hasta la primera respuesta de ``/``;
+- primera petición: latencia de esa primera respuesta y la peor de las
+  primeras peticiones a cada ruta (workers y cachés en frío);
+- memoria por worker: RSS y PSS (``/proc/<pid>/smaps_rollup``; la PSS reparte
+  las páginas compartidas por copy-on-write entre los procesos que las usan).
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from http_bench import ROOT, _free_port, _pids, request, start_gunicorn, stop  # noqa: E402
+
+PATHS = ["/", "/menu", "/marca", "/ubicacion", "/detalles", "/nosotros", "/api/menu"]
+
+
+def _mem_kb(pid):
+    """``(rss, pss)`` en KB; PSS es None si el kernel no la expone."""
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1])
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def _wait_workers(pid, n, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        workers = _pids(pid)[1:]
+        if len(workers) >= n:
+            return workers
+        time.sleep(0.05)
+    return _pids(pid)[1:]
+
+
+def boot(app_dir, workers, config, env):
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = start_gunicorn(app_dir, port, None if config else workers, config=config, env=env)
+    try:
+        while True:
+            t = time.perf_counter()
+            try:
+                status, _, _ = request(port, "/")
+            except (OSError, socket.timeout):
+                time.sleep(0.02)
+                continue
+            if status == 200:
+                break
+        first = time.perf_counter() - t
+        booted = time.perf_counter() - t0
+        pids = _wait_workers(proc.pid, workers)
+        cold = []
+        for _ in range(workers):            # cada ruta una vez por worker (aprox.)
+            for path in PATHS:
+                t = time.perf_counter()
+                request(port, path)
+                cold.append(time.perf_counter() - t)
+        mem = [_mem_kb(p) for p in pids]
+        return {
+            "boot_ms": booted * 1e3,
+            "first_ms": first * 1e3,
+            "cold_max_ms": max(cold) * 1e3,
+            "workers": len(pids),
+            "rss_kb": statistics.mean(m[0] for m in mem) if mem and mem[0][0] else None,
+            "pss_kb": statistics.mean(m[1] for m in mem) if mem and mem[0][1] else None,
+        }
+    finally:
+        stop(proc)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--app-dir", default=str(ROOT))
+    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as empty:
+        variants = [("sin configuración (sync)", empty.name)]
+        conf = Path(args.app_dir) / "gunicorn.conf.py"
+        if conf.exists():
+            variants.append(("gunicorn.conf.py", str(conf)))
+        env = dict(os.environ, WEB_CONCURRENCY=str(args.workers))
+        print(f"--- {args.app_dir}: {args.workers} workers, mediana de {args.runs} arranques ---")
+        for name, config in variants:
+            runs = [boot(args.app_dir, args.workers, config, env) for _ in range(args.runs)]
+
+            def med(k):
+                vals = [r[k] for r in runs if r[k] is not None]
+                return statistics.median(vals) if vals else float("nan")
+
+            print(
+                f"  {name:<26} arranque {med('boot_ms'):7.0f} ms   1ª petición {med('first_ms'):7.1f} ms"
+                f"   peor en frío {med('cold_max_ms'):7.1f} ms   RSS {med('rss_kb') / 1024:5.1f} MB"
+                f"   PSS {med('pss_kb') / 1024:5.1f} MB por worker"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Peticiones/segundo de la web Flask servida con gunicorn local.
+
+Uso::
+
+    python bench/http_bench.py                               # /api/menu
+    python bench/http_bench.py --path / --path /menu --seconds 5
+    # otra versión del código (antes/después):
+    git worktree add /tmp/antes HEAD~1
+    python bench/http_bench.py --app-dir /tmp/antes
+
+Cada ruta se mide en tres variantes: sin cabeceras, con ``Accept-Encoding:
+gzip`` y revalidando con ``If-None-Match`` (si la respuesta trae ETag).
+Reporta peticiones/s, latencia p50/p99 y CPU del servidor por petición.
+"""
+
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(app_dir, port, workers, extra=(), config=None, env=None):
+    """gunicorn corriendo en ``app_dir``; sin ``config`` usa el ``gunicorn.conf.py``
+    de ese árbol si lo tiene (como en producción)."""
+    cmd = [
+        sys.executable, "-m", "gunicorn", "app:app", "--chdir", str(app_dir),
+        "-b", f"127.0.0.1:{port}", "--log-level", "warning", *extra,
+    ]
+    if config:
+        cmd += ["-c", str(config)]
+    if workers:
+        cmd += ["-w", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=app_dir, start_new_session=True, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    stop(proc)
+    raise RuntimeError("gunicorn no arrancó")
+
+
+def stop(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    proc.wait(timeout=30)
+
+
+def request(port, path, headers=None, method="GET", body=None):
+    c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    c.request(method, path, body=body, headers=headers or {})
+    r = c.getresponse()
+    body = r.read()
+    c.close()
+    return r.status, dict(r.getheaders()), body
+
+
+def _pids(pid):
+    """El proceso y sus descendientes (Linux, vía /proc)."""
+    out = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                for child in f.read().split():
+                    out += _pids(int(child))
+    except OSError:
+        pass
+    return out
+
+
+def server_cpu(pid):
+    """Segundos de CPU (usuario + sistema) de gunicorn y sus workers; None fuera de Linux."""
+    if not os.path.isdir("/proc"):
+        return None
+    total = 0
+    for p in _pids(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        total += int(fields[11]) + int(fields[12])      # utime + stime
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+def load(port, path, headers, seconds, clients, pid=None):
+    """Con ``clients`` hilos durante ``seconds`` (una conexión por petición):
+    ``{"rps", "bytes", "p50_ms", "p99_ms", "cpu_ms"}`` (CPU del servidor por petición)."""
+    lat = [[] for _ in range(clients)]
+    sizes = [0] * clients
+    stop_at = time.perf_counter() + seconds
+
+    def worker(i):
+        while time.perf_counter() < stop_at:
+            t = time.perf_counter()
+            _, _, body = request(port, path, headers)
+            lat[i].append(time.perf_counter() - t)
+            sizes[i] += len(body)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    cpu0 = server_cpu(pid) if pid else None
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    cpu1 = server_cpu(pid) if pid else None
+    all_lat = sorted(x for l in lat for x in l)
+    n = max(1, len(all_lat))
+    return {
+        "rps": len(all_lat) / elapsed,
+        "bytes": sum(sizes) / n,
+        "p50_ms": all_lat[n // 2] * 1e3 if all_lat else 0.0,
+        "p99_ms": all_lat[min(n - 1, int(n * 0.99))] * 1e3 if all_lat else 0.0,
+        "cpu_ms": (cpu1 - cpu0) * 1e3 / n if cpu0 is not None else None,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--app-dir", default=str(ROOT))
+    ap.add_argument("--path", action="append")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args(argv)
+    paths = args.path or ["/api/menu"]
+
+    port = _free_port()
+    proc = start_gunicorn(args.app_dir, port, args.workers)
+    try:
+        print(f"--- {args.app_dir} (gunicorn -w {args.workers}, {args.clients} clientes) ---")
+        for path in paths:
+            status, headers, _ = request(port, path)
+            variants = [("sin cabeceras", {}), ("gzip", {"Accept-Encoding": "gzip"})]
+            if "ETag" in headers:
+                variants.append(("If-None-Match", {"If-None-Match": headers["ETag"]}))
+            for name, h in variants:
+                load(port, path, h, 0.3, args.clients)         # calentar
+                r = load(port, path, h, args.seconds, args.clients, proc.pid)
+                cpu = "" if r["cpu_ms"] is None else f"   CPU {r['cpu_ms']:5.2f} ms/req"
+                print(
+                    f"  {path:<12} {name:<14} {r['rps']:7.0f} req/s   p50 {r['p50_ms']:6.2f} ms"
+                    f"   p99 {r['p99_ms']:6.2f} ms{cpu}   {r['bytes']:7.0f} bytes/resp"
+                )
+    finally:
+        stop(proc)
+
+
+if __name__ == "__main__":
+    main()
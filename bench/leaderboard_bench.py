@@ -0,0 +1,80 @@
+"""Benchmark del ranking: ordenar todos los usuarios (como antes) vs. LeaderboardIndex.
+
+Uso::
+
+    python bench/leaderboard_bench.py                 # 100k y 1M usuarios
+    python bench/leaderboard_bench.py --users 50000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere.leaderboard import LeaderboardIndex  # noqa: E402
+
+
+def _sort_leaderboard(users, top_n=10):
+    # implementación anterior de leaderboard()
+    users = list(users.values())
+    users.sort(key=lambda x: x.get("points", 0), reverse=True)
+    return users[:top_n]
+
+
+def _sort_rank(users, uid):
+    ranked = sorted(users.values(), key=lambda x: x.get("points", 0), reverse=True)
+    return next(i for i, u in enumerate(ranked, 1) if u["id"] == uid)
+
+
+def _per_call(fn, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) / reps
+
+
+def run(n, seed=7):
+    rnd = random.Random(seed)
+    users = {f"u{i:07d}": {"id": f"u{i:07d}", "name": "", "points": rnd.randint(0, 20000)} for i in range(n)}
+    uids = list(users)
+
+    t0 = time.perf_counter()
+    ix = LeaderboardIndex((uid, u["points"]) for uid, u in users.items())
+    t_build = time.perf_counter() - t0
+
+    reps = 3 if n >= 1_000_000 else 10
+    t_sort_top = _per_call(lambda: _sort_leaderboard(users), reps)
+    t_sort_rank = _per_call(lambda: _sort_rank(users, rnd.choice(uids)), reps)
+    t_ix_top = _per_call(lambda: ix.top(10), 10_000)
+    t_ix_rank = _per_call(lambda: ix.rank(rnd.choice(uids)), 10_000)
+
+    def upd():
+        uid = rnd.choice(uids)
+        ix.update(uid, ix.points(uid) + rnd.randint(-100, 500))
+    t_ix_upd = _per_call(upd, 10_000)
+
+    assert [p for _, p in ix.top(10)] == [u["points"] for u in _sort_leaderboard(
+        {uid: {"id": uid, "points": ix.points(uid)} for uid in uids})]
+
+    print(f"--- {n:,} usuarios ---")
+    print(f"  construir índice (1 pasada) : {t_build * 1e3:10.1f} ms")
+    print(f"  top-10  ordenando todo      : {t_sort_top * 1e3:10.1f} ms")
+    print(f"  top-10  índice              : {t_ix_top * 1e6:10.1f} µs")
+    print(f"  rango   ordenando todo      : {t_sort_rank * 1e3:10.1f} ms")
+    print(f"  rango   índice              : {t_ix_rank * 1e6:10.1f} µs")
+    print(f"  update  índice              : {t_ix_upd * 1e6:10.1f} µs")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, nargs="*", default=[100_000, 1_000_000])
+    args = ap.parse_args(argv)
+    for n in args.users:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark de fotos repetidas: comparar contra todas (como sería sin índice) vs. MultiIndexHash.
+
+Uso::
+
+    python bench/phash_bench.py                  # 100k y 500k fotos
+    python bench/phash_bench.py --photos 200000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere.phash import RADIUS, MultiIndexHash  # noqa: E402
+
+
+def _linear(hashes, q, radius=RADIUS):
+    best = None
+    for i, h in enumerate(hashes):
+        d = (h ^ q).bit_count()
+        if d <= radius and (best is None or d < best[0]):
+            best = (d, i)
+    return best
+
+
+def _flip(h, rnd, k):
+    for b in rnd.sample(range(64), k):
+        h ^= 1 << b
+    return h
+
+
+def run(n, seed=7):
+    rnd = random.Random(seed)
+    hashes = [rnd.getrandbits(64) for _ in range(n)]
+
+    t0 = time.perf_counter()
+    ix = MultiIndexHash()
+    for i, h in enumerate(hashes):
+        ix.add(h, i)
+    t_build = time.perf_counter() - t0
+
+    # mitad casi-duplicados (0..RADIUS bits cambiados), mitad fotos nuevas
+    queries = [_flip(rnd.choice(hashes), rnd, rnd.randint(0, RADIUS)) for _ in range(100)]
+    queries += [rnd.getrandbits(64) for _ in range(100)]
+
+    reps = 10 if n >= 500_000 else 20
+    t0 = time.perf_counter()
+    expected = [_linear(hashes, q) for q in queries[:reps]]
+    t_lin = (time.perf_counter() - t0) / reps
+
+    t0 = time.perf_counter()
+    got = [ix.nearest(q) for q in queries]
+    t_ix = (time.perf_counter() - t0) / len(queries)
+
+    for e, g in zip(expected, got):
+        assert (e is None) == (g is None) and (e is None or e[0] == g[0])
+    hits = sum(g is not None for g in got[:100])
+    assert hits == 100, hits
+
+    print(f"--- {n:,} fotos (radio {RADIUS}) ---")
+    print(f"  construir índice      : {t_build * 1e3:10.1f} ms")
+    print(f"  consulta comparando   : {t_lin * 1e3:10.1f} ms")
+    print(f"  consulta índice       : {t_ix * 1e3:10.3f} ms")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--photos", type=int, nargs="*", default=[100_000, 500_000])
+    args = ap.parse_args(argv)
+    for n in args.photos:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
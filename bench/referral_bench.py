@@ -0,0 +1,97 @@
+"""Referidos: búsqueda de códigos, armado del grafo y bonos por ganancia.
+
+Uso::
+
+    python bench/referral_bench.py                  # 200k usuarios
+    python bench/referral_bench.py --users 1000000
+
+Arma una base SQLite temporal con ``--users`` usuarios; el 70% llegó con el
+código de alguien anterior (árbol al azar, con cadenas largas). Mide:
+
+- ``lookup``: resolver un código recorriendo la tabla (``NOT INDEXED``, como
+  sin el índice único) vs. ``find_ref_code``.
+- ``rebuild``: ``ReferralGraph`` desde la base en una pasada.
+- ``earn``: ``loyalty.add_points`` de un usuario sin referidor vs. uno con tres
+  niveles arriba (la ganancia + los tres bonos).
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere import loyalty  # noqa: E402
+from benessere.referrals import ReferralGraph  # noqa: E402
+from benessere.store import SQLiteStore  # noqa: E402
+
+
+def synthetic_users(n, seed=1):
+    rnd = random.Random(seed)
+    users = {}
+    ids = [f"{i:012x}" for i in range(n)]
+    for i, uid in enumerate(ids):
+        ref = ids[rnd.randrange(i)] if i and rnd.random() < 0.7 else None
+        users[uid] = {"name": f"user{i}", "points": 0, "created": "2024-01-01T00:00:00",
+                      "ref_code": f"R{i:07X}", "referred_by": ref}
+    return users
+
+
+def per_call_us(fn, args, reps=1):
+    out = []
+    for a in args:
+        t = time.perf_counter()
+        for _ in range(reps):
+            fn(a)
+        out.append((time.perf_counter() - t) / reps * 1e6)
+    return statistics.median(out)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=200_000)
+    ap.add_argument("--samples", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        users = synthetic_users(args.users)
+        store = SQLiteStore(Path(tmp) / "loyalty.db")
+        store.import_legacy({"users": users})
+        rnd = random.Random(2)
+        codes = [u["ref_code"] for u in rnd.sample(list(users.values()), 20)]
+
+        scan = per_call_us(
+            lambda code: store._db().execute("SELECT id FROM users NOT INDEXED WHERE ref_code = ?", (code,)).fetchone(),
+            codes[:5],
+        )
+        idx = per_call_us(store.find_ref_code, codes, reps=50)
+
+        t = time.perf_counter()
+        graph = ReferralGraph(store._all_referrals())
+        rebuild_s = time.perf_counter() - t
+        depth = max(len(graph.ancestors(uid, None)) for uid in rnd.sample(list(users), 2000))
+
+        roots = [uid for uid, u in users.items() if u["referred_by"] is None]
+        deep = [uid for uid in users if len(graph.ancestors(uid)) == 3]
+        store.referrals()
+        plain = [store.get_user(uid) for uid in rnd.sample(roots, args.samples)]
+        chained = [store.get_user(uid) for uid in rnd.sample(deep, args.samples)]
+        earn = lambda u: loyalty.add_points(u, store, 100, "Compra")  # noqa: E731
+        plain_us = per_call_us(earn, plain)
+        chained_us = per_call_us(earn, chained)
+        store.close()
+
+    print(f"{args.users:,} usuarios, {len(graph):,} con referidor (cadena más larga vista: {depth})")
+    print(f"  lookup recorriendo la tabla   {scan:10.1f} µs")
+    print(f"  lookup con índice único       {idx:10.1f} µs   ({scan / idx:,.0f}x)")
+    print(f"  grafo desde la base (1 pasada) {rebuild_s * 1e3:9.0f} ms")
+    print(f"  add_points sin referidor      {plain_us:10.0f} µs")
+    print(f"  add_points con 3 niveles      {chained_us:10.0f} µs   (+{chained_us - plain_us:.0f} µs por 3 bonos)")
+
+
+if __name__ == "__main__":
+    main()
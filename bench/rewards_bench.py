@@ -0,0 +1,59 @@
+"""Sorteo de la ruleta: ``random.choices`` + ``labels.index`` (antes) vs. ``RewardTable``.
+
+Uso::
+
+    python bench/rewards_bench.py
+    python bench/rewards_bench.py --reps 500000 --bulk 50000000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere.loyalty import SPIN_REWARDS, SPIN_TABLE  # noqa: E402
+
+
+def _legacy(rng):
+    # lo que hacía el botón de Streamlit en cada clic
+    weights = [r.get("w", 1) for r in SPIN_REWARDS]
+    prize = rng.choices(SPIN_REWARDS, weights=weights, k=1)[0]
+    labels = [r["label"] for r in SPIN_REWARDS]
+    return labels.index(prize["label"])
+
+
+def _table(rng):
+    return SPIN_TABLE.draw(rng)["slot"]
+
+
+def _per_call(fn, reps):
+    rng = random.Random(1)
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn(rng)
+    return (time.perf_counter() - t0) / reps
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--reps", type=int, default=200_000)
+    ap.add_argument("--bulk", type=int, default=10_000_000, help="giros para la simulación con NumPy")
+    args = ap.parse_args(argv)
+
+    legacy = _per_call(_legacy, args.reps)
+    table = _per_call(_table, args.reps)
+    SPIN_TABLE.simulate(1000, 0)        # importar numpy fuera de la medición
+    t0 = time.perf_counter()
+    SPIN_TABLE.simulate(args.bulk, 1)
+    bulk = time.perf_counter() - t0
+    print(f"--- un giro ({args.reps:,} repeticiones) ---")
+    print(f"  choices + labels.index   {legacy * 1e6:7.2f} µs")
+    print(f"  RewardTable.draw (alias) {table * 1e6:7.2f} µs   ({legacy / table:.1f}x)")
+    print(f"--- simulación: {args.bulk:,} giros en {bulk:.2f} s ({args.bulk / bulk / 1e6:.0f} M giros/s)")
+
+
+if __name__ == "__main__":
+    main()
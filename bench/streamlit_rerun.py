@@ -0,0 +1,60 @@
+"""Tiempo por rerun de las páginas de Streamlit (AppTest, sin navegador).
+
+Uso::
+
+    python bench/streamlit_rerun.py                       # Inicio y Repertorio
+    python bench/streamlit_rerun.py --runs 50 --page Repertorio
+    # comparar con otra versión del script (antes/después):
+    git show HEAD~1:streamlit_app.py > /tmp/antes.py
+    python bench/streamlit_rerun.py --app /tmp/antes.py
+
+La base de fidelización va a un directorio temporal (``BENESSERE_DB``).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def run(app, page, runs):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(app), default_timeout=60).run()
+    at.sidebar.radio[0].set_value(page).run()
+    assert not at.exception, at.exception
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+    assert not at.exception, at.exception
+    times.sort()
+    print(
+        f"  {page:<12} mediana {statistics.median(times) * 1e3:7.1f} ms"
+        f"   p90 {times[int(len(times) * 0.9) - 1] * 1e3:7.1f} ms   ({runs} reruns)"
+    )
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--app", default=str(ROOT / "streamlit_app.py"))
+    ap.add_argument("--page", nargs="*", default=["Inicio", "Repertorio"])
+    ap.add_argument("--runs", type=int, default=30)
+    args = ap.parse_args(argv)
+    app = Path(args.app).resolve()
+    os.chdir(ROOT)      # la app resuelve static/ y data/ desde el directorio actual
+    os.environ.setdefault("BENESSERE_DB", str(Path(tempfile.mkdtemp()) / "loyalty.db"))
+    print(f"--- {app} ---")
+    for page in args.page:
+        run(app, page, args.runs)
+
+
+if __name__ == "__main__":
+    main()
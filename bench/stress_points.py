@@ -0,0 +1,100 @@
+"""Prueba de estrés: muchos hilos y procesos acreditando y debitando la misma cuenta.
+
+Comprueba que no se pierde ni se duplica ningún punto:
+
+    saldo final == créditos - débitos aplicados == saldo según el libro
+
+Uso::
+
+    python bench/stress_points.py                  # sqlite y json, 4 procesos x 8 hilos
+    python bench/stress_points.py --store json --procs 8 --threads 4 --ops 100
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere.store import open_store  # noqa: E402
+
+UID = "stress000000"
+CREDIT = 7
+COST = 5
+
+
+def _thread_ops(store, ops, out):
+    debits = 0
+    for i in range(ops):
+        if i % 2 == 0:
+            store.add_points(UID, CREDIT, "stress: crédito", "t")
+        else:
+            ok = store.transact(UID, lambda cur: None if cur["points"] < COST else {
+                "points": -COST, "reason": "stress: débito", "ts": "t",
+                "redemption": {"item": "stress", "ts": "t"},
+            })
+            debits += ok is not None
+    out.append(debits)
+
+
+def _worker(kind, path, threads, ops, q):
+    store = open_store(kind, path)
+    out = []
+    ts = [threading.Thread(target=_thread_ops, args=(store, ops, out)) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    q.put(sum(out))
+
+
+def run(kind, procs, threads, ops):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / ("loyalty.db" if kind == "sqlite" else "loyalty.json"))
+        store = open_store(kind, path)
+        store.create_user({"id": UID, "name": "stress", "points": 0})
+
+        q = mp.Queue()
+        t0 = time.perf_counter()
+        ps = [mp.Process(target=_worker, args=(kind, path, threads, ops, q)) for _ in range(procs)]
+        for p in ps:
+            p.start()
+        debits = sum(q.get() for _ in ps)
+        for p in ps:
+            p.join()
+        dt = time.perf_counter() - t0
+
+        credits = procs * threads * ((ops + 1) // 2)
+        expected = credits * CREDIT - debits * COST
+        u = store.reload().get_user(UID)
+        ledger = store.ledger.balance(UID)
+        n_red = len(store.redemptions(UID))
+        n_tx = credits + debits
+        ok = u["points"] == expected == ledger and n_red == debits and u["version"] == n_tx
+        print(
+            f"[{kind}] {procs} procesos x {threads} hilos x {ops} ops en {dt:.2f}s "
+            f"({n_tx / dt:.0f} tx/s): saldo={u['points']} esperado={expected} libro={ledger} "
+            f"canjes={n_red}/{debits} versión={u['version']} -> {'OK' if ok else 'FALLO'}"
+        )
+        store.close()
+        return ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--store", choices=["sqlite", "json", "all"], default="all")
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--ops", type=int, default=50)
+    args = ap.parse_args(argv)
+    kinds = ["sqlite", "json"] if args.store == "all" else [args.store]
+    results = [run(k, args.procs, args.threads, args.ops) for k in kinds]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Suite de benchmarks local (sin red): rutas Flask y núcleo de fidelización.
+
+Uso::
+
+    python bench/suite.py                                   # todo, JSON a stdout
+    python bench/suite.py --only loyalty --users 1000 100000
+    python bench/suite.py --store sqlite json --users 1000
+    python bench/suite.py --out resultados.json --check bench/thresholds.json
+
+- ``http``: la app servida por gunicorn local (con el ``gunicorn.conf.py`` del
+  árbol), ``--clients`` hilos durante ``--seconds`` por ruta.
+- ``loyalty``: base sintética de N usuarios por backend (``import_legacy``) y
+  luego ``get_user``, ``add_points``, ``spin``, ``redeem``, validar y usar un
+  cupón en el kiosco, ``leaderboard``, ``rank`` y la carga completa de la base
+  (``open_store``; en JSON también la escritura del archivo entero, lo que
+  antes eran ``_load_db``/``_save_db``).
+
+Cada medición da ``p50_ms``, ``p99_ms`` y ``ops_s`` (o ``rps``). Con
+``--check`` se comparan contra los umbrales guardados: ``*_ms`` son máximos y
+``ops_s``/``rps`` mínimos; si alguno no se cumple sale con código 1. Los
+umbrales dependen de la máquina: ``thresholds.json`` está calibrado con margen
+amplio para un núcleo modesto.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from benessere import loyalty  # noqa: E402
+from benessere.store import JsonStore, SQLiteStore, open_store  # noqa: E402
+from http_bench import ROOT, _free_port, load, start_gunicorn, stop  # noqa: E402
+
+HTTP_PATHS = ["/", "/menu", "/nosotros", "/api/menu"]
+REPS = 2000         # máximo de llamadas por operación
+BUDGET = 2.0        # segundos por operación (se corta antes si tarda)
+
+
+def _stats(lat):
+    lat = sorted(lat)
+    n = len(lat)
+    return {
+        "n": n,
+        "p50_ms": round(lat[n // 2] * 1e3, 4),
+        "p99_ms": round(lat[min(n - 1, int(n * 0.99))] * 1e3, 4),
+        "ops_s": round(n / sum(lat), 1) if sum(lat) else None,
+    }
+
+
+def _measure(fn, args_iter, reps=REPS, budget=BUDGET):
+    """Llama ``fn(*args)`` con cada tupla de ``args_iter`` hasta ``reps`` veces o
+    ``budget`` segundos (mínimo 5 llamadas); sólo se cronometra la llamada."""
+    lat = []
+    stop_at = time.perf_counter() + budget
+    for args in args_iter:
+        t = time.perf_counter()
+        fn(*args)
+        lat.append(time.perf_counter() - t)
+        if len(lat) >= reps or (len(lat) >= 5 and time.perf_counter() > stop_at):
+            break
+    return _stats(lat)
+
+
+def synthetic_db(n, seed=7):
+    """Dict con el formato de ``loyalty.json``: N usuarios con puntos al azar."""
+    rnd = random.Random(seed)
+    created = loyalty._now().isoformat()
+    users = {}
+    for i in range(n):
+        uid = f"u{i:07d}"
+        users[uid] = {
+            "id": uid, "name": f"Cliente {i}", "points": rnd.randint(0, 20000), "created": created,
+            "last_spin": None, "ref_code": uid[:6].upper(), "referred_by": None, "purchases": [], "coupons": [],
+        }
+    return {"users": users, "redemptions": [], "history": []}
+
+
+def bench_loyalty(kind, n, out):
+    rnd = random.Random(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / ("loyalty.db" if kind == "sqlite" else "loyalty.json")
+        t0 = time.perf_counter()
+        db = synthetic_db(n)
+        store = (SQLiteStore if kind == "sqlite" else JsonStore)(path)    # open_store migraría data/loyalty.json
+        store.import_legacy(db)
+        out["seed_s"] = round(time.perf_counter() - t0, 2)
+        del db
+        store.close()
+
+        def reopen():
+            open_store(kind, str(path)).close()
+        out["load"] = _measure(reopen, iter(lambda: (), None), reps=20, budget=BUDGET * 2)
+
+        store = open_store(kind, str(path))
+        try:
+            if isinstance(store, JsonStore):
+                def save():
+                    with store._flock:
+                        store._write()
+                out["save"] = _measure(save, iter(lambda: (), None), reps=20, budget=BUDGET * 2)
+
+            uids = [f"u{i:07d}" for i in range(n)]
+            pick = lambda: (store, rnd.choice(uids))          # noqa: E731
+            out["get_user"] = _measure(loyalty.get_user, iter(pick, None))
+            out["add_points"] = _measure(
+                lambda u: loyalty.add_points(u, store, 10, "bench"),
+                ((loyalty.get_user(store, rnd.choice(uids)),) for _ in iter(int, 1)),
+            )
+            fresh = iter(rnd.sample(uids, min(n, REPS)))        # cada usuario gira una sola vez
+            out["spin"] = _measure(
+                lambda u: loyalty.spin(u, store), ((loyalty.get_user(store, uid),) for uid in fresh),
+            )
+            item = loyalty.REDEEM_ITEMS[0]
+            codes = []
+
+            def redeem(u):
+                ok, code = loyalty.redeem(u, store, item)
+                if ok:
+                    codes.append(code)
+            out["redeem"] = _measure(
+                redeem, ((loyalty.get_user(store, rnd.choice(uids)),) for _ in iter(int, 1)),
+            )
+            out["coupon_check"] = _measure(
+                loyalty.check_coupon, ((store, rnd.choice(codes)) for _ in iter(int, 1)),
+            )
+            out["coupon_use"] = _measure(loyalty.use_coupon, ((store, code) for code in list(codes)))
+            out["leaderboard"] = _measure(loyalty.leaderboard, iter(lambda: (store,), None))
+            out["rank"] = _measure(
+                loyalty.user_rank, ((store, {"id": rnd.choice(uids)}) for _ in iter(int, 1)),
+            )
+        finally:
+            store.close()
+
+
+def bench_http(app_dir, seconds, clients, out):
+    port = _free_port()
+    proc = start_gunicorn(app_dir, port, None)
+    try:
+        for path in HTTP_PATHS:
+            for name, headers in (("identity", {}), ("gzip", {"Accept-Encoding": "gzip"})):
+                load(port, path, headers, 0.3, clients)        # calentar
+                r = load(port, path, headers, seconds, clients, proc.pid)
+                out[f"{path} {name}"] = {k: round(v, 4) if v is not None else None for k, v in r.items()}
+    finally:
+        stop(proc)
+
+
+def flatten(results, prefix=""):
+    """``{"loyalty": {"sqlite": {"1000": {"spin": {...}}}}}`` -> ``{"loyalty.sqlite.1000.spin": {...}}``."""
+    flat = {}
+    for k, v in results.items():
+        key = f"{prefix}.{k}" if prefix else str(k)
+        if isinstance(v, dict) and not any(m in v for m in ("p50_ms", "rps")):
+            flat.update(flatten(v, key))
+        elif isinstance(v, dict):
+            flat[key] = v
+    return flat
+
+
+def check(results, thresholds):
+    """Lista de ``(llave, métrica, valor, umbral)`` que no cumplen."""
+    flat = flatten(results)
+    failed = []
+    for key, limits in thresholds.items():
+        got = flat.get(key)
+        if got is None:
+            continue        # no se midió en esta corrida (otro --only / --users)
+        for metric, limit in limits.items():
+            value = got.get(metric)
+            if value is None:
+                continue
+            bad = value > limit if metric.endswith("_ms") else value < limit
+            if bad:
+                failed.append((key, metric, value, limit))
+    return failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--only", choices=["http", "loyalty"], default=None)
+    ap.add_argument("--users", type=int, nargs="*", default=[1_000, 100_000, 1_000_000])
+    ap.add_argument("--store", nargs="*", choices=["sqlite", "json"], default=["sqlite"])
+    ap.add_argument("--app-dir", default=str(ROOT))
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--out", help="guardar el JSON en este archivo")
+    ap.add_argument("--check", help="umbrales (JSON) contra los que comparar")
+    args = ap.parse_args(argv)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+    }
+    if args.only in (None, "http"):
+        results["http"] = {}
+        bench_http(args.app_dir, args.seconds, args.clients, results["http"])
+    if args.only in (None, "loyalty"):
+        results["loyalty"] = {}
+        for kind in args.store:
+            for n in args.users:
+                print(f"[loyalty] {kind} con {n:,} usuarios...", file=sys.stderr)
+                res = results["loyalty"].setdefault(kind, {}).setdefault(str(n), {})
+                bench_loyalty(kind, n, res)
+
+    text = json.dumps(results, indent=1, ensure_ascii=False)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+    if args.check:
+        thresholds = json.loads(Path(args.check).read_text(encoding="utf-8"))
+        failed = check(results, thresholds)
+        for key, metric, value, limit in failed:
+            print(f"REGRESIÓN {key} {metric}: {value} (umbral {limit})", file=sys.stderr)
+        if failed:
+            return 1
+        print(f"umbrales OK ({args.check})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Benchmark de la ruleta: página completa por rerun vs. parámetros del componente.
+
+Uso::
+
+    python bench/wheel_bench.py
+    python bench/wheel_bench.py --reps 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere import wheel  # noqa: E402
+from benessere.loyalty import SPIN_REWARDS  # noqa: E402
+
+
+def _per_call(fn, reps):
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) / reps
+
+
+def _cold_page(labels):
+    wheel._face.cache_clear()
+    wheel._template.cache_clear()
+    return wheel.build_html(labels, 30, 1650)
+
+
+def _payload(labels):
+    # lo que Streamlit serializa en cada rerun para el componente
+    return json.dumps({**wheel.face(labels), **wheel.spin_params(30, 1650)})
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--reps", type=int, default=5000)
+    args = ap.parse_args(argv)
+    labels = [r["label"] for r in SPIN_REWARDS]
+
+    t_cold = _per_call(lambda: _cold_page(labels), max(1, args.reps // 10))
+    t_page = _per_call(lambda: wheel.build_html(labels, 30, 1650), args.reps)
+    t_payload = _per_call(lambda: _payload(labels), args.reps)
+    page = wheel.build_html(labels, 30, 1650).encode("utf-8")
+    payload = _payload(labels).encode("utf-8")
+
+    print(f"--- {len(labels)} premios ---")
+    print(f"  página completa sin caché   : {t_cold * 1e6:8.1f} µs   {len(page):6,} bytes")
+    print(f"  página completa con caché   : {t_page * 1e6:8.1f} µs   {len(page):6,} bytes")
+    print(f"  parámetros del componente   : {t_payload * 1e6:8.1f} µs   {len(payload):6,} bytes")
+
+
+if __name__ == "__main__":
+    main()
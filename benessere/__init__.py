@@ -0,0 +1 @@
+"""Lógica compartida de Benessere (fidelización, almacenamiento) para Flask y Streamlit."""
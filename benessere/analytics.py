@@ -0,0 +1,335 @@
+"""Resúmenes diarios del libro de puntos, por columnas con NumPy.
+
+Todo sale del libro (``benessere.ledger``): cada movimiento es
+``[ts, uid, delta, reason]`` y el motivo dice qué fue (``Reto diario: pasos``,
+``Ruleta diaria: 🎉 +100 pts``, ``Canje: Granola``...). ``Rollups`` guarda por
+día y por motivo la suma de puntos y el número de movimientos, más los
+usuarios activos de cada día, en matrices densas (día x motivo):
+
+- ``update(ledger)`` lee sólo lo que se escribió desde la última posición
+  procesada (segmento, byte). Cada tramo se parsea de una vez (con ``orjson``
+  si está instalado), se pasa a columnas (día, motivo, delta, uid) y se agrega
+  con ``np.bincount``, sin bucles por movimiento.
+- ``save`` deja las matrices y la posición en un ``.npz``; ``refresh`` hace
+  cargar + poner al día + guardar bajo un candado de archivo.
+- Los reportes leen las matrices: puntos por motivo, tasa de retos
+  completados, premios de la ruleta contra los pesos ``w`` y canjes por
+  producto.
+
+Los giros anteriores a que el libro registrara el premio (motivo
+``Ruleta diaria`` a secas, sólo los de puntos) se asignan por puntaje.
+
+Uso::
+
+    python -m benessere.analytics                 # pone al día y resume los últimos 7 días
+    python -m benessere.analytics --days 30 --json
+"""
+
+import argparse
+import json
+import os
+import sys
+from itertools import compress
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:     # opcional
+    orjson = None
+
+from .filelock import FileLock
+from .loyalty import SPIN_REASON, SPIN_REWARDS
+
+ROOT = Path(__file__).resolve().parent.parent
+ANALYTICS_PATH = Path(os.environ.get("BENESSERE_ANALYTICS", ROOT / "data" / "analytics" / "rollups.npz"))
+
+CHALLENGE_PREFIX = "Reto diario: "
+REDEEM_PREFIX = "Canje: "
+_NAT = np.datetime64("NaT").astype(np.int64)
+
+
+def _day(i):
+    return str(np.datetime64(int(i), "D"))
+
+
+def _day_index(s):
+    return int(np.datetime64(s, "D").astype(np.int64))
+
+
+class Rollups:
+    def __init__(self):
+        self.base = None            # día (desde 1970) de la fila 0
+        self.reasons = []           # columna -> motivo
+        self._reason_ids = {}
+        self.points = np.zeros((0, 0), np.int64)    # suma de deltas
+        self.events = np.zeros((0, 0), np.int64)    # movimientos
+        self.active = np.zeros(0, np.int64)         # usuarios distintos por día
+        self.cursor = (0, 0)
+        self._open_day = None       # último día visto: puede seguir recibiendo movimientos
+        self._open_uids = set()
+
+    # ------------------ Persistencia ---------------
+    @classmethod
+    def load(cls, path=ANALYTICS_PATH):
+        r = cls()
+        try:
+            z = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return r
+        with z:
+            meta = json.loads(str(z["meta"]))
+            r.points, r.events, r.active = z["points"], z["events"], z["active"]
+        r.base = meta["base"]
+        r.reasons = meta["reasons"]
+        r._reason_ids = {k: i for i, k in enumerate(r.reasons)}
+        r.cursor = tuple(meta["cursor"])
+        r._open_day = meta["open_day"]
+        r._open_uids = set(meta["open_uids"])
+        return r
+
+    def save(self, path=ANALYTICS_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "base": self.base, "reasons": self.reasons, "cursor": list(self.cursor),
+            "open_day": self._open_day, "open_uids": sorted(self._open_uids),
+        }
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, points=self.points, events=self.events, active=self.active,
+                     meta=np.array(json.dumps(meta, ensure_ascii=False)))
+        os.replace(tmp, path)
+
+    # ------------------ Agregación ---------------
+    def update(self, ledger):
+        """Suma lo escrito en el libro desde ``cursor``; devuelve cuántos movimientos."""
+        n = 0
+        for pos, chunk in ledger.chunks(self.cursor):
+            n += self.add_chunk(chunk)
+            self.cursor = pos
+        return n
+
+    def add_chunk(self, chunk):
+        """Agrega un tramo de líneas del libro (bytes ``[ts, uid, delta, reason]\\n``)."""
+        rows = (orjson or json).loads(b"[" + chunk.rstrip(b"\n").replace(b"\n", b",") + b"]")     # un parseo por tramo
+        if not rows:
+            return 0
+        ts, uid, delta, reason = ([r[i] for r in rows] for i in range(4))   # (zip(*rows) es 10x más lento)
+        if None in ts:
+            ts = [t or "NaT" for t in ts]
+        # sólo se interpretan las fechas distintas (pocas por tramo)
+        days, inv = np.unique(np.array(ts, dtype="U10"), return_inverse=True)
+        day = days.astype("datetime64[D]").astype(np.int64)[inv]
+        delta = np.array(delta, dtype=np.int64)
+        code = self._codes(reason, delta)
+        ok = day != _NAT
+        if not ok.all():
+            day, delta, code = day[ok], delta[ok], code[ok]
+            uid = list(compress(uid, ok))
+        if not len(day):
+            return 0
+        lo, hi = int(day.min()), int(day.max())
+        self._grow(lo, hi)
+        nd, nr = self.points.shape
+        flat = (day - self.base) * nr + code
+        self.points += np.rint(np.bincount(flat, weights=delta, minlength=nd * nr)).astype(np.int64).reshape(nd, nr)
+        self.events += np.bincount(flat, minlength=nd * nr).reshape(nd, nr)
+        self._count_active(day, uid, lo, hi)
+        return len(day)
+
+    def _codes(self, reason, delta):
+        ids = self._reason_ids
+        for r in sorted(set(reason).difference(ids)):
+            self._add_reason(r)
+        code = np.fromiter(map(ids.__getitem__, reason), np.int64, len(reason))
+        legacy = ids.get(SPIN_REASON)
+        if legacy is not None:
+            # "Ruleta diaria" de antes: el premio se deduce del puntaje
+            m = code == legacy
+            if m.any():
+                for prize in SPIN_REWARDS:
+                    if prize["points"]:
+                        code[m & (delta == prize["points"])] = self._add_reason(f"{SPIN_REASON}: {prize['label']}")
+        return code
+
+    def _add_reason(self, r):
+        i = self._reason_ids.get(r)
+        if i is None:
+            i = self._reason_ids[r] = len(self.reasons)
+            self.reasons.append(r)
+        return i
+
+    def _grow(self, lo, hi):
+        """Amplía las matrices para cubrir los días ``lo..hi`` y los motivos nuevos."""
+        nd, nr = self.points.shape
+        base = lo if self.base is None else min(self.base, lo)
+        end = hi + 1 if self.base is None else max(self.base + nd, hi + 1)
+        nr2 = len(self.reasons)
+        if (base, end, nr2) == (self.base, (self.base or 0) + nd, nr):
+            return
+        off = 0 if self.base is None else self.base - base
+        points = np.zeros((end - base, nr2), np.int64)
+        events = np.zeros((end - base, nr2), np.int64)
+        active = np.zeros(end - base, np.int64)
+        points[off:off + nd, :nr] = self.points
+        events[off:off + nd, :nr] = self.events
+        active[off:off + nd] = self.active
+        self.points, self.events, self.active, self.base = points, events, active, base
+
+    def _count_active(self, day, uid, lo, hi):
+        """Usuarios distintos por día: dentro del tramo con un ordenamiento; el
+        último día ya visto se completa con los uids guardados de ese día."""
+        h = np.fromiter(map(hash, uid), np.int64, len(uid))
+        order = np.lexsort((h, day))
+        d, hh = day[order], h[order]
+        first = np.ones(len(d), bool)
+        first[1:] = (d[1:] != d[:-1]) | (hh[1:] != hh[:-1])
+        counts = np.bincount(d[first] - lo, minlength=hi - lo + 1)
+        if self._open_day is not None and lo <= self._open_day <= hi:
+            seen = set(compress(uid, day == self._open_day))
+            counts[self._open_day - lo] = len(seen - self._open_uids)
+            self._open_uids |= seen
+        self.active[lo - self.base:hi - self.base + 1] += counts
+        if self._open_day is None or hi > self._open_day:
+            self._open_day = hi
+            self._open_uids = set(compress(uid, day == hi))
+
+    # ------------------ Reportes ---------------
+    def _rows(self, since=None, until=None):
+        if self.base is None:
+            return slice(0, 0)
+        a = 0 if since is None else max(0, _day_index(since) - self.base)
+        b = len(self.active) if until is None else max(0, _day_index(until) - self.base + 1)
+        return slice(a, b)
+
+    def days(self, since=None, until=None):
+        rows = self._rows(since, until)
+        return [_day(self.base + i) for i in range(len(self.active))[rows]]
+
+    def by_reason(self, since=None, until=None):
+        """``{motivo: (puntos, movimientos)}`` en el rango (días ISO, inclusive)."""
+        rows = self._rows(since, until)
+        pts, ev = self.points[rows].sum(axis=0), self.events[rows].sum(axis=0)
+        return {r: (int(pts[i]), int(ev[i])) for i, r in enumerate(self.reasons) if ev[i]}
+
+    def points_issued(self, since=None, until=None):
+        """Puntos entregados (positivos) por motivo, de mayor a menor."""
+        out = {r: p for r, (p, _) in self.by_reason(since, until).items() if p > 0}
+        return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+    def _prefixed(self, prefix):
+        return [(i, r[len(prefix):]) for i, r in enumerate(self.reasons) if r.startswith(prefix)]
+
+    def challenge_rates(self, since=None, until=None):
+        """``{día: {reto: completados / usuarios activos}}``."""
+        rows = self._rows(since, until)
+        cols = self._prefixed(CHALLENGE_PREFIX)
+        if not cols:
+            return {}
+        done = self.events[rows][:, [i for i, _ in cols]]
+        active = self.active[rows]
+        rate = done / np.maximum(active, 1)[:, None]
+        return {
+            day: {name: round(float(rate[j, k]), 4) for k, (_, name) in enumerate(cols)}
+            for j, day in enumerate(self.days(since, until)) if active[j]
+        }
+
+    def spin_distribution(self, since=None, until=None):
+        """Premios observados contra lo esperado por los pesos ``w``."""
+        counts = {r: n for r, (_, n) in self.by_reason(since, until).items()}
+        total_w = sum(p.get("w", 1) for p in SPIN_REWARDS)
+        seen = [counts.get(f"{SPIN_REASON}: {p['label']}", 0) for p in SPIN_REWARDS]
+        total = sum(seen)
+        out = []
+        for p, n in zip(SPIN_REWARDS, seen):
+            expected = p.get("w", 1) / total_w
+            out.append({
+                "label": p["label"], "count": n, "expected": round(expected, 4),
+                "observed": round(n / total, 4) if total else None,
+            })
+        return out
+
+    def spin_chi2(self, since=None, until=None):
+        """Estadístico chi² de los giros contra los pesos (9 grados de libertad
+        con los 10 premios de hoy: > 21.7 es raro con p < 1%)."""
+        dist = self.spin_distribution(since, until)
+        total = sum(d["count"] for d in dist)
+        if not total:
+            return None
+        obs = np.array([d["count"] for d in dist], float)
+        exp = np.array([d["expected"] for d in dist]) * total
+        return round(float(((obs - exp) ** 2 / exp).sum()), 3)
+
+    def redemptions(self, since=None, until=None):
+        """``{producto: canjes}``."""
+        rows = self._rows(since, until)
+        cols = self._prefixed(REDEEM_PREFIX)
+        ev = self.events[rows].sum(axis=0)
+        return {name: int(ev[i]) for i, name in cols if ev[i]}
+
+    def summary(self, since=None, until=None):
+        return {
+            "days": len(self.days(since, until)),
+            "events": int(self.events[self._rows(since, until)].sum()),
+            "points_issued": self.points_issued(since, until),
+            "challenge_rates": self.challenge_rates(since, until),
+            "spins": self.spin_distribution(since, until),
+            "spin_chi2": self.spin_chi2(since, until),
+            "redemptions": self.redemptions(since, until),
+        }
+
+
+def refresh(ledger, path=ANALYTICS_PATH):
+    """Carga, pone al día con ``ledger`` y guarda (un proceso a la vez)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with FileLock(path.with_suffix(".lock")):
+        r = Rollups.load(path)
+        if r.update(ledger):
+            r.save(path)
+    return r
+
+
+def main(argv=None):
+    from .store import open_store
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--path", default=str(ANALYTICS_PATH))
+    ap.add_argument("--days", type=int, default=7, help="resumir los últimos N días con movimientos")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+    db = open_store()
+    try:
+        r = refresh(db.ledger, args.path)
+    finally:
+        db.close()
+    days = r.days()
+    if not days:
+        print("El libro está vacío.")
+        return 0
+    since = days[max(0, len(days) - args.days)]
+    s = r.summary(since)
+    if args.json:
+        print(json.dumps(s, ensure_ascii=False, indent=1))
+        return 0
+    print(f"{since} a {days[-1]}: {s['events']} movimientos")
+    print("Puntos entregados por motivo:")
+    for reason, pts in s["points_issued"].items():
+        print(f"  {pts:>10}  {reason}")
+    print("Retos completados / usuarios activos (último día):")
+    for name, rate in (s["challenge_rates"].get(days[-1]) or {}).items():
+        print(f"  {rate:>10.1%}  {name}")
+    print(f"Ruleta (chi² {s['spin_chi2']}):")
+    for d in s["spins"]:
+        obs = f"{d['observed']:.1%}" if d["observed"] is not None else "-"
+        print(f"  {d['count']:>10}  {obs:>6} (esperado {d['expected']:.1%})  {d['label']}")
+    print("Canjes por producto:")
+    for item, n in s["redemptions"].items():
+        print(f"  {n:>10}  {item}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
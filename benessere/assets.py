@@ -0,0 +1,230 @@
+"""Huella de contenido para los estáticos de Flask.
+
+``url_for('static', filename='css/styles.css')`` pasa a dar
+``/static/css/styles.3f2a9c1d04be.css``: la URL cambia sólo si cambian los
+bytes, así que se puede servir con ``Cache-Control: immutable`` y el navegador
+no vuelve a preguntar.
+
+- El manifiesto (ruta -> sha256) se arma recorriendo ``static/``; sólo se
+  vuelven a hashear los archivos cuyo ``(mtime, tamaño)`` cambió, y se revisa a
+  lo sumo cada ``poll`` segundos.
+- Archivos idénticos (``acai_120.jpg``/``acai_180.jpg``, ``bowl.jpg``/``bowl2.jpg``...)
+  comparten una sola URL canónica (la primera ruta en orden alfabético), así
+  el cliente los baja una vez. ``report()`` dice cuántos bytes se ahorran.
+- ``build/`` ya viene nombrado por hash (``python -m benessere.imagebuild``):
+  sus URLs no se tocan, pero también se sirven como inmutables.
+- ``precompress`` deja ``.gz`` (y ``.br`` si está el paquete ``brotli``) junto a
+  cada CSS/JS/HTML; ``encodings()`` dice qué hermanos comprimidos están al día
+  para que Flask los mande según ``Accept-Encoding`` sin comprimir en caliente.
+
+Uso::
+
+    python -m benessere.assets              # resumen de duplicados
+    python -m benessere.assets --list       # ruta -> URL con huella
+    python -m benessere.assets --compress   # escribe los .gz/.br
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:     # opcional
+    brotli = None
+
+ROOT = Path(__file__).resolve().parent.parent
+STATIC_DIR = ROOT / "static"
+HASH_LEN = 12
+PREHASHED = ("build/",)         # prefijos cuyas URLs ya llevan el hash
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = {".css", ".js", ".html", ".svg", ".json", ".txt"}
+ENCODINGS = {"br": ".br", "gzip": ".gz"}     # en orden de preferencia
+MIN_COMPRESS = 256      # por debajo de esto comprimir no ahorra nada
+
+_FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)?$" % HASH_LEN)
+
+
+def _skip(name):
+    return name.startswith(".") or name.endswith(".tmp")
+
+
+def fingerprint(rel, digest):
+    """``css/styles.css`` -> ``css/styles.<hash>.css``."""
+    head, dot, ext = rel.rpartition(".")
+    if not dot or "/" in ext:
+        return f"{rel}.{digest[:HASH_LEN]}"
+    return f"{head}.{digest[:HASH_LEN]}.{ext}"
+
+
+class Assets:
+    def __init__(self, static_dir=STATIC_DIR, poll=1.0):
+        self.static_dir = Path(static_dir)
+        self.poll = poll
+        self.version = 0
+        self._checked = None
+        self._stat = {}          # ruta -> (mtime_ns, tamaño, sha256)
+        self._urls = {}          # ruta -> ruta con huella (de la copia canónica)
+        self._files = {}         # ruta con huella -> ruta real
+        self._dups = {}          # ruta duplicada -> ruta canónica
+        self._encoded = {}       # ruta -> {codificación: ruta del .br/.gz}
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.static_dir):
+            dirnames[:] = sorted(d for d in dirnames if not _skip(d))
+            for name in filenames:
+                if not _skip(name):
+                    p = os.path.join(dirpath, name)
+                    yield os.path.relpath(p, self.static_dir).replace(os.sep, "/"), p
+
+    def refresh(self, force=False):
+        """Vuelve a recorrer ``static/`` si pasó ``poll``; True si algo cambió."""
+        now = time.monotonic()
+        if not force and self._checked is not None and now - self._checked < self.poll:
+            return False
+        with self._lock:
+            self._checked = now
+            stat = {}
+            for rel, p in self._walk():
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                prev = self._stat.get(rel)
+                if rel.endswith(tuple(ENCODINGS.values())):
+                    stat[rel] = (st.st_mtime_ns, st.st_size, None)
+                elif prev and prev[:2] == (st.st_mtime_ns, st.st_size):
+                    stat[rel] = prev
+                elif rel.startswith(PREHASHED):
+                    stat[rel] = (st.st_mtime_ns, st.st_size, None)
+                else:
+                    with open(p, "rb") as f:
+                        stat[rel] = (st.st_mtime_ns, st.st_size, hashlib.sha256(f.read()).hexdigest())
+            if stat == self._stat:
+                return False
+            canonical, urls, files, dups, encoded = {}, {}, {}, {}, {}
+            for rel in sorted(stat):
+                digest = stat[rel][2]
+                for enc, ext in ENCODINGS.items():
+                    sib = stat.get(rel + ext)
+                    if sib and sib[0] >= stat[rel][0]:      # un .gz más viejo que el original no sirve
+                        encoded.setdefault(rel, {})[enc] = rel + ext
+                if digest is None:
+                    continue
+                first = canonical.setdefault(digest, rel)
+                if first != rel:
+                    dups[rel] = first
+                urls[rel] = fingerprint(first, digest)
+                files[urls[rel]] = first
+            self._stat, self._urls, self._files, self._dups, self._encoded = stat, urls, files, dups, encoded
+            self.version += 1
+            return True
+
+    def url_path(self, filename):
+        """Ruta (relativa a ``static/``) que debe ir en la URL."""
+        self.refresh()
+        return self._urls.get(filename, filename)
+
+    def resolve(self, filename):
+        """``(ruta real, inmutable)`` para una ruta pedida bajo ``/static/``.
+
+        Una huella vieja (el archivo cambió) se sirve igual pero sin ``immutable``."""
+        self.refresh()
+        real = self._files.get(filename)
+        if real is not None:
+            return real, True
+        if filename.startswith(PREHASHED):
+            return filename, True
+        m = _FINGERPRINT.match(filename.rsplit("/", 1)[-1])
+        if m and filename not in self._stat:
+            return filename[: len(filename) - len(m.group(0))] + m.group("stem") + (m.group("ext") or ""), False
+        return filename, False
+
+    def encodings(self, real):
+        """``{codificación: ruta}`` de los hermanos precomprimidos vigentes de ``real``."""
+        return self._encoded.get(real, {})
+
+    def report(self):
+        self.refresh()
+        saved = sum(self._stat[rel][1] for rel in self._dups)
+        return {
+            "files": sum(1 for v in self._stat.values() if v[2] is not None),
+            "bytes": sum(v[1] for v in self._stat.values() if v[2] is not None),
+            "duplicates": dict(self._dups),
+            "bytes_saved": saved,
+        }
+
+    def urls(self):
+        self.refresh()
+        return dict(self._urls)
+
+
+def precompress(static_dir=STATIC_DIR, force=False):
+    """Escribe ``archivo.gz`` (y ``archivo.br``) para los textos de ``static/``.
+
+    Sólo rehace los que son más viejos que el original. Devuelve un resumen."""
+    static_dir = Path(static_dir)
+    r = {"files": 0, "written": 0, "bytes": 0, "gzip": 0, "br": 0}
+    for p in sorted(static_dir.rglob("*")):
+        rel = p.relative_to(static_dir).as_posix()
+        if (not p.is_file() or p.suffix not in COMPRESSIBLE or rel.startswith(PREHASHED)
+                or any(_skip(part) for part in p.relative_to(static_dir).parts)):
+            continue
+        data = p.read_bytes()
+        if len(data) < MIN_COMPRESS:
+            continue
+        r["files"] += 1
+        r["bytes"] += len(data)
+        mtime = p.stat().st_mtime_ns
+        for enc, ext in ENCODINGS.items():
+            out = p.with_name(p.name + ext)
+            if enc == "br" and brotli is None:
+                continue
+            if force or not out.exists() or out.stat().st_mtime_ns < mtime:
+                body = brotli.compress(data, quality=11) if enc == "br" else gzip.compress(data, 9, mtime=0)
+                tmp = out.with_name(out.name + ".tmp")
+                tmp.write_bytes(body)
+                os.replace(tmp, out)
+                r["written"] += 1
+            r[enc] += out.stat().st_size
+    return r
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--static", default=str(STATIC_DIR))
+    ap.add_argument("--list", action="store_true", help="mostrar ruta -> URL con huella")
+    ap.add_argument("--compress", action="store_true", help="escribir los .gz/.br de CSS/JS/HTML")
+    ap.add_argument("--force", action="store_true", help="con --compress, rehacer todos")
+    args = ap.parse_args(argv)
+    if args.compress:
+        c = precompress(args.static, args.force)
+        br = f", br {c['br'] / 1024:.1f} KB" if brotli is not None else " (sin brotli instalado)"
+        print(
+            f"{c['files']} archivos de texto ({c['bytes'] / 1024:.1f} KB), {c['written']} escritos; "
+            f"gzip {c['gzip'] / 1024:.1f} KB{br}"
+        )
+    assets = Assets(args.static)
+    if args.list:
+        for rel, url in sorted(assets.urls().items()):
+            print(f"{rel:<40} {url}")
+    r = assets.report()
+    for dup, first in sorted(r["duplicates"].items()):
+        print(f"  {dup}  =  {first}")
+    print(
+        f"{r['files']} archivos ({r['bytes'] / 1024:.0f} KB), {len(r['duplicates'])} duplicados; "
+        f"la deduplicación ahorra {r['bytes_saved'] / 1024:.0f} KB por visitante que vea todo"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
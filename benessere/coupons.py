@@ -0,0 +1,105 @@
+"""Códigos de cupón únicos y validación en el kiosco.
+
+Cada cupón que entrega la ruleta o un canje lleva su propio código corto
+(``7KQ2-M9XP``: 8 símbolos de un alfabeto sin 0/O ni 1/I/L, ~40 bits) además
+del tipo (``kind``: ``DESC10-ACAI``, ``CANJ-GRANOLA``...). En la base cada
+código es único y apunta a su dueño, su estado (``active``, ``used``,
+``expired``) y su vencimiento, así que validarlo es una sola búsqueda y
+canjearlo es un cambio condicional: un cupón se usa una sola vez.
+
+Los cupones vencen a los ``BENESSERE_COUPON_DAYS`` días (30). Un barrido
+periódico (``LoyaltyStore.start_sweeper``) los pasa a ``expired`` en orden de
+vencimiento sin recorrer a los usuarios.
+
+Uso en el kiosco::
+
+    python -m benessere.coupons 7KQ2-M9XP           # ¿es válido?
+    python -m benessere.coupons 7kq2m9xp --use      # canjearlo
+    python -m benessere.coupons --sweep             # vencer los atrasados
+"""
+
+import argparse
+import os
+import re
+import secrets
+import sys
+from datetime import datetime, timedelta
+
+ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+CODE_LEN = 8
+DAYS = int(os.environ.get("BENESSERE_COUPON_DAYS", "30"))
+
+ACTIVE, USED, EXPIRED = "active", "used", "expired"
+STATUS_TEXT = {ACTIVE: "vigente", USED: "usado", EXPIRED: "vencido"}
+
+_NOT_CODE = re.compile(r"[^0-9A-Z]+")
+
+
+def new_code():
+    c = "".join(secrets.choice(ALPHABET) for _ in range(CODE_LEN))
+    return f"{c[:4]}-{c[4:]}"
+
+
+def normalize(raw):
+    """Lo que tipea el cajero (minúsculas, espacios, sin guion) -> ``XXXX-XXXX``."""
+    c = _NOT_CODE.sub("", str(raw).upper())
+    return f"{c[:4]}-{c[4:]}" if len(c) == CODE_LEN else c
+
+
+def expires_at(ts, days=DAYS):
+    return (datetime.fromisoformat(ts) + timedelta(days=days)).isoformat(timespec="seconds")
+
+
+def issue(kind, source, ts, days=DAYS):
+    """Cupón nuevo (para el ``coupons`` de un plan de transacción)."""
+    return {"code": new_code(), "kind": kind, "source": source, "ts": ts,
+            "expires": expires_at(ts, days), "status": ACTIVE, "used_ts": None}
+
+
+def upgrade(c):
+    """Cupón de antes (código literal compartido) -> cupón con código propio.
+
+    Vence a los ``DAYS`` días de su emisión; si no tiene fecha, no vence."""
+    if c.get("kind"):
+        return c
+    ts = c.get("ts")
+    return {**c, "code": new_code(), "kind": c.get("code"), "ts": ts,
+            "expires": expires_at(ts) if ts else None, "status": ACTIVE, "used_ts": None}
+
+
+def status(c, now):
+    """Estado efectivo: uno vigente cuyo vencimiento ya pasó cuenta como vencido
+    aunque el barrido todavía no lo haya marcado."""
+    if c["status"] == ACTIVE and c.get("expires") and c["expires"] <= now:
+        return EXPIRED
+    return c["status"]
+
+
+def main(argv=None):
+    from .loyalty import _now, check_coupon, expire_coupons, use_coupon
+    from .store import open_store
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("code", nargs="?")
+    ap.add_argument("--use", action="store_true", help="marcar el cupón como usado")
+    ap.add_argument("--sweep", action="store_true", help="vencer los cupones atrasados")
+    args = ap.parse_args(argv)
+    db = open_store()
+    try:
+        if args.sweep:
+            print(f"{expire_coupons(db)} cupones vencidos")
+        if not args.code:
+            return 0
+        ok, c, msg = (use_coupon if args.use else check_coupon)(db, args.code)
+        if c is not None:
+            u = db.get_user(c["uid"]) or {}
+            print(f"{c['code']}  {c['kind']}  de {u.get('name') or c['uid']}  "
+                  f"({STATUS_TEXT[status(c, _now().isoformat())]}, vence {(c['expires'] or 'nunca')[:10]})")
+        print(msg)
+        return 0 if ok else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Estado compacto de los retos diarios: un byte por usuario y día.
+
+Cada día es un byte con un bit por reto (``steps_done``, ``gym_done``,
+``food_done``, ``checkin``) dentro de un ``bytearray`` que empieza en ``base``
+(ordinal del día). Los días más viejos que ``RETENTION_DAYS`` se pliegan en
+resúmenes mensuales ``{"AAAA-MM": [días activos, pasos, gym, comida, checkin]}``,
+así que el registro de cada usuario tiene tamaño acotado.
+
+En disco (JSON o columna de SQLite) se guarda como
+``{"base": ordinal, "bits": base64, "months": {...}}``.
+"""
+
+import base64
+import os
+from datetime import date
+
+FLAGS = ("steps_done", "gym_done", "food_done", "checkin")
+BIT = {f: 1 << i for i, f in enumerate(FLAGS)}
+RETENTION_DAYS = int(os.environ.get("BENESSERE_DAILY_DAYS", "35"))
+
+
+def _ordinal(day):
+    return date.fromisoformat(day).toordinal()
+
+
+class DailyLog:
+    __slots__ = ("base", "bits", "months")
+
+    def __init__(self, base=0, bits=b"", months=None):
+        self.base = base
+        self.bits = bytearray(bits)
+        self.months = months or {}
+
+    # ------------------ Lectura ---------------
+    def mask(self, day):
+        i = _ordinal(day) - self.base
+        return self.bits[i] if 0 <= i < len(self.bits) else 0
+
+    def state(self, day):
+        m = self.mask(day)
+        return {f: bool(m & BIT[f]) for f in FLAGS}
+
+    # ------------------ Escritura ---------------
+    def set(self, day, flag):
+        """Marca el reto; devuelve False si ya estaba marcado ese día."""
+        o = _ordinal(day)
+        if not self.bits:
+            self.base = o
+        if o < self.base:
+            self.bits[0:0] = bytes(self.base - o)
+            self.base = o
+        i = o - self.base
+        if i >= len(self.bits):
+            self.bits.extend(bytes(i + 1 - len(self.bits)))
+        if self.bits[i] & BIT[flag]:
+            return False
+        self.bits[i] |= BIT[flag]
+        return True
+
+    def roll_up(self, today, keep_days=RETENTION_DAYS):
+        """Pliega en resúmenes mensuales los días anteriores a la ventana."""
+        cutoff = _ordinal(today) - keep_days + 1
+        n = min(max(0, cutoff - self.base), len(self.bits))
+        for i in range(n):
+            m = self.bits[i]
+            if not m:
+                continue
+            key = date.fromordinal(self.base + i).strftime("%Y-%m")
+            s = self.months.setdefault(key, [0] * (len(FLAGS) + 1))
+            s[0] += 1
+            for j, f in enumerate(FLAGS, 1):
+                s[j] += bool(m & BIT[f])
+        if n:
+            del self.bits[:n]
+            self.base += n
+        # sin días marcados al inicio no hace falta guardar ceros
+        z = next((i for i, m in enumerate(self.bits) if m), len(self.bits))
+        if z:
+            del self.bits[:z]
+            self.base += z
+        if not self.bits:
+            self.base = 0
+
+    # ------------------ Serialización ---------------
+    def to_dict(self):
+        return {"base": self.base, "bits": base64.b64encode(bytes(self.bits)).decode("ascii"), "months": self.months}
+
+    @classmethod
+    def from_dict(cls, d):
+        """Acepta el formato compacto o el antiguo ``{"AAAA-MM-DD": {reto: bool}}``."""
+        if not d:
+            return cls()
+        if "bits" in d:
+            return cls(d.get("base", 0), base64.b64decode(d["bits"]), dict(d.get("months") or {}))
+        log = cls()
+        for day, flags in sorted(d.items()):
+            for f in FLAGS:
+                if flags.get(f):
+                    log.set(day, f)
+        return log
@@ -0,0 +1,47 @@
+"""Candado exclusivo entre procesos (``flock``) y entre hilos, reentrante."""
+
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:     # Windows: sólo exclusión entre hilos
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            fd = open(self.path, "a+b")
+            try:
+                fcntl.flock(fd.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                fd.close()
+                self._rlock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd.fileno(), fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
@@ -0,0 +1,118 @@
+"""Respuestas HTTP preparadas una vez: cuerpo, variantes comprimidas y ETag.
+
+``Payload`` guarda los bytes ya serializados junto con su versión gzip (y
+brotli si el paquete ``brotli`` está instalado). ``respond`` elige la variante
+según ``Accept-Encoding``, pone ETag fuerte + ``Vary`` y contesta 304 si el
+cliente ya tiene esa versión (``If-None-Match``). Así una petición repetida no
+serializa ni comprime nada.
+
+``PageCache`` guarda páginas HTML ya renderizadas como ``Payload`` y las
+descarta todas cuando cambia su sello (versión del menú, plantillas...).
+
+``json_response`` es para respuestas chicas y distintas cada vez (la API de
+fidelización): JSON compacto, con ``orjson`` si está instalado.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:     # opcional
+    brotli = None
+
+try:
+    import orjson
+except ImportError:     # opcional
+    orjson = None
+
+MIN_COMPRESS = 256      # por debajo de esto comprimir no ahorra nada
+
+
+class Payload:
+    __slots__ = ("body", "mimetype", "tag", "variants")
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.tag = hashlib.sha256(body).hexdigest()[:20]
+        # codificación -> (bytes, etag); cada representación lleva su propio ETag fuerte
+        self.variants = {"identity": (body, self.tag)}
+        if len(body) >= MIN_COMPRESS:
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(body, quality=11), f"{self.tag}-br")
+            self.variants["gzip"] = (gzip.compress(body, 9, mtime=0), f"{self.tag}-gz")
+
+    def pick(self, accept_encodings):
+        """La variante más chica que el cliente acepta."""
+        for enc in ("br", "gzip"):
+            if enc in self.variants and accept_encodings[enc]:
+                return enc
+        return "identity"
+
+
+def respond(payload, request, cache_control="no-cache"):
+    enc = payload.pick(request.accept_encodings)
+    body, tag = payload.variants[enc]
+    inm = request.if_none_match
+    not_modified = inm and (inm.star_tag or any(inm.contains(t) for _, t in payload.variants.values()))
+    resp = Response(b"" if not_modified else body, status=304 if not_modified else 200, mimetype=payload.mimetype)
+    resp.set_etag(tag)
+    resp.headers["Cache-Control"] = cache_control
+    if len(payload.variants) > 1:
+        resp.vary.add("Accept-Encoding")
+    if enc != "identity":
+        resp.content_encoding = enc
+    if not_modified:
+        resp.headers.pop("Content-Length", None)
+    return resp
+
+
+class PageCache:
+    """Páginas renderizadas por llave (la ruta); todas se invalidan juntas
+    cuando ``stamp()`` devuelve algo distinto."""
+
+    def __init__(self, stamp, mimetype="text/html"):
+        self.stamp = stamp
+        self.mimetype = mimetype
+        self._stamp = None
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "renders": 0, "invalidations": 0}
+
+    def get(self, key, render):
+        stamp = self.stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    if self._stamp is not None:
+                        self._stats["invalidations"] += 1
+                    self._pages, self._stamp = {}, stamp
+        pages = self._pages
+        payload = pages.get(key)
+        if payload is not None:
+            self._stats["hits"] += 1
+            return payload
+        payload = Payload(render().encode("utf-8"), self.mimetype)
+        pages[key] = payload
+        self._stats["renders"] += 1
+        return payload
+
+    def stats(self):
+        return dict(self._stats, pages=len(self._pages))
+
+
+def json_body(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(obj, status=200, cache_control="no-store"):
+    resp = Response(json_body(obj), status=status, mimetype="application/json")
+    resp.headers["Cache-Control"] = cache_control
+    return resp
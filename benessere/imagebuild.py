@@ -0,0 +1,190 @@
+"""Variantes responsivas de ``static/images`` (paso de build, offline).
+
+Uso::
+
+    python -m benessere.imagebuild              # static/images -> static/build/images
+    python -m benessere.imagebuild --jobs 4 --force
+
+Por cada imagen se generan WebP y JPEG en ``WIDTHS`` (sin ampliar nunca) y un
+placeholder borroso diminuto (data URI), y se anotan en ``manifest.json``::
+
+    {"oats.jpg": {"hash", "width", "height", "placeholder",
+                  "webp": [[120, "a1b2...-120.webp"], ...], "jpeg": [...]}}
+
+Los archivos generados se nombran por el hash del contenido, así dos fotos
+idénticas comparten variantes. Es incremental: una imagen cuyo hash no cambió
+(y cuyas variantes siguen en disco) no se vuelve a procesar; las conversiones
+corren en paralelo en un pool de procesos. Las variantes que ya nadie usa se
+borran.
+
+``Manifest`` lee el manifiesto (recargándolo si cambia) y elige la variante
+más chica que cubre un ancho dado; Flask y Streamlit lo usan con fallback a la
+imagen original si no se corrió el build.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = ROOT / "static" / "images"
+OUT_DIR = ROOT / "static" / "build" / "images"
+MANIFEST = "manifest.json"
+
+WIDTHS = (120, 240, 480, 960)
+FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+PLACEHOLDER_WIDTH = 16
+EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _digest(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _outputs(entry):
+    return [name for fmt in FORMATS for _, name in entry[fmt]]
+
+
+def _build_one(src, out_dir, digest):
+    """Se ejecuta en el pool: genera las variantes de una imagen."""
+    from PIL import Image, ImageFilter, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(src)).convert("RGB")
+    w, h = img.size
+    widths = [x for x in WIDTHS if x < w] + [min(w, WIDTHS[-1])]
+    entry = {"hash": digest, "width": w, "height": h}
+    for fmt, (pil_fmt, opts) in FORMATS.items():
+        entry[fmt] = []
+        for vw in sorted(set(widths)):
+            name = f"{digest[:16]}-{vw}.{fmt}"
+            path = Path(out_dir) / name
+            if not path.exists():
+                v = img if vw == w else img.resize((vw, round(h * vw / w)), Image.LANCZOS)
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                v.save(tmp, format=pil_fmt, **opts)
+                os.replace(tmp, path)
+            entry[fmt].append([vw, name])
+    tiny = img.resize((PLACEHOLDER_WIDTH, max(1, round(h * PLACEHOLDER_WIDTH / w))), Image.BILINEAR)
+    buf = io.BytesIO()
+    tiny.filter(ImageFilter.GaussianBlur(1)).save(buf, format="JPEG", quality=40)
+    entry["placeholder"] = "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+    return entry
+
+
+def read_manifest(out_dir=OUT_DIR):
+    try:
+        return json.loads((Path(out_dir) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def build(src_dir=SRC_DIR, out_dir=OUT_DIR, jobs=None, force=False):
+    """Genera/actualiza las variantes. Devuelve un resumen con los conteos y bytes."""
+    src_dir, out_dir = Path(src_dir), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    old = {} if force else read_manifest(out_dir)
+    sources = sorted(p for p in src_dir.iterdir() if p.is_file() and p.suffix.lower() in EXTS)
+
+    manifest, todo = {}, {}
+    for p in sources:
+        digest = _digest(p)
+        prev = old.get(p.name)
+        if prev and prev.get("hash") == digest and all((out_dir / n).exists() for n in _outputs(prev)):
+            manifest[p.name] = prev
+        else:
+            todo.setdefault(digest, []).append(p)     # duplicados: una sola conversión
+
+    if force:
+        for f in out_dir.iterdir():
+            if f.name != MANIFEST:
+                f.unlink()
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as ex:
+            futs = {digest: ex.submit(_build_one, str(paths[0]), str(out_dir), digest) for digest, paths in todo.items()}
+            for digest, fut in futs.items():
+                entry = fut.result()
+                for p in todo[digest]:
+                    manifest[p.name] = entry
+
+    keep = {n for e in manifest.values() for n in _outputs(e)} | {MANIFEST}
+    removed = 0
+    for f in out_dir.iterdir():
+        if f.name not in keep:
+            f.unlink()
+            removed += 1
+    tmp = out_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, out_dir / MANIFEST)
+
+    return {
+        "images": len(sources),
+        "built": sum(len(v) for v in todo.values()),
+        "skipped": len(sources) - sum(len(v) for v in todo.values()),
+        "removed": removed,
+        "bytes_src": sum(p.stat().st_size for p in sources),
+        "bytes_out": sum(f.stat().st_size for f in out_dir.iterdir() if f.name != MANIFEST),
+    }
+
+
+class Manifest:
+    """Manifiesto en memoria; se vuelve a leer si cambia el archivo."""
+
+    def __init__(self, out_dir=OUT_DIR):
+        self.path = Path(out_dir) / MANIFEST
+        self._key = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def stat_key(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def data(self):
+        key = self.stat_key()
+        if key != self._key:
+            with self._lock:
+                self._data = read_manifest(self.path.parent) if key else {}
+                self._key = key
+        return self._data
+
+    def get(self, filename):
+        return self.data().get(filename)
+
+
+def pick(entry, width, fmt="jpeg"):
+    """Nombre de la variante más chica con ancho >= ``width`` (o la mayor)."""
+    variants = entry[fmt]
+    for vw, name in variants:
+        if vw >= width:
+            return name
+    return variants[-1][1]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--src", default=str(SRC_DIR))
+    ap.add_argument("--out", default=str(OUT_DIR))
+    ap.add_argument("--jobs", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    ap.add_argument("--force", action="store_true", help="regenerar todo")
+    args = ap.parse_args(argv)
+    r = build(args.src, args.out, args.jobs, args.force)
+    print(
+        f"{r['images']} imágenes: {r['built']} procesadas, {r['skipped']} sin cambios, "
+        f"{r['removed']} archivos viejos borrados; "
+        f"originales {r['bytes_src'] / 1024:.0f} KB, variantes {r['bytes_out'] / 1024:.0f} KB"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Verificación básica de fotos de retos (actividad física y comida saludable).
+
+Una sola decodificación por foto:
+
+- se rechaza antes de decodificar si supera ``MAX_BYTES`` o ``MAX_PIXELS``
+  (el tamaño sale de la cabecera);
+- los JPEG se decodifican en modo *draft* a escala reducida (1/2..1/8);
+- todas las características salen de un único arreglo float32 de
+  ``ANALYSIS_SIZE`` x ``ANALYSIS_SIZE``;
+- el resultado se guarda en caché por SHA-256 de los bytes subidos;
+- de la misma imagen reducida sale un dHash de 64 bits (``benessere.phash``)
+  para detectar fotos repetidas.
+
+Sin PIL/numpy instalados las verificaciones aceptan la foto (como antes).
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = 15 * 1024 * 1024
+MAX_PIXELS = 50_000_000
+ANALYSIS_SIZE = 256
+CACHE_SIZE = 512
+
+_deps = None
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _try_import_pil_numpy():
+    """Importa PIL y numpy una sola vez por proceso."""
+    global _deps
+    if _deps is None:
+        try:
+            from PIL import Image
+            import numpy as np
+            _deps = (Image, np)
+        except Exception:
+            _deps = (None, None)
+    return _deps
+
+
+def _read_bytes(file):
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    size = getattr(file, "size", None)
+    if size is not None and size > MAX_BYTES:
+        return None
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read(MAX_BYTES + 1)
+
+
+def _features(data):
+    Image, np = _try_import_pil_numpy()
+    img = Image.open(io.BytesIO(data))
+    w, h = img.size
+    if w * h > MAX_PIXELS:
+        return None
+    img.draft("RGB", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+    small = img.convert("RGB").resize((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.BILINEAR)
+
+    arr = np.asarray(small, dtype=np.float32) * np.float32(1 / 255)
+    r, g, b = arr[..., 0], arr[..., 1], arr[..., 2]
+    gray = r * np.float32(0.299) + g * np.float32(0.587) + b * np.float32(0.114)
+    green = (g > 0.35) & (g > r + 0.05) & (g > b + 0.05)
+    # dHash: 9x8 en gris, un bit por cada par de píxeles vecinos
+    tiny = np.asarray(small.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (tiny[:, 1:] > tiny[:, :-1]).ravel()
+    return {
+        "width": w,
+        "height": h,
+        "dhash": int.from_bytes(np.packbits(bits).tobytes(), "big"),
+        "gray_var": float(gray.var()) * 255.0 * 255.0,
+        "green_ratio": float(green.mean()),
+        "sat": float((arr.max(axis=2) - arr.min(axis=2)).mean()),
+    }
+
+
+def digest(data):
+    return hashlib.sha256(data).digest()
+
+
+def cached(key):
+    """(True, características) si ``key`` ya se analizó en este proceso."""
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return True, _cache[key]
+    return False, None
+
+
+def remember(key, feats):
+    with _cache_lock:
+        _cache[key] = feats
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def analyze_bytes(data):
+    """Decodifica y mide; sin caché (lo usan también los procesos del pool)."""
+    if not data or len(data) > MAX_BYTES:
+        return None
+    try:
+        return _features(data)
+    except Exception:
+        return None
+
+
+def analyze(file):
+    """Características de la foto, o None si no se pudo (o no se debe) decodificar."""
+    data = _read_bytes(file)
+    if not data or len(data) > MAX_BYTES:
+        return None
+    key = digest(data)
+    hit, feats = cached(key)
+    if not hit:
+        feats = analyze_bytes(data)
+        remember(key, feats)
+    return feats
+
+
+def check(kind, f):
+    """Veredicto a partir de las características: ``kind`` es "gym" o "food"."""
+    if not f:
+        return False
+    if kind == "gym":
+        return f["width"] >= 300 and f["height"] >= 300 and f["gray_var"] > 300.0
+    return f["green_ratio"] > 0.20 and f["sat"] > 0.15
+
+
+def verify_gym_photo(file) -> bool:
+    Image, np = _try_import_pil_numpy()
+    if not Image:  # fallback si no hay PIL/numpy
+        return True
+    return check("gym", analyze(file))
+
+
+def verify_healthy_food(file) -> bool:
+    Image, np = _try_import_pil_numpy()
+    if not Image:
+        return True
+    return check("food", analyze(file))
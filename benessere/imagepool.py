@@ -0,0 +1,236 @@
+"""Pool de procesos compartido para verificar fotos fuera del hilo de Streamlit.
+
+- ``max_pending`` acota los trabajos en cola + en curso; si está lleno,
+  ``submit`` lanza ``PoolBusy`` en vez de encolar sin límite.
+- Cada trabajo tiene un tiempo máximo: el proceso hijo se interrumpe con
+  ``setitimer`` (Unix) y el padre además da el trabajo por vencido. Un
+  trabajo abandonado (el hijo no respondió ni al temporizador, p. ej. colgado
+  en código C) libera su lugar en la cola; cuando ya hay ``recycle_after``
+  procesos colgados se cambia el pool por uno nuevo y se terminan los viejos.
+- ``PhotoJob.cancel()`` descarta un trabajo que aún no empezó.
+- ``metrics()`` devuelve contadores de saturación para dimensionar workers.
+
+Configurable con ``BENESSERE_IMG_WORKERS``, ``BENESSERE_IMG_QUEUE`` y
+``BENESSERE_IMG_TIMEOUT`` (segundos).
+"""
+
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from . import imagecheck
+from .metrics import REGISTRY
+
+WORKERS = int(os.environ.get("BENESSERE_IMG_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_PENDING = int(os.environ.get("BENESSERE_IMG_QUEUE", WORKERS * 4))
+TIMEOUT = float(os.environ.get("BENESSERE_IMG_TIMEOUT", "8"))
+
+PHOTO_SECONDS = REGISTRY.histogram(
+    "benessere_photo_check_seconds", "Verificación de fotos: desde que se encola hasta el resultado", ("status",),
+)
+
+
+class PoolBusy(RuntimeError):
+    """La cola de verificación está llena."""
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout
+
+
+def _run(data, timeout):
+    """Se ejecuta en el proceso hijo."""
+    armed = hasattr(signal, "setitimer")
+    if armed:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    t0 = time.perf_counter()
+    try:
+        return "ok", imagecheck.analyze_bytes(data), time.perf_counter() - t0
+    except _Timeout:
+        return "timeout", None, time.perf_counter() - t0
+    finally:
+        if armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _context():
+    methods = mp.get_all_start_methods()
+    # nunca fork: el servidor de Streamlit tiene muchos hilos vivos
+    return mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class PhotoJob:
+    """Resultado pendiente de una verificación; se consulta en cada rerun."""
+
+    def __init__(self, pool, kind, key, future=None, feats=None, verdict=None):
+        self.pool = pool
+        self.kind = kind
+        self.key = key
+        self.future = future
+        self.feats = feats
+        self.verdict = verdict
+        self.submitted = time.monotonic()
+        self.status = "ok" if future is None else "pending"
+
+    def done(self):
+        if self.status != "pending":
+            return True
+        if self.future.done():
+            return True
+        if time.monotonic() - self.submitted > self.pool.timeout * 2:
+            # el hijo no respondió ni con el temporizador: se abandona
+            self.status = "timeout"
+            self.pool._abandon(self)
+            return True
+        return False
+
+    def cancel(self):
+        if self.status == "pending" and self.future.cancel():
+            self.status = "cancelled"
+        return self.status == "cancelled"
+
+    def result(self):
+        """True/False si se pudo verificar; None si venció o se canceló."""
+        if self.verdict is not None:
+            return self.verdict
+        if self.status == "pending":
+            try:
+                status, feats, _ = self.future.result(timeout=0)
+            except CancelledError:
+                status, feats = "cancelled", None
+            except Exception:
+                status, feats = "error", None
+            self.status, self.feats = status, feats
+            if status == "ok":
+                imagecheck.remember(self.key, feats)
+        if self.status != "ok":
+            return None
+        return imagecheck.check(self.kind, self.feats)
+
+
+class ImagePool:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, timeout=TIMEOUT, recycle_after=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.recycle_after = recycle_after or max(1, workers // 2)
+        self._exec = self._new_executor()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._held = {}         # futuro -> su pool, mientras ocupa un lugar en la cola
+        self._stuck = 0         # trabajos abandonados desde el último cambio de pool
+        self._m = {
+            "submitted": 0, "completed": 0, "cache_hits": 0, "rejected_busy": 0,
+            "timeouts": 0, "abandoned": 0, "recycled": 0, "cancelled": 0, "errors": 0,
+            "in_flight": 0, "peak_in_flight": 0, "run_seconds": 0.0, "latency_seconds": 0.0,
+        }
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._m[name] += n
+
+    def submit(self, kind, data):
+        """Encola la verificación de ``data`` (bytes) y devuelve un ``PhotoJob``."""
+        if not imagecheck._try_import_pil_numpy()[0]:
+            return PhotoJob(self, kind, None, verdict=True)    # fallback si no hay PIL/numpy
+        if not data or len(data) > imagecheck.MAX_BYTES:
+            return PhotoJob(self, kind, None, feats=None)
+        key = imagecheck.digest(data)
+        hit, feats = imagecheck.cached(key)
+        if hit:
+            self._count("cache_hits")
+            return PhotoJob(self, kind, key, feats=feats)
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected_busy")
+            raise PoolBusy("Hay muchas fotos en verificación; intenta en unos segundos.")
+        with self._lock:
+            self._m["submitted"] += 1
+            self._m["in_flight"] += 1
+            self._m["peak_in_flight"] = max(self._m["peak_in_flight"], self._m["in_flight"])
+        t0 = time.monotonic()
+        try:
+            with self._lock:    # (el pool puede estar cambiándose)
+                fut = self._exec.submit(_run, data, self.timeout)
+                self._held[fut] = self._exec
+        except Exception:
+            self._release(None, t0)
+            raise
+        fut.add_done_callback(lambda f: self._release(f, t0))
+        return PhotoJob(self, kind, key, future=fut)
+
+    def _abandon(self, job):
+        if job.future.cancel():
+            return      # seguía en la cola: el callback ya liberó su lugar
+        self._release(job.future, job.submitted, abandoned=True)
+
+    def _release(self, fut, t0, abandoned=False):
+        latency = time.monotonic() - t0
+        recycle = False
+        with self._lock:
+            if fut is not None:
+                if fut not in self._held:
+                    return      # ya liberado al abandonarlo
+                pool = self._held.pop(fut)
+            m = self._m
+            m["in_flight"] -= 1
+            m["latency_seconds"] += latency
+            if abandoned:
+                status = "abandoned"
+                m["abandoned"] += 1
+                if pool is self._exec:      # los del pool viejo ya se terminaron
+                    self._stuck += 1
+                    recycle = self._stuck >= self.recycle_after
+            elif fut is None or fut.cancelled():
+                status = "cancelled" if fut is not None else "error"
+                m["cancelled" if fut is not None else "errors"] += 1
+            elif fut.exception() is not None:
+                status = "error"
+                m["errors"] += 1
+            else:
+                status, _, run = fut.result()
+                m["run_seconds"] += run
+                m["timeouts" if status == "timeout" else "completed"] += 1
+        self._slots.release()
+        PHOTO_SECONDS.observe(latency, status)
+        if recycle:
+            self._recycle()
+
+    def _recycle(self):
+        """Pool nuevo para los próximos trabajos; los procesos del viejo se
+        terminan (los trabajos que seguían en él terminan como error)."""
+        with self._lock:
+            old, self._exec = self._exec, self._new_executor()
+            self._stuck = 0
+            self._m["recycled"] += 1
+        old.shutdown(wait=False, cancel_futures=True)
+        # shutdown no interrumpe un hijo colgado en C (3.11 no tiene terminate_workers)
+        for p in list((getattr(old, "_processes", None) or {}).values()):
+            p.terminate()
+
+    def metrics(self):
+        """Contadores acumulados + saturación actual de la cola."""
+        with self._lock:
+            m = dict(self._m)
+        done = max(1, m["completed"] + m["timeouts"])
+        m.update(
+            workers=self.workers,
+            max_pending=self.max_pending,
+            saturation=m["in_flight"] / self.max_pending,
+            avg_run_ms=1000 * m["run_seconds"] / done,
+            avg_latency_ms=1000 * m["latency_seconds"] / done,
+        )
+        return m
+
+    def shutdown(self):
+        self._exec.shutdown(wait=False, cancel_futures=True)
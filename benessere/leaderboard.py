@@ -0,0 +1,133 @@
+"""Índice del ranking mantenido en cada cambio de saldo.
+
+Un árbol de Fenwick sobre el valor de los puntos cuenta cuántos usuarios hay en
+cada puntaje; cada puntaje guarda además sus usuarios en orden de llegada. Así:
+
+- ``update(uid, puntos)``: O(log P)
+- ``rank(uid)``: 1 + usuarios con más puntos, O(log P)
+- ``top(n)``: O(k log P), con k puntajes distintos entre los n primeros
+
+donde P es el puntaje máximo. ``rebuild`` arma el índice en una pasada lineal
+(sin ordenar) a partir de pares ``(uid, puntos)`` leídos del almacenamiento.
+"""
+
+import threading
+
+
+class LeaderboardIndex:
+    def __init__(self, pairs=()):
+        self._lock = threading.RLock()
+        self.rebuild(pairs)
+
+    # ------------------ Construcción ---------------
+    def rebuild(self, pairs):
+        with self._lock:
+            self._points = {}
+            self._buckets = {}
+            for uid, pts in pairs:
+                pts = max(0, int(pts or 0))
+                self._points[uid] = pts
+                self._buckets.setdefault(pts, {})[uid] = None
+            top = max(self._buckets, default=0)
+            self._size = 1 << max(10, (top + 1).bit_length())
+            self._build_tree()
+
+    def _build_tree(self):
+        """Fenwick en O(P) a partir de los conteos por puntaje."""
+        n = self._size
+        tree = [0] * (n + 1)
+        for pts, users in self._buckets.items():
+            tree[pts + 1] = len(users)
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _add(self, pts, v):
+        i, n, tree = pts + 1, self._size, self._tree
+        while i <= n:
+            tree[i] += v
+            i += i & -i
+
+    def _prefix(self, pts):
+        """Usuarios con puntaje <= ``pts``."""
+        i, s, tree = min(pts + 1, self._size), 0, self._tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def _kth_smallest(self, k):
+        """Puntaje del k-ésimo usuario (1 = menor puntaje)."""
+        pos, tree, step = 0, self._tree, self._size
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and tree[nxt] < k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos     # índice 1-based pos+1 -> puntaje pos
+
+    # ------------------ Mantenimiento ---------------
+    def update(self, uid, pts):
+        pts = max(0, int(pts or 0))
+        with self._lock:
+            old = self._points.get(uid)
+            if old == pts:
+                return
+            if old is not None:
+                b = self._buckets[old]
+                del b[uid]
+                if not b:
+                    del self._buckets[old]
+                self._add(old, -1)
+            self._points[uid] = pts
+            self._buckets.setdefault(pts, {})[uid] = None
+            if pts >= self._size:
+                while pts >= self._size:
+                    self._size <<= 1
+                self._build_tree()
+            else:
+                self._add(pts, 1)
+
+    def remove(self, uid):
+        with self._lock:
+            pts = self._points.pop(uid, None)
+            if pts is not None:
+                b = self._buckets[pts]
+                del b[uid]
+                if not b:
+                    del self._buckets[pts]
+                self._add(pts, -1)
+
+    # ------------------ Consultas ---------------
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, uid):
+        return uid in self._points
+
+    def points(self, uid):
+        return self._points.get(uid)
+
+    def rank(self, uid):
+        """Posición 1-based (empates comparten posición), o None si no está."""
+        with self._lock:
+            pts = self._points.get(uid)
+            if pts is None:
+                return None
+            return len(self._points) - self._prefix(pts) + 1
+
+    def top(self, n=10):
+        """Lista de ``(uid, puntos)`` de mayor a menor."""
+        out = []
+        with self._lock:
+            total = len(self._points)
+            while len(out) < n and len(out) < total:
+                pts = self._kth_smallest(total - len(out))
+                for uid in self._buckets[pts]:
+                    out.append((uid, pts))
+                    if len(out) == n:
+                        break
+        return out
@@ -0,0 +1,287 @@
+"""Libro de puntos append-only en segmentos rotativos.
+
+Cada movimiento de puntos es una línea JSON ``[ts, uid, delta, reason]`` (con
+un dict de datos extra al final, p. ej. ``{"balance": saldo}``) que se
+añade al segmento activo (``seg-00000001.log``...). Cuando un segmento llega a
+``segment_bytes`` se abre el siguiente. La compactación (manual o en un hilo de
+fondo) suma los segmentos cerrados en ``snapshot.json`` —saldo y últimos
+movimientos por usuario— y los archiva comprimidos en ``archive/``.
+
+El saldo y el historial reciente de un usuario salen de la última foto más la
+cola de segmentos vivos, que se mantiene en memoria y se pone al día leyendo
+sólo los bytes nuevos.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+
+from .filelock import FileLock
+
+SEGMENT_BYTES = 4 * 1024 * 1024
+KEEP_RECENT = 20
+
+
+def _seg_name(seq):
+    return f"seg-{seq:08d}.log"
+
+
+def _encode(ts, uid, delta, reason, extra=None):
+    row = [ts, uid, int(delta), reason] + ([extra] if extra else [])
+    return (json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _decode(line):
+    ts, uid, delta, reason, *extra = json.loads(line)
+    return {**(extra[0] if extra else {}), "uid": uid, "ts": ts, "delta": delta, "reason": reason}
+
+
+class Ledger:
+    def __init__(self, path, segment_bytes=SEGMENT_BYTES, keep_recent=KEEP_RECENT):
+        self.path = Path(path)
+        self.archive = self.path / "archive"
+        self.archive.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.keep_recent = keep_recent
+        self._lock = threading.RLock()
+        self._flock = FileLock(self.path / ".lock")   # escrituras y compactación entre procesos
+        self._compactor = None
+        self._stop = threading.Event()
+        self._listeners = []
+        self._pos = (0, 0)
+        self._heard = (0, 0)    # hasta dónde (segmento, byte) se avisó a los suscriptores
+        self._load()
+
+    # ------------------ Estado en memoria ---------------
+    def _segments(self):
+        return sorted(int(p.name[4:12]) for p in self.path.glob("seg-*.log"))
+
+    def _load(self):
+        """Última foto + repetición de los segmentos que aún no cubre."""
+        with self._lock:
+            snap = {"seq": 0, "balances": {}, "recent": {}}
+            self._snap_mtime = self._snapshot_mtime()
+            try:
+                snap = json.loads((self.path / "snapshot.json").read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                pass
+            # lo que otro proceso pasó a la foto desde nuestra última lectura no
+            # se vuelve a leer de los segmentos vivos: se avisa desde archive/
+            seq, off = self._pos
+            for s in range(seq, snap["seq"] + 1) if self._listeners else ():
+                data = self._read_segment(s)
+                for _ in self._entries(s, data, off if s == seq else 0, data.rfind(b"\n") + 1):
+                    pass
+            self._snap_seq = snap["seq"]
+            self._snap_bal = snap["balances"]
+            self._snap_recent = snap["recent"]
+            self._tail_sum = defaultdict(int)
+            self._tail_recent = defaultdict(lambda: deque(maxlen=self.keep_recent))
+            segs = [s for s in self._segments() if s > self._snap_seq]
+            self._active = segs[-1] if segs else self._snap_seq + 1
+            self._pos = (segs[0] if segs else self._active, 0)
+            self._catch_up()
+
+    def _snapshot_mtime(self):
+        try:
+            return (self.path / "snapshot.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _catch_up(self):
+        """Lee los bytes añadidos desde la última lectura (de este u otro proceso)."""
+        if self._snapshot_mtime() != self._snap_mtime:
+            return self._load()     # otro proceso compactó: recargar la foto
+        seq, off = self._pos
+        while True:
+            p = self.path / _seg_name(seq)
+            try:
+                with open(p, "rb") as f:
+                    f.seek(off)
+                    data = f.read()
+            except FileNotFoundError:
+                data = b""
+            end = data.rfind(b"\n") + 1   # ignora una línea a medio escribir
+            for e in self._entries(seq, data, 0, end, base=off):
+                self._tail_sum[e["uid"]] += e["delta"]
+                self._tail_recent[e["uid"]].append(e)
+            off += end
+            if (self.path / _seg_name(seq + 1)).exists():
+                seq, off = seq + 1, 0
+                continue
+            break
+        self._pos = (seq, off)
+        self._active = max(self._active, seq)
+
+    def _entries(self, seq, data, start, end, base=0):
+        """Movimientos de ``data[start:end]`` (``base`` = byte del segmento donde
+        empieza ``data``); avisa a los suscriptores de los que aún no oyeron."""
+        pos = start
+        while pos < end:
+            nl = data.index(b"\n", pos) + 1
+            e = _decode(data[pos:nl])
+            pos = nl
+            if (seq, base + nl) > self._heard:
+                self._heard = (seq, base + nl)
+                for fn in self._listeners:
+                    fn(e)
+            yield e
+
+    # ------------------ Escritura ---------------
+    def append(self, uid, delta, reason, ts, **extra):
+        """Añade un movimiento: O(1) bytes al final del segmento activo."""
+        self.append_many([(ts, uid, delta, reason, extra)])
+
+    def append_many(self, entries):
+        buf = b"".join(_encode(*e) for e in entries)
+        if not buf:
+            return
+        with self._lock, self._flock:
+            self._catch_up()    # otro proceso pudo haber rotado el segmento
+            p = self.path / _seg_name(self._active)
+            with open(p, "ab") as f:
+                f.write(buf)
+                size = f.tell()
+            if size >= self.segment_bytes:
+                self._active += 1
+                (self.path / _seg_name(self._active)).touch()
+            self._catch_up()
+
+    def clear(self):
+        """Borra todos los movimientos (foto, segmentos vivos y archivados).
+        Sólo para reimportar una base completa, con la app detenida."""
+        with self._lock, self._flock:
+            for p in [*self.path.glob("seg-*.log"), *self.archive.glob("seg-*.log.gz"), self.path / "snapshot.json"]:
+                p.unlink(missing_ok=True)
+            self._pos = self._heard = (0, 0)
+            self._load()
+
+    # ------------------ Lectura ---------------
+    def empty(self):
+        """True si el libro no tiene ningún movimiento."""
+        with self._lock:
+            self._catch_up()
+            if self._snap_bal or self._tail_sum:
+                return False
+        return next(self.chunks(), None) is None
+
+    def subscribe(self, fn):
+        """``fn(movimiento)`` por cada línea nueva, de cualquier proceso, una sola
+        vez (también las que otro proceso compactó antes de que las leyéramos)."""
+        with self._lock:
+            self._listeners.append(fn)
+
+    def poll(self):
+        with self._lock:
+            self._catch_up()
+
+    def balance(self, uid):
+        with self._lock:
+            self._catch_up()
+            return int(self._snap_bal.get(uid, 0)) + self._tail_sum.get(uid, 0)
+
+    def recent(self, uid, n=None):
+        n = n or self.keep_recent
+        with self._lock:
+            self._catch_up()
+            old = [
+                {"uid": uid, "ts": ts, "delta": d, "reason": r}
+                for ts, d, r in self._snap_recent.get(uid, [])
+            ]
+            rows = old + list(self._tail_recent.get(uid, ()))
+            return rows[-n:]
+
+    def scan(self):
+        """Recorre todos los movimientos en orden (archivo + segmentos vivos)."""
+        for p in sorted(self.archive.glob("seg-*.log.gz")):
+            with gzip.open(p, "rb") as f:
+                for line in f:
+                    yield _decode(line)
+        for seq in self._segments():
+            try:
+                with open(self.path / _seg_name(seq), "rb") as f:
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            yield _decode(line)
+            except FileNotFoundError:   # archivado mientras lo leíamos
+                continue
+
+    def chunks(self, since=(0, 0)):
+        """``((seq, offset), bytes)`` con las líneas completas desde ``since``,
+        un tramo por segmento (archivado o vivo). La posición devuelta es desde
+        donde seguir la próxima vez."""
+        seq0, off0 = since
+        segs = {int(p.name[4:12]) for p in self.archive.glob("seg-*.log.gz")} | set(self._segments())
+        for seq in sorted(s for s in segs if s >= seq0):
+            data = self._read_segment(seq)
+            skip = off0 if seq == seq0 else 0
+            end = data.rfind(b"\n") + 1   # ignora una línea a medio escribir
+            if end > skip:
+                yield (seq, end), data[skip:end]
+
+    def _read_segment(self, seq):
+        try:
+            with open(self.path / _seg_name(seq), "rb") as f:
+                return f.read()
+        except FileNotFoundError:       # archivado entretanto
+            try:
+                with gzip.open(self.archive / (_seg_name(seq) + ".gz"), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                return b""
+
+    # ------------------ Compactación ---------------
+    def compact(self):
+        """Pliega los segmentos cerrados en una nueva foto y los archiva.
+
+        Devuelve cuántos segmentos se compactaron.
+        """
+        with self._lock, self._flock:
+            self._catch_up()
+            closed = [s for s in self._segments() if self._snap_seq < s < self._active]
+            if not closed:
+                return 0
+            bal = dict(self._snap_bal)
+            recent = {u: deque(r, maxlen=self.keep_recent) for u, r in self._snap_recent.items()}
+            for seq in closed:
+                with open(self.path / _seg_name(seq), "rb") as f:
+                    for line in f:
+                        e = _decode(line)
+                        bal[e["uid"]] = bal.get(e["uid"], 0) + e["delta"]
+                        recent.setdefault(e["uid"], deque(maxlen=self.keep_recent)).append(
+                            [e["ts"], e["delta"], e["reason"]]
+                        )
+            snap = {"seq": closed[-1], "balances": bal, "recent": {u: list(r) for u, r in recent.items()}}
+            tmp = self.path / "snapshot.json.tmp"
+            tmp.write_text(json.dumps(snap, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, self.path / "snapshot.json")
+            for seq in closed:
+                src = self.path / _seg_name(seq)
+                with open(src, "rb") as fi, gzip.open(self.archive / (src.name + ".gz"), "wb") as fo:
+                    shutil.copyfileobj(fi, fo)
+                src.unlink()
+            self._load()
+            return len(closed)
+
+    def start_compactor(self, interval=300.0):
+        """Hilo de fondo que compacta cada ``interval`` segundos."""
+        if self._compactor is not None:
+            return self._compactor
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except Exception:
+                    pass    # se reintenta en la próxima vuelta
+
+        self._compactor = threading.Thread(target=run, name="ledger-compactor", daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,252 @@
+"""Reglas de Benessere Loyalty: puntos, retos diarios, ruleta y canjes.
+
+Todas las funciones reciben ``db``, que es un ``LoyaltyStore`` (ver
+``benessere.store``); ``u`` es el dict que devuelve ``get_user``.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from . import coupons, referrals
+from .rewards import RewardTable
+
+CHECKIN_CODE = "BENESSERE-CHECKIN"         # (si luego quieres añadir UI de check-in)
+HAPPY_HOUR = (15, 16)                      # 15:00–16:00
+SPIN_REASON = "Ruleta diaria"              # motivo en el libro: "Ruleta diaria: <premio>"
+
+# Recompensas de la ruleta (con tus probabilidades)
+SPIN_REWARDS = [
+    {"label": "🎟 -10% en Açaí",            "points": 0,   "coupon": "DESC10-ACAI",     "w": 4},
+    {"label": "🧃 -15% en Jugo",             "points": 0,   "coupon": "DESC15-JUGO",     "w": 6},
+    {"label": "🎉 +100 pts",                 "points": 100, "coupon": None,              "w": 30},
+    {"label": "💎 +500 pts",                 "points": 500, "coupon": None,              "w": 5},
+    {"label": "⭐ +75 pts",                  "points": 75,  "coupon": None,              "w": 40},
+    {"label": "🥣 -15% en Granola",          "points": 0,   "coupon": "DESC15-GRANOLA",  "w": 5},
+    {"label": "🥣 -15% en Overnight Oats",   "points": 0,   "coupon": "DESC15-OATS",     "w": 5},
+    {"label": "🍧 Açaí GRATIS",              "points": 0,   "coupon": "FREE-ACAI",       "w": 1},
+    {"label": "🧃 Jugo GRATIS",              "points": 0,   "coupon": "FREE-JUGO",       "w": 1},
+    {"label": "🥣 -50% en Granola",          "points": 0,   "coupon": "DESC50-GRANOLA",  "w": 3},
+]
+
+# Sorteo O(1) por alias y sector de cada premio precalculado (ver benessere.rewards)
+SPIN_TABLE = RewardTable(SPIN_REWARDS)
+
+# Zona de canjeo (tus valores)
+REDEEM_ITEMS = [
+    {"name": "Açaí Zero 120g", "cost": 2500, "coupon": "CANJ-ACAI120"},
+    {"name": "Açaí Zero 180g", "cost": 3000, "coupon": "CANJ-ACAI180"},
+    {"name": "Jugo Natural 350 ml", "cost": 2000, "coupon": "CANJ-J350"},
+    {"name": "Jugo Natural 600 ml", "cost": 2600, "coupon": "CANJ-J600"},
+    {"name": "Granola", "cost": 2400, "coupon": "CANJ-GRANOLA"},
+]
+
+
+# ------------------ Tiempo e identificadores ---------------
+def _now():
+    return datetime.now(timezone.utc) - timedelta(hours=4)  # Bolivia
+
+def _today_str():
+    return _now().strftime("%Y-%m-%d")
+
+def _uid(raw: str):
+    return hashlib.sha1(raw.strip().lower().encode("utf-8")).hexdigest()[:12]
+
+
+# ------------------ Usuarios y puntos ---------------
+def get_user(db, user_id):
+    u = db.get_user(user_id)
+    if not u:
+        u = db.create_user({
+            "id": user_id,
+            "name": "",
+            "points": 0,
+            "created": _now().isoformat(),
+            "last_spin": None,
+            "ref_code": user_id[:6].upper(),
+            "referred_by": None,
+            "purchases": [],        # reservado
+            "coupons": [],
+        })
+    return u
+
+def _sync(u, new):
+    """Copia en ``u`` (el dict de la sesión) el estado que devolvió la transacción."""
+    if new is not None:
+        u.clear()
+        u.update(new)
+    return new
+
+def set_name(u, db, name):
+    _sync(u, db.transact(u["id"], lambda cur: {"fields": {"name": name}}))
+
+def add_points(u, db, pts, reason=""):
+    ts = _now().isoformat()
+    if _sync(u, db.transact(u["id"], lambda cur: {"points": int(pts), "reason": reason, "ts": ts})) is not None:
+        referral_bonus(u, db, int(pts), ts)
+
+# ------------------ Referidos ---------------
+def set_referrer(u, db, code):
+    """Registra el código de quien invitó a ``u`` (una sola vez). ``(ok, mensaje)``."""
+    code = referrals.normalize(code)
+    ref_uid = db.find_ref_code(code) if code else None
+    if ref_uid is None:
+        return False, "Código de referido inválido."
+    if u.get("referred_by"):
+        return False, "Ya tienes un código de referido registrado."
+    if not db.referrals().can_link(u["id"], ref_uid):
+        return False, "No puedes usar tu propio código ni el de alguien que invitaste."
+    ts = _now().isoformat()
+
+    def plan(cur):
+        if cur.get("referred_by"):
+            return None
+        # la línea del libro avisa a los otros procesos (ver LoyaltyStore.referrals)
+        return {"fields": {"referred_by": ref_uid}, "reason": referrals.JOIN_REASON, "ts": ts,
+                "log": {"ref": ref_uid}}
+
+    if _sync(u, db.transact(u["id"], plan)) is None:
+        return False, "Ya tienes un código de referido registrado."
+    return True, "¡Código de referido registrado!"
+
+def referral_bonus(u, db, pts, ts):
+    """Bono para quien invitó a ``u`` y los niveles de arriba (``referrals.LEVELS``)
+    por ``pts`` recién ganados: sube sólo esos eslabones, no recorre el grafo."""
+    parent = u.get("referred_by")
+    if pts <= 0 or not parent:
+        return
+    chain = [parent] + db.referrals().ancestors(parent, len(referrals.LEVELS) - 1)
+    for level, uid, bonus in referrals.bonuses(chain, pts):
+        # motivo fijo por nivel (una columna en benessere.analytics); el referido va aparte
+        reason = f"{referrals.BONUS_REASON} (nivel {level})"
+        db.transact(uid, lambda cur, b=bonus, r=reason: {"points": b, "reason": r, "ts": ts, "log": {"from": u["id"]}})
+
+def ensure_daily(u, db):
+    """Estado de los retos de hoy: {steps_done, gym_done, food_done, checkin}."""
+    return db.get_daily(u["id"], _today_str())
+
+def complete_daily(u, db, d, flag, pts, reason, photo=None):
+    """Marca el reto y suma sus puntos en una sola transacción.
+
+    ``photo`` (``{"hash", "kind"}``) guarda el dHash de la foto aceptada en la
+    misma transacción. Devuelve False si otra sesión ya lo había completado hoy.
+    """
+    ts = _now().isoformat()
+
+    def plan(cur):
+        p = {"daily": (_today_str(), flag), "points": int(pts), "reason": reason, "ts": ts}
+        if photo is not None:
+            p["photo"] = photo
+        return p
+
+    new = _sync(u, db.transact(u["id"], plan))
+    d[flag] = True
+    if new is not None:
+        referral_bonus(u, db, int(pts), ts)
+    return new is not None
+
+def photo_repeated(u, db, photo_hash, reason):
+    """True si ya se aceptó una foto casi igual (de cualquier usuario); el
+    rechazo queda en el historial con 0 puntos."""
+    if photo_hash is None:
+        return False
+    hit = db.similar_photo(photo_hash)
+    if hit is None:
+        return False
+    db.log_rejection(u["id"], f"Rechazado (foto repetida): {reason}", _now().isoformat())
+    return True
+
+def can_spin_today(u):
+    last = u.get("last_spin")
+    return (not last) or (last.split("T")[0] != _today_str())
+
+def claim_spin(u, db, prize):
+    """Entrega el premio y marca el giro del día de forma atómica.
+
+    Devuelve False si el usuario ya había girado hoy (p. ej. desde otra pestaña).
+    """
+    ts = _now().isoformat()
+
+    def plan(cur):
+        if not can_spin_today(cur):
+            return None
+        # todo giro queda en el libro (con 0 puntos si el premio es un cupón)
+        p = {"fields": {"last_spin": ts}, "points": prize["points"],
+             "reason": f"{SPIN_REASON}: {prize['label']}", "ts": ts}
+        if prize["coupon"]:
+            p["coupons"] = [coupons.issue(prize["coupon"], "Ruleta", ts)]
+        return p
+
+    if _sync(u, db.transact(u["id"], plan)) is None:
+        return False
+    referral_bonus(u, db, int(prize["points"]), ts)
+    return True
+
+def spin(u, db, table=SPIN_TABLE, rng=None):
+    """Sortea y entrega el premio del día: ``(premio, None)`` o ``(None, motivo)``.
+
+    El premio trae ``slot``, su sector en la rueda (para la animación)."""
+    if not can_spin_today(u):
+        return None, "Ya giraste hoy."
+    prize = table.draw(rng)
+    if not claim_spin(u, db, prize):
+        return None, "Ya giraste hoy."
+    return prize, None
+
+def redeem(u, db, item):
+    cost = int(item["cost"])
+    ts = _now().isoformat()
+    issued = []
+
+    def plan(cur):
+        if int(cur.get("points", 0)) < cost:
+            return None
+        issued[:] = [coupons.issue(item["coupon"], "Canje", ts)]     # código nuevo en cada reintento
+        return {
+            "points": -cost, "reason": f"Canje: {item['name']}", "ts": ts,
+            "coupons": issued,
+            "redemption": {"item": item["name"], "ts": ts},
+        }
+
+    if _sync(u, db.transact(u["id"], plan)) is None:
+        return False, "No tienes puntos suficientes."
+    return True, issued[0]["code"]
+
+# ------------------ Cupones en el kiosco ---------------
+def _coupon_verdict(c, now):
+    if c is None:
+        return "Cupón inexistente."
+    st = coupons.status(c, now)
+    if st == coupons.USED:
+        return f"Cupón ya usado ({c['used_ts'][:16].replace('T', ' ')})."
+    if st == coupons.EXPIRED:
+        return f"Cupón vencido el {c['expires'][:10]}."
+    return None
+
+def check_coupon(db, code):
+    """``(válido, cupón, mensaje)``; el cupón trae ``uid`` del dueño (o es None)."""
+    c = db.find_coupon(coupons.normalize(code))
+    err = _coupon_verdict(c, _now().isoformat())
+    return err is None, c, err or f"Válido: {c['kind']}."
+
+def use_coupon(db, code):
+    """Marca el cupón como usado si sigue vigente (una sola vez, aunque dos
+    cajas lo intenten a la vez). Devuelve ``(ok, cupón, mensaje)``."""
+    code = coupons.normalize(code)
+    now = _now().isoformat()
+    if db.use_coupon(code, now):
+        return True, db.find_coupon(code), "Cupón canjeado."
+    c = db.find_coupon(code)
+    return False, c, _coupon_verdict(c, now) or "Cupón no disponible."
+
+def expire_coupons(db):
+    return db.expire_coupons(_now().isoformat())
+
+def leaderboard(db, top_n=10):
+    return db.leaderboard(top_n)
+
+def user_rank(db, u):
+    return db.rank(u["id"])
+
+def is_happy_hour():
+    now = _now()
+    return HAPPY_HOUR[0] <= now.hour < HAPPY_HOUR[1]
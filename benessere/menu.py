@@ -0,0 +1,116 @@
+"""Caché del menú (``data/menu.json``) para la web Flask.
+
+- La llave es ``(mtime, tamaño)`` del archivo: cada consulta hace a lo sumo un
+  ``stat`` y sólo se vuelve a leer el JSON si cambió.
+- Si el archivo nuevo no pasa la validación se sigue sirviendo la última
+  versión buena (o el menú por defecto si nunca hubo una).
+- El menú se normaliza una vez y se entrega congelado (dicts de sólo lectura y
+  tuplas), así todos los hilos comparten la misma copia; cargado antes del
+  ``fork`` de gunicorn, los workers la heredan sin volver a leerla.
+- ``stats()`` cuenta aciertos, lecturas, recargas y errores; la duración de
+  cada lectura va a ``benessere_menu_load_seconds``.
+"""
+
+import json
+import os
+import threading
+
+from .metrics import REGISTRY
+
+MENU_LOAD_SECONDS = REGISTRY.histogram("benessere_menu_load_seconds", "Lectura + validación de menu.json")
+
+
+class FrozenDict(dict):
+    """``dict`` de sólo lectura (sigue siendo serializable con ``json``)."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("el menú cacheado es de sólo lectura")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def normalize(data):
+    """Valida y normaliza ``{categoría: [ítems]}``; lanza ValueError si no sirve."""
+    if not isinstance(data, dict):
+        raise ValueError("el menú debe ser un objeto {categoría: [ítems]}")
+    out = {}
+    for cat, items in data.items():
+        if not isinstance(items, list):
+            raise ValueError(f"la categoría {cat!r} no es una lista")
+        norm = []
+        for it in items:
+            if not isinstance(it, dict):
+                raise ValueError(f"ítem inválido en {cat!r}")
+            norm.append(FrozenDict({
+                **it,
+                "name": str(it.get("name", "")).strip(),
+                "desc": str(it.get("desc", "")).strip(),
+                "price": float(it.get("price", 0)),
+                "img": str(it.get("img", "")).strip(),
+            }))
+        out[str(cat)] = tuple(norm)
+    return FrozenDict(out)
+
+
+class MenuCache:
+    def __init__(self, path, fallback):
+        self.path = path
+        self.fallback = normalize(fallback)
+        self._key = None
+        self._menu = None
+        self._good = None           # última versión válida leída del archivo
+        self.version = 0            # sube con cada menú nuevo (sirve de llave a otros cachés)
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0, "errors": 0}
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        key = self._stat_key()
+        if key == self._key and self._menu is not None:
+            self._stats["hits"] += 1
+            return self._menu
+        with self._lock:
+            if key != self._key or self._menu is None:
+                self._load(key)
+            else:
+                self._stats["hits"] += 1
+            return self._menu
+
+    def _load(self, key):
+        self._stats["misses"] += 1
+        first = self._menu is None
+        if key is None:
+            menu = self.fallback
+        else:
+            try:
+                with MENU_LOAD_SECONDS.time(), open(self.path, "r", encoding="utf-8") as f:
+                    menu = self._good = normalize(json.load(f))
+            except (OSError, ValueError, TypeError) as e:
+                # JSON malformado o con tipos raros: no rompemos la web
+                self._stats["errors"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                menu = self._good or self.fallback
+        if menu is not self._menu:
+            self.version += 1
+            if not first:
+                self._stats["reloads"] += 1
+        self._key, self._menu = key, menu
+        self._snap = (self.version, menu)
+
+    def snapshot(self):
+        """``(versión, menú)`` consistentes entre sí, para cachés derivados."""
+        self.get()
+        return self._snap
+
+    def stats(self):
+        return dict(self._stats, version=self.version)
@@ -0,0 +1,256 @@
+"""Métricas en memoria con salida en formato de texto de Prometheus.
+
+- ``Counter`` e ``Histogram`` con etiquetas: cada combinación de etiquetas es
+  una lista de números (sin objetos por serie) y cada métrica tiene su lock,
+  así se pueden actualizar desde muchos hilos. Los buckets son fijos.
+- ``CounterFunc``/``GaugeFunc`` leen valores que ya se llevan en otro lado
+  (p. ej. ``MenuCache.stats()``) sólo al exportar.
+- Con varios procesos (workers de gunicorn) cada uno vuelca su ``snapshot()``
+  a un directorio (``dump``) y quien exporta suma todos (``merge``).
+- ``write_textfile`` deja un ``.prom`` para el *textfile collector* de
+  node_exporter (lo usa Streamlit, que no tiene dónde servir ``/metrics``).
+
+``REGISTRY`` es el registro por defecto del proceso.
+"""
+
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _fmt(v):
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v)
+
+
+def _escape(v):
+    return str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera etiquetas {self.labelnames}, llegó {labels}")
+        return tuple(str(v) for v in labels)
+
+    def series(self):
+        """``{etiquetas: valor}`` (copia)."""
+        with self._lock:
+            return {k: (list(v) if isinstance(v, list) else v) for k, v in self._series.items()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        if not self.labelnames:
+            self._series[()] = 0        # sin etiquetas se exporta desde 0
+
+    def inc(self, *labels, n=1):
+        key = self._check(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + n
+
+
+class Histogram(_Metric):
+    """Por serie: ``[cuenta por bucket..., +Inf, suma]`` (cuentas no acumuladas)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        key = self._check(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    def time(self, *labels):
+        """``with h.time("load"): ...`` observa la duración del bloque."""
+        return _Timer(self, labels)
+
+
+class _Timer:
+    __slots__ = ("h", "labels", "t0")
+
+    def __init__(self, h, labels):
+        self.h, self.labels = h, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.h.observe(time.perf_counter() - self.t0, *self.labels)
+        return False
+
+
+class CounterFunc(_Metric):
+    """Contador cuyo valor sale de ``fn() -> {etiquetas: valor}`` al exportar."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels, fn):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def series(self):
+        return {self._check(k if isinstance(k, tuple) else (k,)): v for k, v in self.fn().items()}
+
+
+class GaugeFunc(CounterFunc):
+    kind = "gauge"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._dumped = 0.0
+
+    def _add(self, metric):
+        with self._lock:
+            old = self._metrics.get(metric.name)
+            if old is not None:
+                return old          # re-importar un módulo (reruns) no duplica la métrica
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def counter_func(self, name, help, labels, fn):
+        return self._add(CounterFunc(name, help, labels, fn))
+
+    def gauge_func(self, name, help, labels, fn):
+        return self._add(GaugeFunc(name, help, labels, fn))
+
+    def snapshot(self):
+        """Todo en un dict serializable a JSON (para sumar entre procesos)."""
+        out = {}
+        for m in list(self._metrics.values()):
+            out[m.name] = {
+                "kind": m.kind, "help": m.help, "labels": list(m.labelnames),
+                "buckets": list(getattr(m, "buckets", ())),
+                "series": [[list(k), v] for k, v in m.series().items()],
+            }
+        return out
+
+    def dump(self, path, every=0.0):
+        """Escribe el ``snapshot()`` en ``path`` (atómico); con ``every`` no más
+        de una vez cada tantos segundos."""
+        now = time.monotonic()
+        if every and now - self._dumped < every:
+            return False
+        self._dumped = now
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+        return True
+
+    def render(self, others=()):
+        """Texto de Prometheus de este proceso más los ``snapshot()`` de ``others``."""
+        return render(merge([self.snapshot(), *others]))
+
+    def write_textfile(self, path, every=0.0):
+        now = time.monotonic()
+        if every and now - self._dumped < every:
+            return False
+        self._dumped = now
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        return True
+
+
+def load_snapshots(pattern, exclude=None):
+    """Los ``snapshot()`` volcados que calzan con ``pattern`` (menos ``exclude``)."""
+    out = []
+    for path in sorted(glob.glob(pattern)):
+        if path == exclude:
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue        # a medio escribir o borrado entretanto
+    return out
+
+
+def merge(snapshots):
+    """Suma serie a serie (contadores e histogramas; los gauges también se suman)."""
+    out = {}
+    for snap in snapshots:
+        for name, m in snap.items():
+            dst = out.setdefault(name, {**m, "series": {}})
+            if dst["buckets"] != m["buckets"]:
+                continue        # otra versión del código con otros buckets
+            for labels, v in m["series"]:
+                key = tuple(labels)
+                cur = dst["series"].get(key)
+                if cur is None:
+                    dst["series"][key] = list(v) if isinstance(v, list) else v
+                elif isinstance(v, list):
+                    dst["series"][key] = [a + b for a, b in zip(cur, v)]
+                else:
+                    dst["series"][key] = cur + v
+    return out
+
+
+def render(merged):
+    lines = []
+    for name, m in sorted(merged.items()):
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        names = m["labels"]
+        for key, v in sorted(m["series"].items()):
+            if m["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_fmt(v)}")
+                continue
+            acc = 0
+            for le, n in zip([*m["buckets"], float("inf")], v[:-1]):
+                acc += n
+                lines.append(f"{name}_bucket{_labels(names, key, ('le', _fmt(float(le))))} {acc}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_fmt(v[-1])}")
+            lines.append(f"{name}_count{_labels(names, key)} {acc}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1,54 @@
+"""Migración única de ``data/loyalty.json`` (legado) a SQLite.
+
+Uso::
+
+    python -m benessere.migrate                      # data/loyalty.json -> data/loyalty.db
+    python -m benessere.migrate origen.json destino.db
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .store import JSON_PATH, SQLITE_PATH, SQLiteStore
+
+
+def migrate_json_to_sqlite(src, dst, replace_ledger=False):
+    """Copia usuarios, retos, cupones, historial y canjes. ``dst`` puede ser
+    una ruta o un ``SQLiteStore`` ya abierto. Devuelve el número de usuarios.
+
+    Si el libro del destino ya tiene movimientos y el JSON trae historial, se
+    rechaza (``ValueError``) salvo con ``replace_ledger``, que lo vacía.
+    """
+    try:
+        db = json.loads(Path(src).read_text(encoding="utf-8") or "{}")
+    except (OSError, ValueError):
+        db = {}
+    store = dst if isinstance(dst, SQLiteStore) else SQLiteStore(dst)
+    store.import_legacy(db, replace_ledger)
+    return len(db.get("users", {}))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("src", nargs="?", default=str(JSON_PATH))
+    ap.add_argument("dst", nargs="?", default=str(SQLITE_PATH))
+    ap.add_argument("--force", action="store_true",
+                    help="migrar aunque el destino ya exista (reemplaza sus tablas y su libro)")
+    args = ap.parse_args(argv)
+
+    if Path(args.dst).exists() and not args.force:
+        print(f"{args.dst} ya existe; usa --force para volver a importar.", file=sys.stderr)
+        return 1
+    try:
+        n = migrate_json_to_sqlite(args.src, args.dst, replace_ledger=args.force)
+    except ValueError as e:
+        print(f"{args.dst}: {e}", file=sys.stderr)
+        return 1
+    print(f"Migrados {n} usuarios: {args.src} -> {args.dst}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
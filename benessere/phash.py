@@ -0,0 +1,67 @@
+"""Índice de hashes perceptuales (dHash de 64 bits) para detectar fotos repetidas.
+
+Multi-index hashing: el hash se parte en ``radius + 1`` trozos y cada trozo
+tiene su propia tabla. Por el principio del palomar, dos hashes a distancia de
+Hamming <= ``radius`` coinciden exactamente en al menos un trozo, así que una
+consulta mira sólo ``radius + 1`` cubetas y verifica esos candidatos con
+``bit_count``; no recorre todos los hashes guardados.
+"""
+
+import threading
+
+BITS = 64
+RADIUS = 6
+
+
+def to_signed(h):
+    """Para guardar en una columna INTEGER de SQLite (64 bits con signo)."""
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def to_unsigned(h):
+    return h + (1 << 64) if h < 0 else h
+
+
+class MultiIndexHash:
+    def __init__(self, radius=RADIUS, bits=BITS):
+        self.radius = radius
+        m = radius + 1
+        sizes = [bits // m + (1 if i < bits % m else 0) for i in range(m)]
+        self._slices = []
+        shift = 0
+        for size in sizes:
+            self._slices.append((shift, (1 << size) - 1))
+            shift += size
+        self._tables = [{} for _ in sizes]
+        self._items = []        # (hash, payload)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _keys(self, h):
+        return [(h >> shift) & mask for shift, mask in self._slices]
+
+    def add(self, h, payload=None):
+        with self._lock:
+            i = len(self._items)
+            self._items.append((h, payload))
+            for table, k in zip(self._tables, self._keys(h)):
+                table.setdefault(k, []).append(i)
+
+    def nearest(self, h, radius=None):
+        """``(distancia, hash, payload)`` más cercano dentro del radio, o None."""
+        radius = self.radius if radius is None else min(radius, self.radius)
+        best = None
+        seen = set()
+        with self._lock:
+            for table, k in zip(self._tables, self._keys(h)):
+                for i in table.get(k, ()):
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    cand, payload = self._items[i]
+                    d = (cand ^ h).bit_count()
+                    if d <= radius and (best is None or d < best[0]):
+                        best = (d, cand, payload)
+        return best
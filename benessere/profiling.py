@@ -0,0 +1,164 @@
+"""Perfilado por muestreo, opcional, para el proceso en producción.
+
+Apagado por defecto. Con ``BENESSERE_PROFILE=0.05`` se perfila ~5% de las
+peticiones de Flask (``WSGIProfiler``) y de los reruns de Streamlit
+(``maybe_start``/``Sampler.stop``). Un hilo toma la pila del hilo perfilado cada
+``BENESSERE_PROFILE_INTERVAL`` ms (5 por defecto) y al terminar se escribe un
+archivo ``.folded`` (formato de pilas plegadas: ``a;b;c <muestras>``) que
+leen ``flamegraph.pl``, speedscope o inferno.
+
+Los archivos van a ``BENESSERE_PROFILE_DIR`` (``data/profiles`` por defecto);
+sólo se guardan los últimos ``BENESSERE_PROFILE_KEEP`` (200). Para juntar
+varios en un solo flamegraph::
+
+    python -m benessere.profiling --match flask-index | flamegraph.pl > index.svg
+
+Las peticiones más cortas que el intervalo pueden no dejar ninguna muestra
+(y no se escribe archivo): el muestreo apunta a lo que tarda. Apagado, Flask
+ni siquiera instala el middleware y Streamlit hace una sola comparación por
+rerun.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+RATE = float(os.environ.get("BENESSERE_PROFILE", "0") or 0)
+INTERVAL = float(os.environ.get("BENESSERE_PROFILE_INTERVAL", "5")) / 1000
+PROFILE_DIR = Path(os.environ.get("BENESSERE_PROFILE_DIR", ROOT / "data" / "profiles"))
+KEEP = int(os.environ.get("BENESSERE_PROFILE_KEEP", "200"))
+MAX_SECONDS = 60.0      # un perfil que nadie detuvo (p. ej. st.rerun()) se corta solo
+
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+_write_lock = threading.Lock()
+_seq = itertools.count()
+
+
+def _frame_name(code):
+    path = code.co_filename.replace(os.sep, "/")
+    short = "/".join(path.rsplit("/", 2)[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Muestrea la pila de un hilo desde otro hilo hasta ``stop()``."""
+
+    def __init__(self, label, thread_id=None, interval=INTERVAL, out_dir=PROFILE_DIR):
+        self.label = label
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.out_dir = Path(out_dir)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"sampler-{label}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        deadline = time.monotonic() + MAX_SECONDS
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or time.monotonic() > deadline:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self, write=True):
+        """Detiene el muestreo y escribe el ``.folded``; devuelve su ruta (o None)."""
+        elapsed = time.perf_counter() - self._t0
+        self._stop.set()
+        self._thread.join()
+        if not write or not self.stacks:
+            return None
+        name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_seq)}-"
+                f"{_SAFE.sub('_', self.label)[:60]}-{elapsed * 1e3:.0f}ms.folded")
+        path = self.out_dir / name
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, n in self.stacks.most_common():
+                    f.write(f"{stack} {n}\n")
+            _rotate(self.out_dir)
+        except OSError:
+            return None
+        return path
+
+
+def _rotate(out_dir, keep=KEEP):
+    with _write_lock:
+        files = sorted(out_dir.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+        for p in files[:-keep] if keep else []:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+def maybe_start(label, rate=RATE):
+    """Un ``Sampler`` para el hilo actual con probabilidad ``rate``; si no, None."""
+    if rate and random.random() < rate:
+        return Sampler(label)
+    return None
+
+
+class WSGIProfiler:
+    """Middleware WSGI: perfila una fracción ``rate`` de las peticiones.
+
+    Se instala sólo si ``RATE > 0``: ``app.wsgi_app = WSGIProfiler(app.wsgi_app)``.
+    """
+
+    def __init__(self, app, rate=RATE, prefix="flask"):
+        self.app = app
+        self.rate = rate
+        self.prefix = prefix
+
+    def __call__(self, environ, start_response):
+        if random.random() >= self.rate:
+            return self.app(environ, start_response)
+        label = f"{self.prefix}-{environ.get('PATH_INFO', '').strip('/').replace('/', '_') or 'index'}"
+        sampler = Sampler(label)
+        try:
+            return self.app(environ, start_response)     # la vista corre aquí; el cuerpo ya está armado
+        finally:
+            sampler.stop()
+
+
+def merge(paths):
+    total = Counter()
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                stack, _, n = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    total[stack] += int(n)
+    return total
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Junta perfiles .folded en uno (a stdout)")
+    ap.add_argument("--dir", default=str(PROFILE_DIR))
+    ap.add_argument("--match", default="", help="sólo archivos cuyo nombre contenga esto")
+    args = ap.parse_args(argv)
+    paths = [p for p in sorted(Path(args.dir).glob("*.folded")) if args.match in p.name]
+    for stack, n in merge(paths).most_common():
+        print(f"{stack} {n}")
+    print(f"{len(paths)} perfiles", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
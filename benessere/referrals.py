@@ -0,0 +1,128 @@
+"""Códigos de referido y grafo de referidos con bonos por nivel.
+
+- Cada usuario tiene un ``ref_code`` único: el prefijo de 6 del uid y, si ya
+  está tomado, uno más largo (``ref_code_candidates``). La base lo indexa,
+  así que resolver un código es una búsqueda (``LoyaltyStore.find_ref_code``).
+- ``ReferralGraph`` guarda quién refirió a quién (``uid -> referrer``) y los
+  referidos directos de cada uno. Se arma en una pasada lineal desde la base y
+  luego se mantiene con cada alta: quien se une con un código deja en el libro
+  ``JOIN_REASON`` con el uid de quien lo invitó (``{"ref": uid}``), y así se
+  enteran también los otros procesos.
+- Cuando un referido gana puntos, sus ancestros reciben ``LEVELS`` de esos
+  puntos (10% el que lo invitó, 5% el de arriba, 2% el siguiente). Sólo se
+  suben ``len(LEVELS)`` eslabones: el costo no depende del tamaño del grafo.
+  Los bonos no generan bonos. Los motivos en el libro son fijos (sin nombres
+  ni códigos); el uid del referido va en ``{"from": uid}``.
+"""
+
+import secrets
+import threading
+
+LEVELS = (0.10, 0.05, 0.02)
+CODE_LEN = 6
+JOIN_REASON = "Alta con código de referido"
+BONUS_REASON = "Bono de referido"
+
+
+def ref_code_candidates(uid):
+    """Códigos a probar en orden: prefijos cada vez más largos del uid y, si
+    todos chocan, uno al azar."""
+    uid = uid.upper()
+    for n in range(CODE_LEN, len(uid) + 1):
+        yield uid[:n]
+    while True:
+        yield secrets.token_hex(5).upper()
+
+
+def unique_code(uid, taken, preferred=None):
+    """Primer código libre (``taken(código) -> bool``), empezando por ``preferred``."""
+    if preferred and not taken(preferred):
+        return preferred
+    for code in ref_code_candidates(uid):
+        if not taken(code):
+            return code
+
+
+def dedupe(rows):
+    """``(uid, ref_code)`` del más antiguo al más nuevo -> ``{uid: código}``
+    para los que no tienen código o repiten uno anterior."""
+    rows = list(rows)
+    taken = {code for _, code in rows if code}
+    seen, fix = set(), {}
+    for uid, code in rows:
+        if code and code not in seen:
+            seen.add(code)
+            continue
+        fix[uid] = unique_code(uid, taken.__contains__)
+        taken.add(fix[uid])
+    return fix
+
+
+def normalize(code):
+    return "".join(str(code or "").split()).upper()
+
+
+def bonuses(ancestors, pts, levels=LEVELS):
+    """``[(nivel, uid, puntos)]`` para ``pts`` ganados por el referido."""
+    out = []
+    for level, (uid, rate) in enumerate(zip(ancestors, levels), 1):
+        b = int(pts * rate)
+        if b > 0:
+            out.append((level, uid, b))
+    return out
+
+
+class ReferralGraph:
+    def __init__(self, pairs=()):
+        self._lock = threading.RLock()
+        self.rebuild(pairs)
+
+    def rebuild(self, pairs):
+        """Una pasada sobre ``(uid, referrer)``."""
+        with self._lock:
+            self._parent = {}
+            self._children = {}
+            for uid, ref in pairs:
+                if ref:
+                    self._parent[uid] = ref
+                    self._children.setdefault(ref, []).append(uid)
+
+    def __len__(self):
+        return len(self._parent)
+
+    def referrer(self, uid):
+        return self._parent.get(uid)
+
+    def referrals(self, uid):
+        """Referidos directos."""
+        with self._lock:
+            return list(self._children.get(uid, ()))
+
+    def ancestors(self, uid, levels=len(LEVELS)):
+        """Hasta ``levels`` ancestros, del más cercano al más lejano (None = todos)."""
+        out = []
+        with self._lock:
+            cur = self._parent.get(uid)
+            while cur is not None and (levels is None or len(out) < levels):
+                if cur == uid or cur in out:
+                    break           # ciclo en datos viejos: se corta
+                out.append(cur)
+                cur = self._parent.get(cur)
+        return out
+
+    def can_link(self, uid, referrer):
+        """False si ``referrer`` es ``uid`` o desciende de él (haría un ciclo)."""
+        return referrer != uid and uid not in self.ancestors(referrer, levels=None)
+
+    def link(self, uid, referrer):
+        with self._lock:
+            old = self._parent.get(uid)
+            if old == referrer:
+                return
+            if old is not None:
+                self._children[old].remove(uid)
+            if referrer is None:
+                self._parent.pop(uid, None)
+                return
+            self._parent[uid] = referrer
+            self._children.setdefault(referrer, []).append(uid)
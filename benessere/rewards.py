@@ -0,0 +1,179 @@
+"""Tabla de premios de la ruleta: muestreo O(1) y simulación en bloque.
+
+``RewardTable(SPIN_REWARDS)`` arma una vez:
+
+- las tablas del método alias (Vose) a partir de los pesos ``w``: cada giro
+  es un solo número al azar, sin recorrer ni acumular pesos;
+- el sector de cada premio (``prize["slot"]``, su posición en la rueda), así
+  la animación no busca la etiqueta en la lista.
+
+El generador se inyecta (``rng=random.Random(semilla)``) para tener giros
+reproducibles en pruebas y simulaciones.
+
+``simulate`` y ``daily`` sortean millones de giros de una vez con NumPy, con
+las mismas tablas, para estimar los puntos que se entregan por día y el costo
+de los cupones (productos gratis y descuentos) antes de cambiar los pesos::
+
+    python -m benessere.rewards --spins-per-day 400
+    python -m benessere.rewards --spins-per-day 400 --set 7=2 --set 8=2   # probar otros pesos
+"""
+
+import argparse
+import random
+import re
+import sys
+from pathlib import Path
+
+MENU_PATH = Path(__file__).resolve().parent.parent / "data" / "menu.json"
+_COUPON = re.compile(r"^(?:FREE|DESC(?P<pct>\d+))-(?P<product>[A-Z]+)$")
+
+# producto del cupón -> plato del menú con el que se valora (el más caro: peor caso)
+COUPON_PRODUCTS = {
+    "ACAI": "Açaí Zero 180g",
+    "JUGO": "Jugo Natural 600 ml",
+    "GRANOLA": "Granola Casera",
+    "OATS": "Overnight Oats",
+}
+
+
+def coupon_units(kind):
+    """``FREE-ACAI`` -> ``("ACAI", 1.0)``, ``DESC15-JUGO`` -> ``("JUGO", 0.15)``;
+    None si no es un cupón de producto."""
+    m = _COUPON.match(kind or "")
+    if m is None:
+        return None
+    return m.group("product"), int(m.group("pct")) / 100 if m.group("pct") else 1.0
+
+
+class RewardTable:
+    def __init__(self, rewards, rng=None):
+        weights = [float(r.get("w", 1)) for r in rewards]
+        if not weights or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError("la ruleta necesita pesos no negativos y al menos uno positivo")
+        self.rewards = tuple({**r, "slot": i} for i, r in enumerate(rewards))
+        self.labels = [r["label"] for r in self.rewards]
+        self.slots = {r["label"]: i for i, r in enumerate(self.rewards)}
+        self.probabilities = [w / sum(weights) for w in weights]
+        self.prob, self.alias = _alias(self.probabilities)
+        self.rng = rng or random.Random()
+
+    def __len__(self):
+        return len(self.rewards)
+
+    def sample(self, rng=None):
+        """Sector sorteado: O(1) con un solo número al azar."""
+        u = (rng or self.rng).random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def draw(self, rng=None):
+        """El premio sorteado (con su ``slot``)."""
+        return self.rewards[self.sample(rng)]
+
+    def expected_points(self):
+        return sum(p * r["points"] for p, r in zip(self.probabilities, self.rewards))
+
+    def with_weights(self, weights):
+        """Otra tabla con los mismos premios y pesos cambiados (``{slot: w}``)."""
+        return RewardTable([{**r, "w": weights.get(i, r.get("w", 1))} for i, r in enumerate(self.rewards)], self.rng)
+
+    # ------------------ Simulación (NumPy) ---------------
+    # numpy se importa aquí: loyalty (y con él Flask) usa la tabla sin cargarlo
+    def simulate(self, n, seed=None):
+        """Sectores de ``n`` giros como arreglo (mismo método alias, vectorizado).
+
+        ``seed`` es una semilla o un ``np.random.Generator`` ya creado."""
+        import numpy as np
+
+        rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        u = rng.random(n) * len(self.prob)
+        i = u.astype(np.int64)
+        return np.where(u - i < np.asarray(self.prob)[i], i, np.asarray(self.alias)[i])
+
+    def daily(self, days, spins_per_day, prices=None, seed=None, block=1_000_000):
+        """Puntos y costo de cupones por día en ``days`` días simulados.
+
+        Los cupones se cuentan en productos equivalentes (gratis = 1, -15% =
+        0.15). ``prices`` es ``{producto: precio}`` (``COUPON_PRODUCTS``); devuelve
+        ``{"points": arreglo por día, "units": {producto: arreglo}, "cost": arreglo}``."""
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        points = np.array([r["points"] for r in self.rewards], np.int64)
+        units = {}
+        for i, r in enumerate(self.rewards):
+            cu = coupon_units(r["coupon"])
+            if cu is not None:
+                units.setdefault(cu[0], np.zeros(len(self.rewards)))[i] = cu[1]
+        per_day = {"points": np.zeros(days, np.int64), "units": {p: np.zeros(days) for p in units}}
+        n = len(self.rewards)
+        step = max(1, block // max(1, spins_per_day))       # días por bloque
+        for d0 in range(0, days, step):
+            nd = min(step, days - d0)
+            day = np.repeat(np.arange(nd), spins_per_day)
+            counts = np.bincount(day * n + self.simulate(nd * spins_per_day, rng), minlength=nd * n).reshape(nd, n)
+            per_day["points"][d0:d0 + nd] = counts @ points
+            for p, w in units.items():
+                per_day["units"][p][d0:d0 + nd] = counts @ w
+        per_day["cost"] = sum(
+            (u * (prices or {}).get(p, 0) for p, u in per_day["units"].items()), np.zeros(days),
+        )
+        return per_day
+
+
+def _alias(probs):
+    """Tablas ``(prob, alias)`` del método de Vose."""
+    n = len(probs)
+    scaled = [p * n for p in probs]
+    prob, alias = [1.0] * n, list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        s, g = small.pop(), large.pop()
+        prob[s], alias[s] = scaled[s], g
+        scaled[g] -= 1 - scaled[s]
+        (small if scaled[g] < 1 else large).append(g)
+    return prob, alias     # lo que queda en small/large ya tiene prob 1 (error de redondeo)
+
+
+def _percentiles(a):
+    import numpy as np
+
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return f"media {a.mean():9.1f}   p50 {p50:9.1f}   p95 {p95:9.1f}   p99 {p99:9.1f}"
+
+
+def main(argv=None):
+    from .loyalty import SPIN_TABLE
+    from .menu import MenuCache
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--spins-per-day", type=int, default=300)
+    ap.add_argument("--days", type=int, default=10_000, help="días simulados")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--set", action="append", default=[], metavar="SLOT=W", help="cambiar el peso de un sector")
+    args = ap.parse_args(argv)
+
+    menu = {it["name"]: it["price"] for items in MenuCache(str(MENU_PATH), {}).get().values() for it in items}
+    prices = {key: menu.get(name, 0) for key, name in COUPON_PRODUCTS.items()}
+
+    tables = [("actual", SPIN_TABLE)]
+    if args.set:
+        weights = {int(k): float(v) for k, v in (s.split("=", 1) for s in args.set)}
+        tables.append(("propuesta", SPIN_TABLE.with_weights(weights)))
+    for i, r in enumerate(SPIN_TABLE.rewards):
+        probs = "  ".join(f"{t.probabilities[i]:6.1%}" for _, t in tables)
+        print(f"  {i:>2}  {probs}  {r['label']}")
+    for name, t in tables:
+        d = t.daily(args.days, args.spins_per_day, prices, args.seed)
+        print(f"--- {name}: {args.days:,} días x {args.spins_per_day} giros "
+              f"(esperado {t.expected_points() * args.spins_per_day:.0f} pts/día)")
+        print(f"  puntos/día        {_percentiles(d['points'])}")
+        for p, u in d["units"].items():
+            print(f"  {p:<8} (prod.)   {_percentiles(u)}")
+        print(f"  cupones (Bs)/día  {_percentiles(d['cost'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
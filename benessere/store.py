@@ -0,0 +1,1016 @@
+"""Backends de almacenamiento para la base de fidelización (puntos, retos, cupones).
+
+Dos implementaciones con la misma interfaz:
+
+- ``SQLiteStore``: SQLite embebido en modo WAL; cada operación es una lectura o
+  escritura indexada de filas (por defecto).
+- ``JsonStore``: el ``data/loyalty.json`` de siempre (legado); cada escritura
+  recarga y reescribe el archivo completo bajo un candado de archivo.
+
+Se elige con ``BENESSERE_STORE=sqlite|json`` (y ``BENESSERE_DB`` para la ruta).
+En ambos casos el historial de puntos va al libro append-only de
+``benessere.ledger`` (``data/loyalty-ledger/``).
+
+Toda escritura sobre un usuario pasa por ``transact(uid, fn)``: se lee el
+usuario con su ``version``, ``fn`` decide el cambio y éste se aplica sólo si la
+versión no cambió entretanto; si cambió (otra sesión u otro proceso escribió
+primero) se vuelve a leer y se reintenta.
+
+Los cupones tienen código único (``benessere.coupons``): ``find_coupon`` lo
+busca sin pasar por los usuarios, ``use_coupon`` lo marca usado una sola vez
+y ``expire_coupons`` vence los atrasados en orden de vencimiento.
+
+Los códigos de referido también son únicos (``benessere.referrals``):
+``find_ref_code`` resuelve el dueño de un código y ``referrals()`` es el grafo
+de quién invitó a quién, armado una vez y mantenido como el del ranking.
+"""
+
+import copy
+import heapq
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date
+from pathlib import Path
+
+from . import coupons as coupon_codes
+from . import referrals as ref_codes
+from .daily import FLAGS as DAILY_FLAGS, DailyLog
+from .filelock import FileLock
+from .leaderboard import LeaderboardIndex
+from .ledger import Ledger
+from .metrics import REGISTRY
+from .phash import MultiIndexHash, to_signed, to_unsigned
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+JSON_PATH = DATA_DIR / "loyalty.json"
+SQLITE_PATH = DATA_DIR / "loyalty.db"
+
+MAX_RETRIES = 50
+SWEEP_SECONDS = 600.0       # cada cuánto se vencen los cupones atrasados
+
+STORE_SECONDS = REGISTRY.histogram(
+    "benessere_store_seconds", "Duración de operaciones de la base de fidelización", ("op",),
+)
+STORE_CONFLICTS = REGISTRY.counter(
+    "benessere_store_conflicts_total", "Transacciones reintentadas porque otra sesión escribió primero",
+)
+COUPON_EVENTS = REGISTRY.counter(
+    "benessere_coupons_total", "Cupones emitidos, usados en el kiosco y vencidos", ("event",),
+)
+
+
+class ConflictError(RuntimeError):
+    """La transacción no pudo aplicarse tras ``MAX_RETRIES`` intentos."""
+
+
+class _Conflict(Exception):
+    pass
+
+
+class _Rejected(Exception):
+    pass
+
+
+def _default_ledger(path):
+    return Ledger(path.parent / f"{path.stem}-ledger")
+
+
+def _applied(cur, plan):
+    """El usuario tal como queda tras aplicar ``plan`` (sin volver a leerlo)."""
+    u = dict(cur)
+    u.update(plan.get("fields", {}))
+    u["points"] = int(cur.get("points", 0)) + int(plan.get("points", 0))
+    u["version"] = int(cur.get("version", 0)) + 1
+    u["coupons"] = list(cur.get("coupons", [])) + [dict(c) for c in plan.get("coupons", [])]
+    return u
+
+
+def _by_age(users):
+    """``(uid, ref_code)`` del más antiguo al más nuevo: por ``created`` (sin
+    fecha primero) y luego por uid, el mismo orden que usa SQLite."""
+    rows = sorted(users.items(), key=lambda kv: (kv[1].get("created") or "", kv[0]))
+    return [(uid, u.get("ref_code")) for uid, u in rows]
+
+
+# ------------------------- Interfaz común -------------------------
+class LoyaltyStore:
+    """Interfaz mínima que usan ``benessere.loyalty`` y las apps.
+
+    Un *plan* de transacción es un dict con cualquiera de estas llaves:
+
+    - ``points``: delta de puntos; ``reason`` y ``ts`` lo registran en el libro
+    - ``fields``: columnas del usuario a sobrescribir (``name``, ``last_spin``...)
+    - ``coupons``: lista de cupones a entregar (``coupons.issue``; el código
+      debe ser nuevo, si ya existe la transacción se reintenta)
+    - ``redemption``: ``{"item", "ts"}`` para la tabla de canjes
+    - ``daily``: ``(día, reto)`` a marcar; si ya estaba marcado, no se aplica nada
+    - ``photo``: ``{"hash", "kind"}`` de la foto aceptada (ver ``similar_photo``)
+    - ``log``: datos extra para la línea del libro (``{"ref": uid}``...); el
+      motivo queda fijo y los datos de cada usuario van aquí
+    """
+
+    ledger = None
+
+    def __init__(self):
+        self._board = None
+        self._board_lock = threading.Lock()
+        self._stale = set()
+        self._stale_lock = threading.Lock()
+        self._refs = None
+        self._refs_lock = threading.Lock()
+        self._photos = None
+        self._photos_seen = 0
+        self._photos_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    def reload(self):
+        return self
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._stop.set()
+        self.ledger.close()
+
+    # usuarios
+    def get_user(self, uid):
+        raise NotImplementedError
+
+    def create_user(self, user):
+        """Crea el usuario si no existe. Su ``ref_code`` se respeta si está
+        libre; si no, se le asigna otro (``referrals.unique_code``)."""
+        raise NotImplementedError
+
+    def find_ref_code(self, code):
+        """uid del dueño del código de referido, o None."""
+        raise NotImplementedError
+
+    # transacciones
+    def transact(self, uid, fn, retries=MAX_RETRIES):
+        """Aplica ``fn(usuario) -> plan`` de forma atómica.
+
+        Devuelve el usuario actualizado, o ``None`` si ``fn`` devolvió ``None``
+        o el reto diario ya estaba marcado.
+        """
+        with STORE_SECONDS.time("transact"):
+            return self._transact(uid, fn, retries)
+
+    def _transact(self, uid, fn, retries):
+        for attempt in range(retries):
+            cur = self.get_user(uid)
+            if cur is None:
+                raise KeyError(uid)
+            plan = fn(cur)
+            if plan is None:
+                return None
+            try:
+                self._apply(uid, int(cur.get("version", 0)), plan)
+            except _Conflict:
+                STORE_CONFLICTS.inc()
+                time.sleep(random.uniform(0, 0.001 * (attempt + 1)))
+                continue
+            except _Rejected:
+                return None
+            if plan.get("coupons"):
+                COUPON_EVENTS.inc("issued", n=len(plan["coupons"]))
+            new = _applied(cur, plan)
+            # con motivo, el saldo llega al índice por el libro y en su orden
+            if self._board is not None and plan.get("points") and "reason" not in plan:
+                self._board.update(uid, new["points"])
+            if self._refs is not None and "referred_by" in plan.get("fields", {}):
+                self._refs.link(uid, new["referred_by"])
+            return new
+        raise ConflictError(f"demasiados conflictos escribiendo al usuario {uid}")
+
+    def _apply(self, uid, version, plan):
+        raise NotImplementedError
+
+    def _log(self, uid, plan, balance):
+        """Línea del libro de la transacción, con el saldo que deja (``balance``):
+        los otros procesos lo aplican al ranking sin releer la base, que puede
+        no tener el COMMIT todavía."""
+        if "reason" in plan:
+            self.ledger.append(uid, int(plan.get("points", 0)), plan["reason"], plan.get("ts"),
+                               **plan.get("log", {}), balance=balance)
+
+    def update_user(self, uid, **fields):
+        return self.transact(uid, lambda u: {"fields": fields})
+
+    def add_points(self, uid, delta, reason, ts):
+        u = self.transact(uid, lambda cur: {"points": int(delta), "reason": reason, "ts": ts})
+        return u["points"]
+
+    def add_coupon(self, uid, coupon):
+        return self.transact(uid, lambda u: {"coupons": [coupon]})
+
+    def history(self, uid=None, limit=None):
+        """Movimientos de puntos; por usuario sale de la foto + cola del libro."""
+        if uid is not None:
+            return self.ledger.recent(uid, limit)
+        rows = list(self.ledger.scan())
+        return rows[-limit:] if limit else rows
+
+    # retos diarios
+    def get_daily(self, uid, day):
+        raise NotImplementedError
+
+    # fotos de retos
+    def similar_photo(self, h, radius=None):
+        """``{"uid", "kind", "distance"}`` de una foto ya aceptada parecida a
+        ``h`` (dHash), o None. El índice se arma una vez y luego sólo lee las
+        fotos nuevas (de cualquier proceso) desde la última consulta.
+        """
+        with self._photos_lock:
+            if self._photos is None:
+                self._photos, self._photos_seen = MultiIndexHash(), 0
+            rows = self._photo_rows(self._photos_seen)
+            for seq, uid, kind, ph in rows:
+                self._photos.add(ph, (uid, kind))
+                self._photos_seen = max(self._photos_seen, seq)
+        found = self._photos.nearest(h, radius)
+        if found is None:
+            return None
+        d, _, (uid, kind) = found
+        return {"uid": uid, "kind": kind, "distance": d}
+
+    def log_rejection(self, uid, reason, ts):
+        """Deja constancia en el libro (delta 0) de un intento rechazado."""
+        self.ledger.append(uid, 0, reason, ts)
+
+    def _photo_rows(self, after):
+        """``(seq, uid, kind, hash)`` de las fotos con ``seq > after``."""
+        raise NotImplementedError
+
+    # cupones / canjes
+    def coupons(self, uid):
+        raise NotImplementedError
+
+    def redemptions(self, uid=None):
+        raise NotImplementedError
+
+    def find_coupon(self, code):
+        """El cupón con ``uid`` de su dueño, o None."""
+        raise NotImplementedError
+
+    def use_coupon(self, code, now):
+        """Pasa el cupón de ``active`` a ``used`` si no venció; True si lo hizo."""
+        raise NotImplementedError
+
+    def expire_coupons(self, now):
+        """Marca ``expired`` los cupones vigentes con ``expires <= now``; cuántos."""
+        raise NotImplementedError
+
+    def start_sweeper(self, clock, interval=SWEEP_SECONDS):
+        """Hilo de fondo que llama ``expire_coupons(clock())`` cada ``interval`` s."""
+        if self._sweeper is not None:
+            return self._sweeper
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.expire_coupons(clock())
+                except Exception:
+                    pass    # se reintenta en la próxima vuelta
+
+        self._sweeper = threading.Thread(target=run, name="coupon-sweeper", daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    # ranking
+    def board(self):
+        """Índice del ranking: se arma una vez desde el almacenamiento y luego
+        se mantiene con cada transacción. Los cambios de otros procesos llegan
+        por el libro y se releen (sólo esos usuarios) en la siguiente consulta.
+        """
+        with self._board_lock:
+            if self._board is None:
+                self._board = LeaderboardIndex(self._all_points())
+                self.ledger.subscribe(self._on_ledger_entry)
+            self.ledger.poll()
+        with self._stale_lock:
+            stale, self._stale = self._stale, set()
+        if stale:
+            found = dict(self._points_of(stale))
+            for uid in stale:
+                if uid in found:
+                    self._board.update(uid, found[uid])
+                else:
+                    self._board.remove(uid)
+        return self._board
+
+    def _on_ledger_entry(self, e):
+        if "balance" in e:
+            with self._stale_lock:
+                self._stale.discard(e["uid"])
+            self._board.update(e["uid"], e["balance"])
+        elif e["delta"]:
+            with self._stale_lock:      # (movimientos de antes, sin saldo)
+                self._stale.add(e["uid"])
+
+    def leaderboard(self, top_n=10):
+        top = self.board().top(top_n)
+        users = self._users_by_id([uid for uid, _ in top])
+        return [users[uid] for uid, _ in top if uid in users]
+
+    def rank(self, uid):
+        """Posición del usuario en el ranking (1 = primero)."""
+        return self.board().rank(uid)
+
+    # referidos
+    def referrals(self):
+        """Grafo de referidos (``referrals.ReferralGraph``). Igual que
+        ``board()``: se arma en una pasada y se mantiene con cada alta, propia o
+        de otro proceso, que llega por el libro con el uid de quien invitó
+        (``{"ref": uid}``).
+        """
+        with self._refs_lock:
+            if self._refs is None:
+                self._refs = ref_codes.ReferralGraph(self._all_referrals())
+                self.ledger.subscribe(self._on_ref_entry)
+            self.ledger.poll()
+        return self._refs
+
+    def _on_ref_entry(self, e):
+        if e.get("ref"):
+            self._refs.link(e["uid"], e["ref"])
+
+    def _all_referrals(self):
+        """``(uid, referred_by)`` de los usuarios que llegaron con un código."""
+        raise NotImplementedError
+
+    def _all_points(self):
+        raise NotImplementedError
+
+    def _points_of(self, uids):
+        raise NotImplementedError
+
+    def _users_by_id(self, uids):
+        raise NotImplementedError
+
+    # migración
+    def import_legacy(self, db, replace_ledger=False):
+        """Reemplaza el contenido por un dict con el formato de ``loyalty.json``.
+
+        Su ``history`` va al libro; si el libro ya tiene movimientos se rechaza
+        (``ValueError``) salvo con ``replace_ledger``, que lo vacía antes."""
+        raise NotImplementedError
+
+    def _prepare_ledger(self, db, replace_ledger):
+        if not db.get("history") or self.ledger.empty():
+            return
+        if not replace_ledger:
+            raise ValueError(f"el libro {self.ledger.path} ya tiene movimientos; "
+                             "importar el historial otra vez lo duplicaría")
+        self.ledger.clear()
+
+    def _reset_indexes(self):
+        """Tras reemplazar la base: los índices en memoria se rearman."""
+        self._photos = None
+        if self._board is not None:
+            self._board = LeaderboardIndex(self._all_points())
+        if self._refs is not None:
+            self._refs.rebuild(self._all_referrals())
+
+
+# ------------------------- JSON (legado) -------------------------
+class JsonStore(LoyaltyStore):
+    """El formato original: un dict ``{"users", "redemptions"}`` en disco."""
+
+    def __init__(self, path=JSON_PATH, ledger=None):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ledger = ledger or _default_ledger(self.path)
+        self._flock = FileLock(self.path.with_suffix(".lock"))
+        self._mtime = None
+        self._codes = None      # código -> (uid, posición en su lista de cupones)
+        self._expiry = None     # montículo (vencimiento, código) de los vigentes
+        self._ref_codes = None  # código de referido -> uid
+        self.db = {}
+        self.reload()
+
+    def reload(self):
+        with self._flock:
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self._mtime:
+                db = {}
+                if mtime is not None:
+                    try:
+                        with STORE_SECONDS.time("json_load"):
+                            db = json.loads(self.path.read_text(encoding="utf-8"))
+                    except Exception:
+                        db = {}
+                self.db, self._mtime = db, mtime
+                self._codes = self._expiry = self._ref_codes = None
+                old = "history" in db
+                if old:
+                    # archivos antiguos: el historial pasa al libro una sola vez
+                    self._import_history(db.pop("history"))
+                fixed = [self._upgrade_coupons(), self._upgrade_ref_codes()]
+                if any(fixed) or old:
+                    self._write()
+        return self
+
+    def _upgrade_coupons(self):
+        """Cupones con el código literal de antes -> código propio; True si hubo."""
+        changed = False
+        for u in self.db.get("users", {}).values():
+            cps = u.get("coupons") or []
+            if any(not c.get("kind") for c in cps):
+                u["coupons"] = [coupon_codes.upgrade(c) for c in cps]
+                changed = True
+        return changed
+
+    def _upgrade_ref_codes(self):
+        """Códigos de referido repetidos o faltantes (el prefijo de 6 del uid
+        choca entre usuarios): el más antiguo conserva el suyo; True si hubo."""
+        users = self.db.get("users", {})
+        fix = ref_codes.dedupe(_by_age(users))
+        for uid, code in fix.items():
+            users[uid]["ref_code"] = code
+        return bool(fix)
+
+    def _ref_index(self):
+        if self._ref_codes is None:
+            self._ref_codes = {u["ref_code"]: uid for uid, u in self.db.get("users", {}).items()}
+        return self._ref_codes
+
+    def _coupon_index(self):
+        """Índice de códigos y montículo de vencimientos; se arma una vez por
+        versión del archivo y luego se mantiene con cada escritura propia."""
+        if self._codes is None:
+            codes, expiry = {}, []
+            for uid, u in self.db.get("users", {}).items():
+                for i, c in enumerate(u.get("coupons") or []):
+                    codes[c["code"]] = (uid, i)
+                    if c.get("status") == coupon_codes.ACTIVE and c.get("expires"):
+                        expiry.append((c["expires"], c["code"]))
+            heapq.heapify(expiry)
+            self._codes, self._expiry = codes, expiry
+        return self._codes
+
+    def _coupon(self, code):
+        hit = self._coupon_index().get(code)
+        if hit is None:
+            return None
+        uid, i = hit
+        return uid, self.db["users"][uid]["coupons"][i]
+
+    def _import_history(self, history):
+        self.ledger.append_many(
+            (h.get("ts"), h["uid"], int(h.get("delta", 0)), h.get("reason", "")) for h in history
+        )
+
+    def _write(self):
+        with STORE_SECONDS.time("json_save"):
+            tmp = self.path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(self.db, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._mtime = self.path.stat().st_mtime_ns
+
+    def _user(self, uid):
+        return self.db.get("users", {}).get(uid)
+
+    def get_user(self, uid):
+        with self._flock:
+            self.reload()
+            u = self._user(uid)
+            if u is None:
+                return None
+            out = {k: v for k, v in u.items() if k != "daily"}
+            out["coupons"] = copy.deepcopy(u.get("coupons", []))
+            out.setdefault("version", 0)
+            return out
+
+    def create_user(self, user):
+        with self._flock:
+            self.reload()
+            users = self.db.setdefault("users", {})
+            if user["id"] not in users:
+                u = copy.deepcopy(user)
+                refs = self._ref_index()
+                u["ref_code"] = ref_codes.unique_code(u["id"], refs.__contains__, u.get("ref_code"))
+                refs[u["ref_code"]] = u["id"]
+                u.setdefault("daily", {})
+                u.setdefault("coupons", [])
+                u["version"] = 0
+                users[user["id"]] = u
+                self._write()
+                if self._board is not None:
+                    self._board.update(u["id"], u.get("points", 0))
+            return self.get_user(user["id"])
+
+    def find_ref_code(self, code):
+        with self._flock:
+            self.reload()
+            return self._ref_index().get(code)
+
+    def _apply(self, uid, version, plan):
+        with self._flock:
+            self.reload()
+            u = self._user(uid)
+            if u is None or int(u.get("version", 0)) != version:
+                raise _Conflict
+            codes = self._coupon_index()
+            if any(c["code"] in codes for c in plan.get("coupons", [])):
+                raise _Conflict         # código repetido: el plan genera otro
+            if "daily" in plan:
+                day, flag = plan["daily"]
+                log = DailyLog.from_dict(u.get("daily"))
+                if not log.set(day, flag):
+                    raise _Rejected
+                log.roll_up(day)
+                u["daily"] = log.to_dict()
+            u.update(copy.deepcopy(plan.get("fields", {})))
+            u["points"] = int(u.get("points", 0)) + int(plan.get("points", 0))
+            cps = u.setdefault("coupons", [])
+            for c in plan.get("coupons", []):
+                codes[c["code"]] = (uid, len(cps))
+                cps.append(dict(c))
+                if c.get("expires"):
+                    heapq.heappush(self._expiry, (c["expires"], c["code"]))
+            if "redemption" in plan:
+                self.db.setdefault("redemptions", []).append({"uid": uid, **plan["redemption"]})
+            if "photo" in plan:
+                ph = plan["photo"]
+                self.db.setdefault("photos", []).append(
+                    {"uid": uid, "kind": ph.get("kind"), "hash": f"{ph['hash']:016x}", "ts": plan.get("ts")}
+                )
+            u["version"] = version + 1
+            self._write()
+            self._log(uid, plan, u["points"])
+
+    def get_daily(self, uid, day):
+        with self._flock:
+            self.reload()
+            return DailyLog.from_dict(self._user(uid).get("daily")).state(day)
+
+    def coupons(self, uid):
+        return self.get_user(uid)["coupons"]
+
+    def redemptions(self, uid=None):
+        with self._flock:
+            self.reload()
+            return [dict(r) for r in self.db.get("redemptions", []) if uid is None or r["uid"] == uid]
+
+    def find_coupon(self, code):
+        with self._flock:
+            self.reload()
+            hit = self._coupon(code)
+            return None if hit is None else {"uid": hit[0], **hit[1]}
+
+    def use_coupon(self, code, now):
+        with self._flock:
+            self.reload()
+            hit = self._coupon(code)
+            if hit is None or coupon_codes.status(hit[1], now) != coupon_codes.ACTIVE:
+                return False
+            hit[1].update(status=coupon_codes.USED, used_ts=now)
+            self._write()
+        COUPON_EVENTS.inc("used")
+        return True
+
+    def expire_coupons(self, now):
+        n = 0
+        with self._flock:
+            self.reload()
+            self._coupon_index()
+            while self._expiry and self._expiry[0][0] <= now:
+                _, code = heapq.heappop(self._expiry)
+                _, c = self._coupon(code)
+                if c["status"] == coupon_codes.ACTIVE:      # los usados quedan en el montículo hasta su fecha
+                    c["status"] = coupon_codes.EXPIRED
+                    n += 1
+            if n:
+                self._write()
+        COUPON_EVENTS.inc("expired", n=n)
+        return n
+
+    def _photo_rows(self, after):
+        with self._flock:
+            self.reload()
+            photos = self.db.get("photos", [])
+            return [(i, p["uid"], p.get("kind"), int(p["hash"], 16)) for i, p in enumerate(photos[after:], after + 1)]
+
+    def _all_points(self):
+        with self._flock:
+            self.reload()
+            return [(uid, u.get("points", 0)) for uid, u in self.db.get("users", {}).items()]
+
+    def _points_of(self, uids):
+        return [(uid, u["points"]) for uid, u in self._users_by_id(uids).items()]
+
+    def _all_referrals(self):
+        with self._flock:
+            self.reload()
+            return [(uid, u["referred_by"]) for uid, u in self.db.get("users", {}).items() if u.get("referred_by")]
+
+    def _users_by_id(self, uids):
+        with self._flock:
+            self.reload()
+            return {uid: self.get_user(uid) for uid in uids if uid in self.db.get("users", {})}
+
+    def import_legacy(self, db, replace_ledger=False):
+        with self._flock:
+            self._prepare_ledger(db, replace_ledger)
+            self.db = copy.deepcopy(db)
+            self._import_history(self.db.pop("history", []))
+            self._upgrade_coupons()
+            self._upgrade_ref_codes()
+            self._codes = self._expiry = self._ref_codes = None
+            self._write()
+        self._reset_indexes()
+
+
+# ------------------------- SQLite (WAL) -------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id          TEXT PRIMARY KEY,
+    name        TEXT NOT NULL DEFAULT '',
+    points      INTEGER NOT NULL DEFAULT 0,
+    created     TEXT,
+    last_spin   TEXT,
+    ref_code    TEXT,
+    referred_by TEXT,
+    purchases   TEXT NOT NULL DEFAULT '[]',
+    version     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS users_points ON users (points DESC);
+
+-- retos diarios: un byte por día + resúmenes mensuales (ver benessere.daily)
+CREATE TABLE IF NOT EXISTS daily_log (
+    uid    TEXT PRIMARY KEY,
+    base   INTEGER NOT NULL,
+    bits   BLOB NOT NULL,
+    months TEXT NOT NULL DEFAULT '{}'
+) WITHOUT ROWID;
+
+-- code es único (ver benessere.coupons); kind es el tipo (DESC10-ACAI, CANJ-GRANOLA...)
+CREATE TABLE IF NOT EXISTS coupons (
+    id      INTEGER PRIMARY KEY,
+    uid     TEXT NOT NULL,
+    code    TEXT NOT NULL,
+    ts      TEXT,
+    source  TEXT,
+    kind    TEXT,
+    expires TEXT,
+    status  TEXT NOT NULL DEFAULT 'active',
+    used_ts TEXT
+);
+CREATE INDEX IF NOT EXISTS coupons_uid ON coupons (uid);
+
+CREATE TABLE IF NOT EXISTS redemptions (
+    id   INTEGER PRIMARY KEY,
+    uid  TEXT NOT NULL,
+    item TEXT,
+    ts   TEXT
+);
+CREATE INDEX IF NOT EXISTS redemptions_uid ON redemptions (uid);
+
+-- dHash (64 bits con signo) de las fotos de retos aceptadas
+CREATE TABLE IF NOT EXISTS photos (
+    id   INTEGER PRIMARY KEY,
+    uid  TEXT NOT NULL,
+    kind TEXT,
+    hash INTEGER NOT NULL,
+    ts   TEXT
+);
+"""
+
+_USER_COLS = ("id", "name", "points", "created", "last_spin", "ref_code", "referred_by", "purchases")
+
+
+class SQLiteStore(LoyaltyStore):
+    """Una conexión por hilo (las sesiones de Streamlit corren en hilos distintos)."""
+
+    def __init__(self, path=SQLITE_PATH, ledger=None):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ledger = ledger or _default_ledger(self.path)
+        self._local = threading.local()
+        self._db().executescript(_SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        """Bases creadas por versiones anteriores."""
+        with self._tx() as c:
+            cols = {r["name"] for r in c.execute("PRAGMA table_info(users)")}
+            if "version" not in cols:
+                c.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            # antes del libro el historial vivía en una tabla: se mueve y se elimina
+            if c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history'").fetchone():
+                rows = c.execute("SELECT ts, uid, delta, reason FROM history ORDER BY id").fetchall()
+                self.ledger.append_many(tuple(r) for r in rows)
+                c.execute("DROP TABLE history")
+            # antes los retos eran una fila por usuario y día
+            if c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily'").fetchone():
+                logs = {}
+                for r in c.execute(f"SELECT uid, day, {', '.join(DAILY_FLAGS)} FROM daily ORDER BY uid, day"):
+                    log = logs.setdefault(r["uid"], DailyLog())
+                    for f in DAILY_FLAGS:
+                        if r[f]:
+                            log.set(r["day"], f)
+                for uid, log in logs.items():
+                    log.roll_up(date.today().isoformat())
+                    self._put_daily(c, uid, log)
+                c.execute("DROP TABLE daily")
+            # antes los cupones eran códigos literales compartidos, sin estado ni vencimiento
+            cols = {r["name"] for r in c.execute("PRAGMA table_info(coupons)")}
+            if "kind" not in cols:
+                for col, decl in (("kind", "TEXT"), ("expires", "TEXT"),
+                                  ("status", "TEXT NOT NULL DEFAULT 'active'"), ("used_ts", "TEXT")):
+                    c.execute(f"ALTER TABLE coupons ADD COLUMN {col} {decl}")
+                for r in c.execute("SELECT id, code, ts FROM coupons").fetchall():
+                    cp = coupon_codes.upgrade(dict(r))
+                    c.execute("UPDATE coupons SET code = ?, kind = ?, expires = ? WHERE id = ?",
+                              (cp["code"], cp["kind"], cp["expires"], r["id"]))
+            c.execute("CREATE UNIQUE INDEX IF NOT EXISTS coupons_code ON coupons (code)")
+            # sólo los vigentes, por fecha: el barrido lee desde el más viejo y para
+            c.execute("CREATE INDEX IF NOT EXISTS coupons_expiry ON coupons (expires) WHERE status = 'active'")
+            # antes el código de referido era el prefijo del uid sin más, y se repetía
+            if not c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'users_ref_code'").fetchone():
+                rows = c.execute("SELECT id, ref_code FROM users ORDER BY created, id").fetchall()
+                c.executemany("UPDATE users SET ref_code = ? WHERE id = ?",
+                              [(code, uid) for uid, code in ref_codes.dedupe(tuple(r) for r in rows).items()])
+                c.execute("CREATE UNIQUE INDEX users_ref_code ON users (ref_code)")
+
+    def _db(self):
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            c.row_factory = sqlite3.Row
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    def _tx(self):
+        return _Tx(self._db())
+
+    def close(self):
+        c = getattr(self._local, "conn", None)
+        if c is not None:
+            c.close()
+            self._local.conn = None
+        super().close()
+
+    @staticmethod
+    def _row_to_user(row):
+        u = dict(row)
+        u["purchases"] = json.loads(u.get("purchases") or "[]")
+        return u
+
+    def get_user(self, uid):
+        with nullcontext(self._db()) as c:
+            row = c.execute("SELECT * FROM users WHERE id = ?", (uid,)).fetchone()
+            if row is None:
+                return None
+            u = self._row_to_user(row)
+            u["coupons"] = self._coupons(c, uid)
+            return u
+
+    def create_user(self, user):
+        vals = [user.get(k) for k in _USER_COLS]
+        vals[_USER_COLS.index("purchases")] = json.dumps(user.get("purchases", []))
+        vals[_USER_COLS.index("points")] = int(user.get("points", 0))
+        new = False
+        with self._tx() as c:
+            if c.execute("SELECT 1 FROM users WHERE id = ?", (user["id"],)).fetchone() is None:
+                vals[_USER_COLS.index("ref_code")] = ref_codes.unique_code(
+                    user["id"],
+                    lambda code: c.execute("SELECT 1 FROM users WHERE ref_code = ?", (code,)).fetchone() is not None,
+                    user.get("ref_code"),
+                )
+                c.execute(f"INSERT INTO users ({', '.join(_USER_COLS)}) VALUES ({', '.join('?' * len(_USER_COLS))})", vals)
+                new = True
+        if new and self._board is not None:
+            self._board.update(user["id"], user.get("points", 0))
+        return self.get_user(user["id"])
+
+    def find_ref_code(self, code):
+        row = self._db().execute("SELECT id FROM users WHERE ref_code = ?", (code,)).fetchone()
+        return row["id"] if row else None
+
+    def _apply(self, uid, version, plan):
+        fields = {k: v for k, v in plan.get("fields", {}).items() if k in _USER_COLS and k != "id"}
+        sets = ["points = points + ?", "version = version + 1"] + [f"{k} = ?" for k in fields]
+        vals = [int(plan.get("points", 0))] + [json.dumps(v) if k == "purchases" else v for k, v in fields.items()]
+        with self._tx() as c:
+            row = c.execute(
+                f"UPDATE users SET {', '.join(sets)} WHERE id = ? AND version = ? RETURNING points", (*vals, uid, version),
+            ).fetchone()
+            if row is None:
+                raise _Conflict
+            if "daily" in plan:
+                day, flag = plan["daily"]
+                log = self._get_daily(c, uid)
+                if not log.set(day, flag):
+                    raise _Rejected
+                log.roll_up(day)
+                self._put_daily(c, uid, log)
+            for cp in plan.get("coupons", []):
+                try:
+                    self._insert_coupon(c, uid, cp)
+                except sqlite3.IntegrityError:
+                    raise _Conflict from None       # código repetido: el plan genera otro
+            if "redemption" in plan:
+                r = plan["redemption"]
+                c.execute("INSERT INTO redemptions (uid, item, ts) VALUES (?, ?, ?)", (uid, r["item"], r.get("ts")))
+            if "photo" in plan:
+                ph = plan["photo"]
+                c.execute(
+                    "INSERT INTO photos (uid, kind, hash, ts) VALUES (?, ?, ?, ?)",
+                    (uid, ph.get("kind"), to_signed(ph["hash"]), plan.get("ts")),
+                )
+            # antes del COMMIT: si falla el libro no queda un saldo sin su movimiento
+            self._log(uid, plan, row["points"])
+
+    @staticmethod
+    def _get_daily(c, uid):
+        row = c.execute("SELECT base, bits, months FROM daily_log WHERE uid = ?", (uid,)).fetchone()
+        return DailyLog(row["base"], row["bits"], json.loads(row["months"])) if row else DailyLog()
+
+    @staticmethod
+    def _put_daily(c, uid, log):
+        c.execute(
+            "INSERT OR REPLACE INTO daily_log (uid, base, bits, months) VALUES (?, ?, ?, ?)",
+            (uid, log.base, bytes(log.bits), json.dumps(log.months, separators=(",", ":"))),
+        )
+
+    def get_daily(self, uid, day):
+        return self._get_daily(self._db(), uid).state(day)
+
+    @staticmethod
+    def _insert_coupon(c, uid, coupon):
+        c.execute(
+            "INSERT INTO coupons (uid, code, ts, source, kind, expires, status, used_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (uid, coupon["code"], coupon.get("ts"), coupon.get("source"), coupon.get("kind"),
+             coupon.get("expires"), coupon.get("status") or coupon_codes.ACTIVE, coupon.get("used_ts")),
+        )
+
+    @staticmethod
+    def _coupons(c, uid):
+        rows = c.execute(
+            "SELECT code, kind, ts, source, expires, status, used_ts FROM coupons WHERE uid = ? ORDER BY id", (uid,),
+        )
+        return [dict(r) for r in rows]
+
+    def coupons(self, uid):
+        with nullcontext(self._db()) as c:
+            return self._coupons(c, uid)
+
+    def redemptions(self, uid=None):
+        q, args = "SELECT uid, item, ts FROM redemptions", ()
+        if uid is not None:
+            q, args = q + " WHERE uid = ?", (uid,)
+        with nullcontext(self._db()) as c:
+            return [dict(r) for r in c.execute(q + " ORDER BY id", args)]
+
+    def find_coupon(self, code):
+        row = self._db().execute(
+            "SELECT uid, code, kind, ts, source, expires, status, used_ts FROM coupons WHERE code = ?", (code,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def use_coupon(self, code, now):
+        with self._tx() as c:
+            cur = c.execute(
+                "UPDATE coupons SET status = 'used', used_ts = ? "
+                "WHERE code = ? AND status = 'active' AND (expires IS NULL OR expires > ?)",
+                (now, code, now),
+            )
+        if cur.rowcount:
+            COUPON_EVENTS.inc("used")
+        return cur.rowcount == 1
+
+    def expire_coupons(self, now):
+        with self._tx() as c:
+            n = c.execute(
+                "UPDATE coupons SET status = 'expired' WHERE status = 'active' AND expires <= ?", (now,),
+            ).rowcount
+        COUPON_EVENTS.inc("expired", n=n)
+        return n
+
+    def _photo_rows(self, after):
+        rows = self._db().execute("SELECT id, uid, kind, hash FROM photos WHERE id > ? ORDER BY id", (after,))
+        return [(r["id"], r["uid"], r["kind"], to_unsigned(r["hash"])) for r in rows]
+
+    def _all_points(self):
+        return self._db().execute("SELECT id, points FROM users").fetchall()
+
+    def _in(self, sql, uids):
+        uids = list(uids)
+        rows = []
+        for i in range(0, len(uids), 500):
+            chunk = uids[i:i + 500]
+            rows += self._db().execute(sql.format(", ".join("?" * len(chunk))), chunk).fetchall()
+        return rows
+
+    def _points_of(self, uids):
+        return [tuple(r) for r in self._in("SELECT id, points FROM users WHERE id IN ({})", uids)]
+
+    def _all_referrals(self):
+        return self._db().execute("SELECT id, referred_by FROM users WHERE referred_by IS NOT NULL").fetchall()
+
+    def _users_by_id(self, uids):
+        users = {r["id"]: self._row_to_user(r) for r in self._in("SELECT * FROM users WHERE id IN ({})", uids)}
+        for uid, u in users.items():
+            u["coupons"] = self._coupons(self._db(), uid)
+        return users
+
+    def import_legacy(self, db, replace_ledger=False):
+        """Las tablas se reemplazan en una sola transacción (ver ``LoyaltyStore``)."""
+        self._prepare_ledger(db, replace_ledger)
+        users = db.get("users", {})
+        fix = ref_codes.dedupe(_by_age(users))
+        with self._tx() as c:
+            for table in ("users", "daily_log", "coupons", "redemptions", "photos"):
+                c.execute(f"DELETE FROM {table}")
+            for uid, u in users.items():
+                u = {**u, "id": uid, "ref_code": fix.get(uid, u.get("ref_code"))}
+                c.execute(
+                    f"INSERT OR REPLACE INTO users ({', '.join(_USER_COLS)}) VALUES ({', '.join('?' * len(_USER_COLS))})",
+                    [
+                        json.dumps(u.get("purchases", [])) if k == "purchases"
+                        else int(u.get("points", 0)) if k == "points"
+                        else u.get(k)
+                        for k in _USER_COLS
+                    ],
+                )
+                if u.get("daily"):
+                    log = DailyLog.from_dict(u["daily"])
+                    log.roll_up(date.today().isoformat())
+                    self._put_daily(c, uid, log)
+                for cp in u.get("coupons") or []:
+                    self._insert_coupon(c, uid, coupon_codes.upgrade(cp))
+            c.executemany(
+                "INSERT INTO redemptions (uid, item, ts) VALUES (?, ?, ?)",
+                [(r["uid"], r.get("item"), r.get("ts")) for r in db.get("redemptions", [])],
+            )
+            c.executemany(
+                "INSERT INTO photos (uid, kind, hash, ts) VALUES (?, ?, ?, ?)",
+                [(p["uid"], p.get("kind"), to_signed(int(p["hash"], 16)), p.get("ts")) for p in db.get("photos", [])],
+            )
+        self.ledger.append_many(
+            (h.get("ts"), h["uid"], int(h.get("delta", 0)), h.get("reason", "")) for h in db.get("history", [])
+        )
+        self._reset_indexes()
+
+
+class _Tx:
+    """``with store._tx() as c:`` abre BEGIN IMMEDIATE y hace COMMIT/ROLLBACK.
+
+    Las transacciones anidadas del mismo hilo se unen a la exterior.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self._outer = not self.conn.in_transaction
+        if self._outer:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._outer:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# ------------------------- Fábrica -------------------------
+def open_store(kind=None, path=None):
+    """Abre el backend configurado. La primera vez que se crea la base SQLite
+    por defecto (``data/loyalty.db``) se importa automáticamente el
+    ``loyalty.json`` existente; cualquier otra base nueva empieza vacía.
+    """
+    kind = (kind or os.environ.get("BENESSERE_STORE", "sqlite")).lower()
+    path = path or os.environ.get("BENESSERE_DB")
+    if kind == "json":
+        store = JsonStore(path or JSON_PATH)
+    elif kind == "sqlite":
+        path = Path(path or SQLITE_PATH)
+        fresh = not path.exists() and path.resolve() == SQLITE_PATH.resolve()
+        store = SQLiteStore(path)
+        if fresh and JSON_PATH.exists():
+            from .migrate import migrate_json_to_sqlite
+            migrate_json_to_sqlite(JSON_PATH, store)
+    else:
+        raise ValueError(f"Backend desconocido: {kind!r} (usa 'sqlite' o 'json')")
+    store.ledger.start_compactor()
+    from .loyalty import _now       # (loyalty no importa store)
+    store.start_sweeper(lambda: _now().isoformat())
+    store.board()       # índice del ranking listo antes de la primera visita
+    return store
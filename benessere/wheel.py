@@ -0,0 +1,59 @@
+"""Ruleta del bienestar: parte estática + parámetros mínimos por giro.
+
+- ``static/wheel/index.html`` tiene todo el CSS/JS y dibuja el gradiente y
+  las etiquetas a partir de los textos; no cambia entre reruns.
+- ``face(labels)`` prepara esos textos una vez por configuración de premios.
+- ``spin_params(...)`` es lo único que cambia en cada giro.
+
+En Streamlit la carpeta se monta como componente (``declare_component``): el
+navegador carga el HTML una sola vez y en cada rerun sólo viajan
+``face + spin_params`` (unos cientos de bytes). ``build_html`` arma la página
+completa con los parámetros incrustados, para ``components.html`` u otros usos.
+"""
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+WHEEL_DIR = Path(__file__).resolve().parent.parent / "static" / "wheel"
+LABEL_MAX_LEN = 18
+
+
+def _wrap_label(txt: str, max_len=16):
+    t = txt.strip()
+    if len(t) <= max_len:
+        return t
+    cut = t.rfind(" ", 0, max_len)
+    if cut == -1:
+        cut = max_len
+    return f"{t[:cut].strip()}<br>{t[cut:].strip()}"
+
+
+@lru_cache(maxsize=16)
+def _face(labels):
+    return tuple(_wrap_label(l, max_len=LABEL_MAX_LEN) for l in labels)
+
+
+def face(labels):
+    """Etiquetas ya partidas en líneas, cacheadas por configuración."""
+    return {"labels": list(_face(tuple(labels)))}
+
+
+def spin_params(start_deg=0, end_deg=0, duration_ms=3200, sound=True):
+    return {"start": start_deg, "end": end_deg, "duration": duration_ms, "sound": bool(sound)}
+
+
+@lru_cache(maxsize=4)
+def _template(mtime):
+    return (WHEEL_DIR / "index.html").read_text(encoding="utf-8")
+
+
+def template():
+    return _template((WHEEL_DIR / "index.html").stat().st_mtime_ns)
+
+
+def build_html(labels, start_deg=0, end_deg=0, duration_ms=3200, sound=True):
+    """Página completa (para ``components.html``): plantilla + parámetros."""
+    params = {**face(labels), **spin_params(start_deg, end_deg, duration_ms, sound)}
+    data = json.dumps(params).replace("</", "<\\/")
+    return template().replace("<!--WHEEL-->", f"<script>window.WHEEL = {data};</script>", 1)
@@ -0,0 +1,60 @@
+"""Configuración de gunicorn para producción (``gunicorn app:app`` la lee sola).
+
+- ``preload_app``: la app se importa una vez en el master, se calientan menú,
+  plantillas Jinja, estáticos y páginas (``app.warm``), se congela el GC y
+  recién ahí se hace el ``fork``; los workers comparten esa memoria por
+  copy-on-write en vez de repetir todo en frío.
+- Workers ``gthread``: ``2 * núcleos + 1`` procesos (tope ``MAX_WORKERS``) con
+  ``THREADS`` hilos cada uno. ``WEB_CONCURRENCY`` y ``GUNICORN_THREADS`` mandan
+  si están definidas.
+
+Con ``BENESSERE_METRICS_DIR`` cada worker vuelca sus métricas ahí y
+``/metrics`` las suma (se limpia al arrancar).
+
+El puerto sale de ``$PORT`` (Render) por defecto de gunicorn.
+"""
+
+import gc
+import os
+
+MAX_WORKERS = 8
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))     # respeta el límite de CPUs del contenedor
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", min(2 * _cores() + 1, MAX_WORKERS)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+keepalive = 5
+
+
+def on_starting(server):
+    # los volcados de métricas de una corrida anterior no se suman a esta
+    d = os.environ.get("BENESSERE_METRICS_DIR")
+    if d:
+        os.makedirs(d, exist_ok=True)
+        for name in os.listdir(d):
+            if name.startswith("flask-") and name.endswith(".json"):
+                os.unlink(os.path.join(d, name))
+
+
+def worker_exit(server, worker):
+    from app import dump_metrics
+
+    dump_metrics()      # lo último que contó este worker no se pierde
+
+
+def when_ready(server):
+    # ya con la app precargada y antes de crear los workers
+    from app import warm
+
+    t = warm()
+    server.log.info("cachés calientes en %.0f ms", t * 1e3)
+    gc.collect()
+    gc.freeze()     # lo que queda vivo no lo recorre el GC de los workers: no se ensucian las páginas
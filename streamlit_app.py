@@ -1,10 +1,11 @@
 # app.py / streamlit_app.py
 
+import io
 import json
-import random
-import hashlib
+import time
 from pathlib import Path
-from datetime import datetime, timedelta, timezone
+
+_RERUN_T0 = time.perf_counter()
 
 import streamlit as st
 from streamlit.components.v1 import html  # (también usaremos st.components.v1.html)
@@ -18,434 +19,228 @@ ROOT = Path(os.getcwd())  # Usa el directorio actual de trabajo
 IMG = ROOT / "static" / "images"
 MENU_PATH = ROOT / "data" / "menu.json"
 
+# --------------------------- Métricas ---------------------------
+# Mismos nombres que la web Flask; con BENESSERE_METRICS_DIR se escriben (cada
+# 10 s como mucho) en streamlit.prom para el textfile collector de node_exporter.
+from benessere import coupons, metrics, profiling
+
+METRICS_DIR = os.environ.get("BENESSERE_METRICS_DIR")
+RERUN_SECONDS = metrics.REGISTRY.histogram(
+    "benessere_streamlit_rerun_seconds", "Ejecución completa del script por página", ("page",),
+)
+PAGE_SECONDS = metrics.REGISTRY.histogram(
+    "benessere_streamlit_page_seconds", "Sólo la rama de la página elegida (Inicio, Recompensas...)", ("page",),
+)
+DB_SECONDS = metrics.REGISTRY.histogram(
+    "benessere_streamlit_db_seconds", "_load_db / _save_db en Streamlit", ("op",),
+)
+
 # --------------------- Configuración de página ------------------
 st.set_page_config(page_title="Benessere", page_icon=str(IMG / "logo.jpg"), layout="wide")
 
 # --------------------------- Estilos ----------------------------
-st.markdown("""
-<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;800&display=swap" rel="stylesheet">
-<style>
-:root{
-  --bg:#0f0718; --card:#1b0f2b; --border:#2a1b40; --text:#ECE8F7; --muted:#B7A8D9; --accent:#7C4DFF;
-}
-html, body, .main { background: var(--bg); color: var(--text); font-family: 'Inter', sans-serif; }
-.block-container { max-width: 1200px; padding-top: 0.8rem; }
-h1,h2,h3,h4 { color: var(--text); letter-spacing: .2px; }
-p { color: var(--muted); }
-
-/* Tarjetas */
-.card{
-  background: var(--card);
-  border: 1px solid var(--border);
-  border-radius: 16px;
-  padding: 14px;
-  margin: .6rem 0;
-  box-shadow: 0 6px 18px rgba(0,0,0,.18);
-  transition: transform .12s ease, box-shadow .12s ease, border-color .12s ease;
-}
-.card:hover{
-  transform: translateY(-2px);
-  box-shadow: 0 10px 22px rgba(0,0,0,.26);
-  border-color:#3a2b57;
-}
-.price{ background:rgba(124,77,255,.18); padding:.25rem .7rem; border-radius:999px; font-weight:600; }
-
-/* Imagen de producto */
-.product-img img{
-  border-radius: 12px;
-  width: 120px;
-  height: 120px;
-  object-fit: cover;
-  border:1px solid var(--border);
-}
+FONTS = '<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;800&display=swap" rel="stylesheet">'
+CSS_PATH = ROOT / "static" / "css" / "streamlit.css"
 
-/* Avatar equipo */
-.team-card img {
-  border-radius: 18px;
-  width: 100%;
-  height: 220px;
-  object-fit: cover;
-  border:1px solid var(--border);
-}
+def _mtime(p):
+    """Llave de invalidación de los cachés: cambia al editar el archivo."""
+    try:
+        return p.stat().st_mtime_ns
+    except OSError:
+        return None
+
+@st.cache_data(show_spinner=False)
+def _style_html(path: str, mtime):
+    css = Path(path).read_text(encoding="utf-8") if mtime is not None else ""
+    return f"{FONTS}\n<style>\n{css}</style>"
 
-/* Limpieza UI Streamlit */
-#MainMenu, header, footer {visibility: hidden;}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(_style_html(str(CSS_PATH), _mtime(CSS_PATH)), unsafe_allow_html=True)
 # ------------------------- Utilidades ---------------------------
+from benessere.imagebuild import Manifest, pick
+
+IMG_DIRS = list(dict.fromkeys([IMG, Path.cwd() / "static" / "images", ROOT / "static" / "images"]))
+
+@st.cache_resource(show_spinner=False)
+def _image_manifest(mtimes):
+    """``{archivo: ruta}`` de las carpetas de imágenes (la primera gana).
+    ``mtimes`` (de las carpetas) cambia al agregar o quitar imágenes."""
+    manifest = {}
+    for d in IMG_DIRS:
+        if d.is_dir():
+            for p in d.iterdir():
+                if p.is_file():
+                    manifest.setdefault(p.name, str(p))
+    return manifest
+
+def _images_key():
+    return tuple(_mtime(d) for d in IMG_DIRS)
+
 def _find_image(filename: str):
-    candidates = [
-        IMG / filename,
-        Path.cwd() / "static" / "images" / filename,
-        ROOT / "static" / "images" / filename,
-        Path(filename),
-    ]
-    for p in candidates:
-        if p.exists():
-            return str(p)
-    return None
-
-def _safe_image(filename: str, **kwargs):
-    p = _find_image(filename)
-    if p:
-        st.image(p, **kwargs)
+    p = _image_manifest(_images_key()).get(filename)
+    if p is None and filename and Path(filename).is_file():
+        p = filename
+    return p
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _image_data(path: str, width, key):
+    """Bytes listos para ``st.image``: ya reducidos a ``width`` si es un entero,
+    así Streamlit no decodifica ni redimensiona la foto en cada rerun."""
+    data = Path(path).read_bytes()
+    if not isinstance(width, int):
+        return data
+    try:
+        from PIL import Image
+        img = Image.open(io.BytesIO(data))
+        if img.width <= width:
+            return data
+        fmt = "JPEG" if img.format == "JPEG" else "PNG"
+        img = img.resize((width, int(img.height * width / img.width)), Image.BILINEAR)
+        out = io.BytesIO()
+        img.save(out, format=fmt, quality=90)
+        return out.getvalue()
+    except Exception:
+        return data
+
+# variantes de `python -m benessere.imagebuild`; sin build se usa la original
+IMAGE_VARIANTS = Manifest(ROOT / "static" / "build" / "images")
+CONTAINER_WIDTH = 960   # ancho supuesto para use_container_width si no se indica max_width
+
+def _variant(filename: str, target: int):
+    entry = IMAGE_VARIANTS.get(filename)
+    return str(IMAGE_VARIANTS.path.parent / pick(entry, target)) if entry else None
+
+def _image_bytes(filename: str, width=None, max_width=None):
+    """La variante más chica que cubre el ancho mostrado (o la imagen original)."""
+    target = width if isinstance(width, int) else (max_width or CONTAINER_WIDTH)
+    p = _variant(filename, target) or _find_image(filename)
+    return _image_data(p, width, _images_key()) if p else None
+
+def _safe_image(filename: str, max_width=None, **kwargs):
+    data = _image_bytes(filename, kwargs.get("width"), max_width)
+    if data:
+        st.image(data, **kwargs)
     else:
         st.info(f"[imagen no encontrada: {filename}]")
 
+# fallback mínimo
+DEFAULT_MENU = {
+    "bowls": [
+        {"name": "Açaí Zero 180g", "desc": "Açaí sin azúcar + toppings. Tamaño M.", "price": 30},
+        {"name": "Açaí Zero 120g", "desc": "Açaí sin azúcar + toppings. Tamaño S.", "price": 25},
+    ],
+    "bebidas": [
+        {"name": "Jugo Natural 350 ml", "desc": "Fruta 100% | vaso S", "price": 7},
+        {"name": "Jugo Natural 600 ml", "desc": "Fruta 100% | vaso M", "price": 9},
+    ],
+}
+
+@st.cache_data(show_spinner=False)
+def _read_menu(path: str, mtime):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def load_menu():
     candidates = [MENU_PATH, Path.cwd() / "data" / "menu.json", ROOT / "data" / "menu.json"]
     for p in candidates:
-        if p.exists():
-            with open(p, "r", encoding="utf-8") as f:
-                return json.load(f)
-    # fallback mínimo
-    return {
-        "bowls": [
-            {"name": "Açaí Zero 180g", "desc": "Açaí sin azúcar + toppings. Tamaño M.", "price": 30},
-            {"name": "Açaí Zero 120g", "desc": "Açaí sin azúcar + toppings. Tamaño S.", "price": 25},
-        ],
-        "bebidas": [
-            {"name": "Jugo Natural 350 ml", "desc": "Fruta 100% | vaso S", "price": 7},
-            {"name": "Jugo Natural 600 ml", "desc": "Fruta 100% | vaso M", "price": 9},
-        ],
-    }
+        m = _mtime(p)
+        if m is not None:
+            return _read_menu(str(p), m)
+    return DEFAULT_MENU
 
 MENU = load_menu()
 
 # ------------------- Benessere Loyalty: datos -------------------
-DB_PATH = ROOT / "data" / "loyalty.json"
-CHECKIN_CODE = "BENESSERE-CHECKIN"         # (si luego quieres añadir UI de check-in)
-HAPPY_HOUR = (15, 16)                      # 15:00–16:00
-
-# Recompensas de la ruleta (con tus probabilidades)
-SPIN_REWARDS = [
-    {"label": "🎟 -10% en Açaí",            "points": 0,   "coupon": "DESC10-ACAI",     "w": 4},
-    {"label": "🧃 -15% en Jugo",             "points": 0,   "coupon": "DESC15-JUGO",     "w": 6},
-    {"label": "🎉 +100 pts",                 "points": 100, "coupon": None,              "w": 30},
-    {"label": "💎 +500 pts",                 "points": 500, "coupon": None,              "w": 5},
-    {"label": "⭐ +75 pts",                  "points": 75,  "coupon": None,              "w": 40},
-    {"label": "🥣 -15% en Granola",          "points": 0,   "coupon": "DESC15-GRANOLA",  "w": 5},
-    {"label": "🥣 -15% en Overnight Oats",   "points": 0,   "coupon": "DESC15-OATS",     "w": 5},
-    {"label": "🍧 Açaí GRATIS",              "points": 0,   "coupon": "FREE-ACAI",       "w": 1},
-    {"label": "🧃 Jugo GRATIS",              "points": 0,   "coupon": "FREE-JUGO",       "w": 1},
-    {"label": "🥣 -50% en Granola",          "points": 0,   "coupon": "DESC50-GRANOLA",  "w": 3},
-]
-
-# Zona de canjeo (tus valores)
-REDEEM_ITEMS = [
-    {"name": "Açaí Zero 120g", "cost": 2500, "coupon": "CANJ-ACAI120"},
-    {"name": "Açaí Zero 180g", "cost": 3000, "coupon": "CANJ-ACAI180"},
-    {"name": "Jugo Natural 350 ml", "cost": 2000, "coupon": "CANJ-J350"},
-    {"name": "Jugo Natural 600 ml", "cost": 2600, "coupon": "CANJ-J600"},
-    {"name": "Granola", "cost": 2400, "coupon": "CANJ-GRANOLA"},
-]
-
-# ------------------ Persistencia y helpers puntos ---------------
-def _now():
-    return datetime.now(timezone.utc) - timedelta(hours=4)  # Bolivia
-
-def _today_str():
-    return _now().strftime("%Y-%m-%d")
+# Reglas y persistencia viven en benessere/ (compartidas con Flask).
+from benessere.loyalty import (
+    SPIN_TABLE, REDEEM_ITEMS,
+    _now, _uid, get_user, set_name, set_referrer, ensure_daily,
+    complete_daily, photo_repeated, can_spin_today, spin, redeem,
+    leaderboard, user_rank, is_happy_hour,
+)
+from benessere.store import open_store
+
+# ------------------ Persistencia ---------------
+@st.cache_resource
+def _store():
+    # SQLite/WAL por defecto; BENESSERE_STORE=json usa el loyalty.json legado
+    return open_store()
 
 def _load_db():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if DB_PATH.exists():
-        try:
-            return json.loads(DB_PATH.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-    return {}
+    with DB_SECONDS.time("load"):
+        return _store().reload()
 
 def _save_db(db):
-    DB_PATH.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
-
-def _uid(raw: str):
-    return hashlib.sha1(raw.strip().lower().encode("utf-8")).hexdigest()[:12]
-
-def get_user(db, user_id):
-    u = db.get("users", {}).get(user_id)
-    if not u:
-        u = {
-            "id": user_id,
-            "name": "",
-            "points": 0,
-            "created": _now().isoformat(),
-            "last_spin": None,
-            "daily": {},            # por fecha: {steps_done, gym_done, food_done, checkin}
-            "ref_code": user_id[:6].upper(),
-            "referred_by": None,
-            "purchases": [],        # reservado
-            "coupons": [],
-        }
-        db.setdefault("users", {})[user_id] = u
-    return u
-
-def add_points(u, db, pts, reason=""):
-    u["points"] = int(u.get("points", 0)) + int(pts)
-    db.setdefault("history", []).append(
-        {"uid": u["id"], "ts": _now().isoformat(), "delta": pts, "reason": reason}
-    )
-
-def ensure_daily(u):
-    d = u["daily"].get(_today_str()) or {
-        "steps_done": False,
-        "gym_done": False,
-        "food_done": False,
-        "checkin": False,
-    }
-    u["daily"][_today_str()] = d
-    return d
-
-def can_spin_today(u):
-    last = u.get("last_spin")
-    return (not last) or (last.split("T")[0] != _today_str())
-
-def spin(u, db):
-    if not can_spin_today(u):
-        return None, "Ya giraste hoy."
-    weights = [r.get("w", 1) for r in SPIN_REWARDS]
-    prize = random.choices(SPIN_REWARDS, weights=weights, k=1)[0]
-    if prize["points"]:
-        add_points(u, db, prize["points"], "Ruleta diaria")
-    if prize["coupon"]:
-        u.setdefault("coupons", []).append(
-            {"code": prize["coupon"], "ts": _now().isoformat(), "source": "Ruleta"}
-        )
-    u["last_spin"] = _now().isoformat()
-    return prize, None
-
-def redeem(u, db, item):
-    cost = int(item["cost"])
-    if u["points"] < cost:
-        return False, "No tienes puntos suficientes."
-    u["points"] -= cost
-    code = item["coupon"]
-    u["coupons"].append({"code": code, "ts": _now().isoformat(), "source":"Canje"})
-    db.setdefault("redemptions", []).append({"uid": u["id"], "item": item["name"], "ts": _now().isoformat()})
-    return True, code
-
-def leaderboard(db, top_n=10):
-    users = list(db.get("users", {}).values())
-    users.sort(key=lambda x: x.get("points", 0), reverse=True)
-    return users[:top_n]
-
-def is_happy_hour():
-    now = _now()
-    return HAPPY_HOUR[0] <= now.hour < HAPPY_HOUR[1]
+    with DB_SECONDS.time("save"):
+        db.flush()
 
 # --------------- Ruleta (HTML/CSS + animación) -----------------
-def _wrap_label(txt: str, max_len=16):
-    t = txt.strip()
-    if len(t) <= max_len:
-        return t
-    cut = t.rfind(" ", 0, max_len)
-    if cut == -1:
-        cut = max_len
-    return f"{t[:cut].strip()}<br>{t[cut:].strip()}"
+# static/wheel/ se sirve una vez como componente; en cada rerun sólo viajan
+# las etiquetas y los grados del giro (ver benessere/wheel.py).
+from benessere import wheel
 
-def build_wheel_html_anim(labels, start_deg=0, end_deg=0, duration_ms=3200, sound=True):
-    n = len(labels)
-    step = 360 / n
-    colors = ["#8353FF", "#6E42E6"]
-    ring   = "#2A1B40"
-    text_c = "#FFFFFF"
-    pointer_c = "#ECE8F7"
-    hub_bg = "#0F0718"
-    label_radius = 112
-    size = 340
-
-    stops = []
-    for i in range(n):
-        a0 = i * step
-        a1 = (i + 1) * step
-        c  = colors[i % 2]
-        stops.append(f"{c} {a0}deg {a1}deg")
-    gradient = ", ".join(stops)
-
-    safe_labels = [_wrap_label(l, max_len=18) for l in labels]
-    label_divs = []
-    for i, txt in enumerate(safe_labels):
-        center = (i * step) + (step / 2)
-        label_divs.append(
-            f'''
-            <div class="label" style="
-                 transform: rotate({center}deg)
-                            translate({label_radius}px)
-                            rotate({-center}deg);
-            ">
-              <span class="pill">{txt}</span>
-            </div>
-            '''
-        )
+_wheel_component = st.components.v1.declare_component("benessere_wheel", path=str(wheel.WHEEL_DIR))
 
-    sound_flag = "true" if sound else "false"
-    dur_sec = duration_ms / 1000.0
-
-    html_code = f"""
-    <style>
-      .wheel-wrap {{
-        position: relative; width: {size}px; height: {size}px; margin: 0 auto;
-      }}
-      .wheel {{
-        width: 100%; height: 100%; border-radius: 50%;
-        border: 12px solid {ring};
-        background: conic-gradient({gradient});
-        transform: rotate(-{start_deg}deg);
-        box-shadow: 0 14px 28px rgba(0,0,0,.35);
-      }}
-      .pointer {{
-        position: absolute; left: 50%; top: -6px; transform: translateX(-50%);
-        width: 0; height: 0;
-        border-left: 12px solid transparent; border-right: 12px solid transparent;
-        border-bottom: 22px solid {pointer_c};
-        filter: drop-shadow(0 2px 6px rgba(0,0,0,.25));
-        z-index: 3;
-      }}
-      .hub {{
-        position: absolute; left: 50%; top: 50%; transform: translate(-50%, -50%);
-        width: 86px; height: 86px; border-radius: 50%;
-        background: {hub_bg};
-        border: 6px solid {ring};
-        box-shadow: inset 0 0 12px rgba(0,0,0,.55);
-        z-index: 2;
-      }}
-      .labels {{ position: absolute; inset: 0; }}
-      .label {{
-        position: absolute; left: 50%; top: 50%;
-        transform-origin: 0 0;
-        font-weight: 800; font-size: 13px; line-height: 1.05; letter-spacing:.2px;
-        color: {text_c}; text-align: center; z-index: 2;
-      }}
-      .label .pill {{
-        display:inline-block; max-width: 120px;
-        padding: 2px 8px; border-radius: 10px;
-        background: rgba(15,7,24,.35); text-shadow: 0 1px 1px rgba(0,0,0,.45);
-        white-space: normal;
-      }}
-      @media (max-width: 480px) {{
-        .wheel-wrap {{ width: 280px; height: 280px; }}
-        .label {{ font-size: 12px; }}
-        .label .pill {{ max-width: 100px; }}
-      }}
-    </style>
-
-    <div class="wheel-wrap">
-      <div class="pointer"></div>
-      <div id="wheel" class="wheel"></div>
-      <div class="labels">
-        {''.join(label_divs)}
-      </div>
-      <div class="hub"></div>
-    </div>
-
-    <script>
-      (function() {{
-        const soundOn = {sound_flag};
-        const duration = {duration_ms};
-        const end = -({end_deg});
-        const wheel = document.getElementById('wheel');
-
-        let ctx, spinOsc, spinGain;
-        function ensureCtx() {{
-          if (!ctx) {{
-            const AC = window.AudioContext || window.webkitAudioContext;
-            if (AC) ctx = new AC();
-          }}
-          if (ctx && ctx.state === 'suspended') ctx.resume();
-        }}
-        function playSpin() {{
-          if (!soundOn) return;
-          ensureCtx();
-          if (!ctx) return;
-          spinOsc = ctx.createOscillator();
-          spinGain = ctx.createGain();
-          spinOsc.type = 'sawtooth';
-          spinOsc.frequency.setValueAtTime(220, ctx.currentTime);
-          spinGain.gain.setValueAtTime(0.0001, ctx.currentTime);
-          spinGain.gain.exponentialRampToValueAtTime(0.08, ctx.currentTime + 0.2);
-          spinOsc.connect(spinGain).connect(ctx.destination);
-          spinOsc.start();
-          spinOsc.frequency.exponentialRampToValueAtTime(880, ctx.currentTime + {dur_sec});
-          spinGain.gain.setTargetAtTime(0.0001, ctx.currentTime + {dur_sec} - 0.2, 0.15);
-        }}
-        function stopSpin() {{
-          try {{ if (spinOsc) spinOsc.stop(); }} catch(e) {{}}
-          try {{ if (spinOsc) spinOsc.disconnect(); }} catch(e) {{}}
-          try {{ if (spinGain) spinGain.disconnect(); }} catch(e) {{}}
-          spinOsc = null; spinGain = null;
-        }}
-        function playPop() {{
-          if (!soundOn) return;
-          ensureCtx();
-          if (!ctx) return;
-          const o = ctx.createOscillator();
-          const g = ctx.createGain();
-          o.type = 'square';
-          o.frequency.setValueAtTime(660, ctx.currentTime);
-          g.gain.setValueAtTime(0.001, ctx.currentTime);
-          g.gain.exponentialRampToValueAtTime(0.12, ctx.currentTime + 0.01);
-          g.gain.exponentialRampToValueAtTime(0.0001, ctx.currentTime + 0.15);
-          o.connect(g).connect(ctx.destination);
-          o.start();
-          o.stop(ctx.currentTime + 0.16);
-        }}
-
-        requestAnimationFrame(() => {{
-          wheel.style.transition = 'transform ' + duration + 'ms cubic-bezier(.17,.67,.29,1.27)';
-          playSpin();
-          wheel.addEventListener('transitionend', () => {{ stopSpin(); playPop(); }}, {{ once:true }});
-          wheel.style.transform = rotate(${{end}}deg);
-        }});
-      }})();
-    </script>
-    """
-    return html_code
+def build_wheel_html_anim(labels, start_deg=0, end_deg=0, duration_ms=3200, sound=True):
+    # compat: página completa con los parámetros incrustados
+    return wheel.build_html(labels, start_deg, end_deg, duration_ms, sound)
 
 def build_wheel_html(labels, angle):
     # compat: render sin animación
     return build_wheel_html_anim(labels, start_deg=angle, end_deg=angle, duration_ms=0, sound=False)
 
 # ----------- Verificación básica de imágenes (opcional) ----------
-def _try_import_pil_numpy():
-    try:
-        from PIL import Image
-        import numpy as np
-        return Image, np
-    except Exception:
-        return None, None
+# Corre en un pool de procesos compartido: una foto pesada no frena la sesión.
+from benessere.imagepool import ImagePool, PoolBusy
 
-def verify_gym_photo(file) -> bool:
-    Image, np = _try_import_pil_numpy()
-    if not Image:  # fallback si no hay PIL/numpy
-        return True
-    try:
-        img = Image.open(file).convert("RGB")
-        if img.width < 300 or img.height < 300:
-            return False
-        gray = img.convert("L")
-        arr = np.array(gray, dtype=np.float32)
-        return float(arr.var()) > 300.0
-    except Exception:
-        return False
+@st.cache_resource
+def _photo_pool():
+    return ImagePool()
 
-def verify_healthy_food(file) -> bool:
-    Image, np = _try_import_pil_numpy()
-    if not Image:
-        return True
+def _start_photo_check(key, kind, file):
+    old = st.session_state.pop(key, None)
+    if old is not None:
+        old.cancel()
     try:
-        img = Image.open(file).convert("RGB").resize((256,256))
-        arr = np.asarray(img) / 255.0
-        r,g,b = arr[:,:,0], arr[:,:,1], arr[:,:,2]
-        green_mask = (g > 0.35) & (g > r+0.05) & (g > b+0.05)
-        green_ratio = green_mask.mean()
-        maxc = arr.max(axis=2); minc = arr.min(axis=2)
-        sat = (maxc - minc).mean()
-        return (green_ratio > 0.20 and sat > 0.15)
-    except Exception:
-        return False
+        st.session_state[key] = _photo_pool().submit(kind, file.getvalue())
+    except PoolBusy as e:
+        st.warning(str(e))
+
+@st.fragment(run_every=0.5)
+def _rerun_when_done(job):
+    if job.done():
+        st.rerun()
+
+def _poll_photo_check(key, u, db, d, flag, reason, ok_msg, bad_msg):
+    """Muestra el estado de la verificación en curso y aplica el resultado."""
+    job = st.session_state.get(key)
+    if job is None:
+        return
+    if not job.done():
+        st.caption("⏳ Verificando foto…")
+        if st.button("Cancelar", key=f"{key}-cancel"):
+            job.cancel()
+            st.session_state.pop(key, None)
+            st.rerun()
+        _rerun_when_done(job)
+        return
+    st.session_state.pop(key, None)
+    ok = job.result()
+    if ok is None:
+        st.error("No pudimos verificar la foto a tiempo. Intenta otra vez.")
+    elif not ok:
+        st.error(bad_msg)
+    else:
+        h = (job.feats or {}).get("dhash")
+        if photo_repeated(u, db, h, reason):
+            st.error("Esta foto ya se usó en otro reto. Sube una foto nueva.")
+        elif complete_daily(u, db, d, flag, 30, reason,
+                            photo=None if h is None else {"hash": h, "kind": job.kind}):
+            st.success(ok_msg)
+        else:
+            st.info("Este reto ya está completado hoy.")
 
 # --------------------- Sidebar / Sesión -------------------------
-st.sidebar.image(_find_image("logo.jpg"), width=140)
+st.sidebar.image(_image_bytes("logo.jpg", 140), width=140)
 page = st.sidebar.radio(
     "Navegación",
     ["Inicio", "Repertorio", "Nosotros", "Ubicación", "Recompensas", "Zona de canjeo", "Ranking", "Más detalles"]
@@ -470,8 +265,10 @@ if st.sidebar.button("Entrar"):
         st.session_state["name"] = name.strip()
         u = get_user(db, uid)
         if not u["name"]:
-            u["name"] = name.strip()
-            # referidos: simple (si quieres sumar puntos aquí, puedes hacerlo)
+            set_name(u, db, name.strip())
+            if ref_in.strip():      # sólo al registrarse
+                ok, msg = set_referrer(u, db, ref_in)
+                (st.sidebar.success if ok else st.sidebar.warning)(msg)
         _save_db(db)
         st.sidebar.success(f"¡Hola, {name}! Tu código: {get_user(db, uid)['ref_code']}")
 
@@ -480,11 +277,20 @@ current_user = get_user(db, uid) if uid else None
 
 if current_user:
     st.sidebar.markdown(f"*Benessere Points:* {current_user['points']}")
-    st.sidebar.caption(f"Código de referidos: {current_user['ref_code']}")
+    n_refs = len(db.referrals().referrals(current_user["id"]))
+    st.sidebar.caption(f"Código de referidos: {current_user['ref_code']} · {n_refs} invitados")
 else:
     st.sidebar.info("Inicia sesión para usar Recompensas y Canjeo.")
 
 # -------------------------- Páginas -----------------------------
+# Tiempo de cada página (sin la barra lateral) y, con BENESSERE_PROFILE, un
+# perfil por muestreo del rerun en data/profiles/ (ver benessere/profiling.py).
+_prev = st.session_state.pop("_profiler", None)
+if _prev is not None:
+    _prev.stop()        # el rerun anterior lo cortó un st.rerun()
+_PAGE_T0 = time.perf_counter()
+st.session_state["_profiler"] = profiling.maybe_start(f"streamlit-{page}")
+
 if page == "Inicio":
     col1, col2 = st.columns([1.2, 1])
     with col1:
@@ -521,7 +327,7 @@ elif page == "Repertorio":
             c1, c2 = st.columns([1, 3])
             with c1:
                 st.markdown('<div class="product-img">', unsafe_allow_html=True)
-                _safe_image(it.get("img", ""), use_container_width=True)
+                _safe_image(it.get("img", ""), max_width=480, use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
             with c2:
                 st.markdown(f"### {it['name']}")
@@ -545,7 +351,7 @@ elif page == "Nosotros":
     cols = st.columns(3)
     for i, m in enumerate(team):
         with cols[i % 3]:
-            _safe_image(m["img"], use_container_width=True)
+            _safe_image(m["img"], max_width=480, use_container_width=True)
             st.markdown(f"{m['name']}")
             st.caption(m["role"])
 
@@ -581,15 +387,13 @@ elif page == "Recompensas":
 
     # ------------------ Retos diarios ------------------
     st.markdown("### Retos diarios")
-    d = ensure_daily(u)
+    d = ensure_daily(u, db)
     c1, c2, c3 = st.columns(3)
 
     with c1:
         steps = st.number_input("Pasos de hoy", min_value=0, value=0, step=500)
         if st.button("Confirmar 7.000 pasos"):
-            if steps >= 7000 and not d["steps_done"]:
-                d["steps_done"] = True
-                add_points(u, db, 30, "Reto diario: pasos")
+            if steps >= 7000 and not d["steps_done"] and complete_daily(u, db, d, "steps_done", 30, "Reto diario: pasos"):
                 st.success("Reto completado +30 pts")
             else:
                 st.info("Aún no llegas a 7.000 pasos o ya completaste el reto.")
@@ -603,13 +407,12 @@ elif page == "Recompensas":
             elif not gym_file:
                 st.error("Sube una foto primero.")
             else:
-                ok = verify_gym_photo(gym_file)
-                if ok:
-                    d["gym_done"] = True
-                    add_points(u, db, 30, "Reto diario: actividad física (foto)")
-                    st.success("Foto válida ✔ +30 pts")
-                else:
-                    st.error("No parece una foto válida de actividad física. Intenta otra.")
+                _start_photo_check("job_gym", "gym", gym_file)
+        _poll_photo_check(
+            "job_gym", u, db, d, "gym_done", "Reto diario: actividad física (foto)",
+            "Foto válida ✔ +30 pts",
+            "No parece una foto válida de actividad física. Intenta otra.",
+        )
 
     with c3:
         st.caption("Sube foto de snack/comida saludable")
@@ -620,19 +423,18 @@ elif page == "Recompensas":
             elif not food_file:
                 st.error("Sube una foto primero.")
             else:
-                ok = verify_healthy_food(food_file)
-                if ok:
-                    d["food_done"] = True
-                    add_points(u, db, 30, "Reto diario: comida saludable (foto)")
-                    st.success("¡Se ve saludable! ✔ +30 pts")
-                else:
-                    st.error("No parece una comida saludable (según verificación básica). Intenta otra.")
+                _start_photo_check("job_food", "food", food_file)
+        _poll_photo_check(
+            "job_food", u, db, d, "food_done", "Reto diario: comida saludable (foto)",
+            "¡Se ve saludable! ✔ +30 pts",
+            "No parece una comida saludable (según verificación básica). Intenta otra.",
+        )
 
     _save_db(db)
 
     # ------------------ Ruleta del bienestar ------------------
     st.markdown("### Ruleta del bienestar (diaria)")
-    labels = [r["label"] for r in SPIN_REWARDS]
+    labels = SPIN_TABLE.labels
     colA, colB = st.columns([2, 1])
 
     with colA:
@@ -646,42 +448,30 @@ elif page == "Recompensas":
             value=st.session_state.get("wheel_sound", True)
         )
 
-        st.components.v1.html(
-            build_wheel_html_anim(
-                labels,
+        _wheel_component(
+            **wheel.face(labels),
+            **wheel.spin_params(
                 start_deg=spin_state["start"],
                 end_deg=spin_state["end"],
                 duration_ms=3200,
                 sound=st.session_state.get("wheel_sound", True)
             ),
-            height=420
+            key="wheel",
+            default=None,
         )
 
     with colB:
         if can_spin_today(u):
             if st.button("🎡 Girar la ruleta", key="spin_button"):
-                weights = [r.get("w", 1) for r in SPIN_REWARDS]
-                prize = random.choices(SPIN_REWARDS, weights=weights, k=1)[0]
-
-                n = len(labels)
-                step = 360 / n
-                idx = labels.index(prize["label"])
-                center = idx * step + (step / 2)
-
-                base = (st.session_state["spin"]["end"] or 0) % 360
-                start = base
-                end = base + 360 * 4 + center
-
-                if prize["points"]:
-                    add_points(u, db, prize["points"], "Ruleta diaria")
-                if prize["coupon"]:
-                    u.setdefault("coupons", []).append(
-                        {"code": prize["coupon"], "ts": _now().isoformat(), "source": "Ruleta"}
-                    )
-                u["last_spin"] = _now().isoformat()
-                _save_db(db)
-
-                st.session_state["spin"] = {"start": start, "end": end, "label": prize["label"]}
+                prize, msg = spin(u, db)
+                if prize is not None:
+                    step = 360 / len(labels)
+                    center = prize["slot"] * step + (step / 2)
+                    start = (st.session_state["spin"]["end"] or 0) % 360
+                    end = start + 360 * 4 + center
+                    st.session_state["spin"] = {"start": start, "end": end, "label": prize["label"]}
+                else:
+                    st.info(f"{msg} Vuelve mañana ✨")
         else:
             st.info("Ya giraste hoy. Vuelve mañana ✨")
 
@@ -691,8 +481,11 @@ elif page == "Recompensas":
     # ------------------ Tus cupones ------------------
     st.markdown("### Tus cupones")
     if u.get("coupons"):
-        for c in u["coupons"]:
-            st.write(f"- {c['code']} (origen: {c['source']})")
+        now = _now().isoformat()
+        for c in reversed(u["coupons"]):
+            estado = coupons.STATUS_TEXT[coupons.status(c, now)]
+            vence = f", vence {c['expires'][:10]}" if c.get("expires") else ""
+            st.write(f"- `{c['code']}` {c['kind']} (origen: {c['source']}; {estado}{vence})")
     else:
         st.caption("Sin cupones todavía.")
 
@@ -718,12 +511,15 @@ elif page == "Zona de canjeo":
 
 elif page == "Ranking":
     st.title("Ranking Benessere")
-    db = _load_db()
     top = leaderboard(db, top_n=10)
     if not top:
         st.info("Aún no hay usuarios con puntos.")
     for i, u in enumerate(top, 1):
         st.write(f"#{i}** — {u.get('name','(sin nombre)')} — {u.get('points',0)} pts")
+    if current_user:
+        pos = user_rank(db, current_user)
+        if pos:
+            st.caption(f"Tu posición: #{pos} con {current_user['points']} pts")
 
 else:  # Más detalles
     st.title("Más detalles")
@@ -742,3 +538,17 @@ st.markdown(
     'WhatsApp</a>',
     unsafe_allow_html=True,
 )
+
+# ---------------------- Métricas del rerun ----------------------
+# (un st.rerun() corta el script antes de llegar aquí: ese rerun no se cuenta)
+PAGE_SECONDS.observe(time.perf_counter() - _PAGE_T0, page)
+RERUN_SECONDS.observe(time.perf_counter() - _RERUN_T0, page)
+_prof = st.session_state.pop("_profiler", None)
+if _prof is not None:
+    _prof.stop()
+if METRICS_DIR:
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        metrics.REGISTRY.write_textfile(os.path.join(METRICS_DIR, "streamlit.prom"), every=10)
+    except OSError:
+        pass
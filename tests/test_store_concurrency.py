@@ -0,0 +1,105 @@
+"""Varios procesos sobre la misma base: saldo en la base == suma del libro ==
+ranking en memoria de otro proceso, también después de que un tercero compacte.
+
+    python -m pytest tests
+"""
+
+import multiprocessing as mp
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benessere.ledger import Ledger  # noqa: E402
+from benessere.store import JsonStore, SQLiteStore  # noqa: E402
+
+STORES = {"sqlite": (SQLiteStore, "loyalty.db"), "json": (JsonStore, "loyalty.json")}
+USERS = ["ana", "beto", "caro"]
+SEGMENT = 512       # segmentos chicos: rotan y se compactan varias veces
+
+
+def _open(kind, tmp):
+    cls, name = STORES[kind]
+    return cls(Path(tmp) / name, ledger=Ledger(Path(tmp) / "ledger", segment_bytes=SEGMENT))
+
+
+def _earn(kind, tmp, n, k, users=USERS):
+    store = _open(kind, tmp)
+    for i in range(n):
+        store.add_points(users[(i + k) % len(users)], 1 + (i + k) % 7, "Compra", "2024-01-01T10:00:00")
+    store.close()
+
+
+def _compact(kind, tmp):
+    store = _open(kind, tmp)
+    store.ledger.compact()
+    store.close()
+
+
+def _run(target, *args):
+    p = mp.get_context("spawn").Process(target=target, args=args)
+    p.start()
+    p.join(120)
+    assert p.exitcode == 0
+
+
+def _assert_agree(store):
+    ledger = {}
+    for e in store.ledger.scan():
+        ledger[e["uid"]] = ledger.get(e["uid"], 0) + e["delta"]
+    board = store.board()
+    for uid in USERS:
+        db = store.get_user(uid)["points"]
+        assert db == ledger.get(uid, 0) == store.ledger.balance(uid)
+        assert board.rank(uid) == 1 + sum(store.get_user(o)["points"] > db for o in USERS)
+    assert dict(board.top(len(USERS))) == {uid: store.get_user(uid)["points"] for uid in USERS}
+
+
+@pytest.mark.parametrize("kind", sorted(STORES))
+def test_processes_agree_after_foreign_compaction(kind, tmp_path):
+    store = _open(kind, tmp_path)
+    for uid in USERS:
+        store.create_user({"id": uid, "name": uid})
+    store.board()       # el índice existe antes de que escriban los otros procesos
+
+    ctx = mp.get_context("spawn")
+    ps = [ctx.Process(target=_earn, args=(kind, str(tmp_path), 40, k)) for k in range(3)]
+    for p in ps:
+        p.start()
+    for p in ps:
+        p.join(120)
+        assert p.exitcode == 0
+    _assert_agree(store)
+
+    # otro proceso escribe y compacta: lo que pasó a la foto sin que este
+    # proceso lo leyera también tiene que llegar al ranking. Los movimientos
+    # de ana quedan todos archivados; en el segmento vivo sólo hay de caro.
+    _run(_earn, kind, str(tmp_path), 20, 0, ["ana"])
+    _run(_earn, kind, str(tmp_path), 2 * SEGMENT // 60, 0, ["caro"])
+    _run(_compact, kind, str(tmp_path))
+    assert any((tmp_path / "ledger" / "archive").iterdir())
+    _assert_agree(store)
+    store.close()
+
+
+def test_board_ignores_reads_before_commit(tmp_path):
+    """El otro proceso lee el libro entre la línea y el COMMIT: el ranking
+    tiene que quedar con el saldo nuevo, no con el que leyó de la base.
+    (En JSON no pasa: la línea se escribe con el archivo ya guardado, bajo su
+    candado, y los demás esperan ese candado para leer.)"""
+    a, b = _open("sqlite", tmp_path), _open("sqlite", tmp_path)
+    a.create_user({"id": "bob", "name": "bob"})
+    a.board()
+    append = b.ledger.append_many
+
+    def append_then_poll(entries):
+        append(entries)
+        a.board()
+
+    b.ledger.append_many = append_then_poll
+    b.add_points("bob", 500, "Compra", "2024-01-01T10:00:00")
+    assert a.board().top(1) == [("bob", 500)]
+    a.close()
+    b.close()